@@ -1,32 +1,37 @@
 from fastapi import HTTPException, Request
 
-from app.core.config import get_settings
+from app.core.exceptions import AppError
 from app.rag.pipeline import RAGPipeline
 from app.providers.router import GeneratorRouter
-from app.services.ingestion_service import build_pipeline_from_existing_index, rebuild_index_and_pipeline
+from app.services.pipeline_init import PipelineUnavailable
 
 
 def get_pipeline(request: Request) -> RAGPipeline:
+    """
+    The published pipeline; if there is none, joins the single-flight lazy init
+    (app.state.pipeline_init) for up to pipeline_init_wait_sec, else 503 + Retry-After.
+    """
     pipeline = getattr(request.app.state, "rag_pipeline", None)
     if pipeline is not None:
         return pipeline
 
-    # Try fast load from disk
-    settings = get_settings()
-    pipeline, report = build_pipeline_from_existing_index(settings)
-    if pipeline is not None:
-        request.app.state.rag_pipeline = pipeline
-        request.app.state.ingestion_report = report
-        return pipeline
-
-    # Last resort rebuild if allowed
-    if settings.auto_ingest_on_startup:
-        pipeline, report = rebuild_index_and_pipeline(settings)
-        request.app.state.rag_pipeline = pipeline
-        request.app.state.ingestion_report = report
-        return pipeline
+    initializer = getattr(request.app.state, "pipeline_init", None)
+    if initializer is None:
+        raise HTTPException(status_code=503, detail="RAG pipeline is not ready (index missing)")
+    try:
+        initializer.ensure()
+    except PipelineUnavailable as exc:
+        raise AppError(
+            "RAG pipeline is not ready",
+            code="pipeline_not_ready",
+            status_code=503,
+            details={"reason": exc.reason, "error": exc.error, "retry_after_sec": exc.retry_after_sec},
+        )
 
-    raise HTTPException(status_code=503, detail="RAG pipeline is not ready (index missing)")
+    pipeline = getattr(request.app.state, "rag_pipeline", None)
+    if pipeline is None:
+        raise AppError("RAG pipeline is not ready", code="pipeline_not_ready", status_code=503)
+    return pipeline
 
 
 def get_generator_router(request: Request) -> GeneratorRouter:
@@ -34,3 +39,11 @@ def get_generator_router(request: Request) -> GeneratorRouter:
     if router is None:
         raise HTTPException(status_code=503, detail="Generator router is not ready")
     return router
+
+
+def require_admin(request: Request) -> None:
+    """
+    Only API keys configured with "admin": true (see ApiKeyRateLimitMiddleware).
+    """
+    if not getattr(request.state, "client_admin", False):
+        raise AppError("Admin API key required", code="admin_required", status_code=403)
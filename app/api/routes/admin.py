@@ -1,42 +1,101 @@
 from __future__ import annotations
+import asyncio
 import json
 from pathlib import Path
+from typing import Optional
 
-from fastapi import APIRouter, Request
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import PlainTextResponse
+from app.api.deps import require_admin
 from app.core.config import get_settings
 from app.core.exceptions import AppError
-from app.services.ingestion_service import rebuild_index_and_pipeline, build_pipeline_from_existing_index
+from app.services.profiler import SamplingProfiler
+from app.services.reindex_jobs import FINISHED
+from app.services.ingestion_service import (
+    build_pipeline_from_existing_index,
+    build_pipeline_from_snapshot,
+    current_index_paths,
+    snapshot_store,
+)
+from app.storage.vectorstore.snapshots import SnapshotError
 
 router = APIRouter(tags=["admin"])
 
 
-@router.post("/admin/reindex")
-def reindex(request: Request) -> dict:
+def _reindex_jobs(request: Request):
+    manager = getattr(request.app.state, "reindex_jobs", None)
+    if manager is None:
+        raise AppError("Reindex jobs not initialized", code="reindex_jobs_missing", status_code=500)
+    return manager
+
+
+def _reject_serve_only(action: str) -> None:
+    settings = get_settings()
+    if settings.serve_only():
+        raise AppError(
+            f"{action} is disabled in serve-only mode",
+            code="serve_only",
+            status_code=409,
+            details={"index_bundle_path": settings.index_bundle_path},
+        )
+
+
+def _job_or_404(request: Request, job_id: str):
+    job = _reindex_jobs(request).get(job_id)
+    if job is None:
+        raise AppError("Reindex job not found", code="reindex_job_not_found", status_code=404, details={"job_id": job_id})
+    return job
+
+
+@router.post("/admin/reindex", status_code=202)
+async def reindex(request: Request, wait: bool = False) -> dict:
     """
-    Manual reindex endpoint.
-    - Uses an app-level lock to prevent concurrent reindex
+    Start a background reindex job (202 + job id).
+    - queries keep using the current pipeline until the new one is built, validated and swapped in
+    - poll GET /admin/reindex/{job_id} for progress; POST .../cancel to abort
+    - wait=true: respond when the job has finished (old synchronous behaviour, without
+      holding a worker thread)
     """
-    settings = get_settings()
+    _reject_serve_only("Reindex")
+    manager = _reindex_jobs(request)
+    job = manager.start()
+    if job is None:
+        running = manager.current()
+        raise AppError(
+            "Reindex already in progress",
+            code="reindex_in_progress",
+            status_code=409,
+            details={"job_id": running.id} if running is not None else None,
+        )
+    if wait:
+        while not job.wait(0):
+            await asyncio.sleep(0.5)
+    snapshot = job.snapshot()
+    return {"ok": job.state == "succeeded", "job": snapshot, "ingestion_report": snapshot["report"]}
 
-    lock = getattr(request.app.state, "reindex_lock", None)
-    if lock is None:
-        raise AppError("Reindex lock not initialized", code="reindex_lock_missing", status_code=500)
 
-    if not lock.acquire(blocking=False):
-        raise AppError("Reindex already in progress", code="reindex_in_progress", status_code=409)
+@router.get("/admin/reindex/jobs")
+def reindex_jobs(request: Request) -> dict:
+    return {"jobs": _reindex_jobs(request).list()}
 
-    try:
-        pipeline, report = rebuild_index_and_pipeline(settings)
-        request.app.state.rag_pipeline = pipeline
-        request.app.state.ingestion_report = report
 
-        metrics = getattr(request.app.state, "metrics", None)
-        if metrics:
-            metrics.inc("reindex_total", 1)
+@router.get("/admin/reindex/{job_id}")
+def reindex_job(request: Request, job_id: str) -> dict:
+    return _job_or_404(request, job_id).snapshot()
 
-        return {"ok": True, "ingestion_report": report}
-    finally:
-        lock.release()
+
+@router.post("/admin/reindex/{job_id}/cancel")
+def cancel_reindex_job(request: Request, job_id: str) -> dict:
+    job = _job_or_404(request, job_id)
+    if not job.cancel():
+        finished = job.state in FINISHED
+        raise AppError(
+            "Reindex job already finished" if finished else "Reindex job is writing the index and will complete",
+            code="reindex_job_finished" if finished else "reindex_not_cancellable",
+            status_code=409,
+            details={"job_id": job_id, "state": job.state, "stage": job.stage},
+        )
+    return job.snapshot()
 
 
 @router.post("/admin/reload-index")
@@ -44,24 +103,127 @@ def reload_index(request: Request) -> dict:
     """
     Reload from disk (fast path). Does NOT rebuild embeddings.
     Useful if you swapped index files.
+    - takes the reindex slot like rollback, so it cannot interleave with a publish
     """
     settings = get_settings()
-    pipeline, report = build_pipeline_from_existing_index(settings)
-    if pipeline is None:
-        raise AppError("Index not available to load", code="index_load_failed", status_code=404, details=report)
+    lock = request.app.state.reindex_lock
+    if not lock.acquire(blocking=False):
+        raise AppError("Reindex already in progress", code="reindex_in_progress", status_code=409)
+    try:
+        pipeline, report = build_pipeline_from_existing_index(settings)
+        if pipeline is None:
+            raise AppError("Index not available to load", code="index_load_failed", status_code=404, details=report)
 
-    request.app.state.rag_pipeline = pipeline
-    request.app.state.ingestion_report = report
+        request.app.state.publish_pipeline(pipeline, report)
+    finally:
+        lock.release()
     return {"ok": True, "ingestion_report": report}
 
 
 @router.get("/admin/index-state")
-def index_state() -> dict:
+def index_state(request: Request) -> dict:
+    """
+    State of the served index (in memory); read from disk only when no index is loaded.
+    """
+    report = getattr(request.app.state, "ingestion_report", {}) or {}
+    if report.get("index_state"):
+        return {"exists": True, "snapshot": report.get("snapshot"), "state": report["index_state"]}
     settings = get_settings()
-    p = Path(settings.index_state_path)
+    try:
+        paths = current_index_paths(settings)
+    except SnapshotError as exc:
+        raise AppError("Index bundle cannot be opened", code="bundle_invalid", status_code=409, details={"error": str(exc)})
+    p = Path(paths["state_path"])
     if not p.exists():
-        return {"exists": False, "state": {}}
+        return {"exists": False, "snapshot": paths["snapshot"], "state": {}}
     try:
-        return {"exists": True, "state": json.loads(p.read_text(encoding="utf-8"))}
+        return {"exists": True, "snapshot": paths["snapshot"], "state": json.loads(p.read_text(encoding="utf-8"))}
     except Exception as exc:
         raise AppError("Failed to read index state", code="index_state_read_failed", status_code=500, details={"error": str(exc)})
+
+
+@router.get("/admin/index/snapshots")
+def index_snapshots() -> dict:
+    snapshots = snapshot_store(get_settings())
+    return {"current": snapshots.pointer(), "snapshots": snapshots.list()}
+
+
+@router.post("/admin/index/rollback")
+def rollback_index(request: Request, version: Optional[str] = None) -> dict:
+    """
+    Serve an earlier snapshot again: no re-embedding, just load + pointer switch.
+    - version omitted: the snapshot before the current one
+    - the snapshot is pinned: a restart keeps serving it even if the source has changed;
+      the next successful reindex unpins
+    """
+    _reject_serve_only("Rollback")
+    settings = get_settings()
+    snapshots = snapshot_store(settings)
+    current = snapshots.current()
+    if version is None:
+        versions = snapshots.versions()
+        older = versions[versions.index(current) + 1:] if current in versions else versions[1:]
+        if not older:
+            raise AppError("No earlier snapshot to roll back to", code="snapshot_not_found", status_code=404)
+        version = older[0]
+    elif version not in snapshots.versions():
+        raise AppError("Snapshot not found", code="snapshot_not_found", status_code=404, details={"version": version})
+
+    lock = request.app.state.reindex_lock
+    if not lock.acquire(blocking=False):
+        raise AppError("Reindex already in progress", code="reindex_in_progress", status_code=409)
+    try:
+        try:
+            pipeline, report = build_pipeline_from_snapshot(settings, version)
+            snapshots.activate(version, pinned=True)
+        except SnapshotError as exc:
+            raise AppError(
+                "Snapshot cannot be served",
+                code="snapshot_invalid",
+                status_code=409,
+                details={"version": version, "error": str(exc)},
+            )
+        request.app.state.publish_pipeline(pipeline, report)
+    finally:
+        lock.release()
+    return {"ok": True, "previous": current, "current": version, "ingestion_report": report}
+
+
+@router.post("/admin/profile", dependencies=[Depends(require_admin)])
+async def profile(
+    seconds: float = 10.0,
+    interval_ms: float = 10.0,
+    format: str = "collapsed",
+    include_idle: bool = False,
+):
+    """
+    Sample every thread's Python stack for `seconds` and return the profile.
+    - format=collapsed: flamegraph.pl / speedscope input (text/plain)
+    - format=json: sample counts, per-thread totals, top self/inclusive frames
+    Async on purpose: waiting for the profile must not hold a threadpool worker.
+    """
+    settings = get_settings()
+    if not 0 < seconds <= settings.profile_max_sec:
+        raise AppError(
+            f"seconds must be in (0, {settings.profile_max_sec}]",
+            code="invalid_profile_duration",
+            status_code=422,
+        )
+    if format not in ("collapsed", "json"):
+        raise AppError("format must be 'collapsed' or 'json'", code="invalid_profile_format", status_code=422)
+    if not SamplingProfiler.acquire():
+        raise AppError("A profile is already running", code="profile_in_progress", status_code=409)
+
+    try:
+        profiler = SamplingProfiler(interval_sec=interval_ms / 1000.0, include_idle=include_idle)
+        profiler.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            profiler.stop()
+    finally:
+        SamplingProfiler.release()
+
+    if format == "json":
+        return profiler.summary()
+    return PlainTextResponse(profiler.collapsed())
@@ -4,6 +4,9 @@ from fastapi import APIRouter, Request
 
 from app.core.config import get_settings
 from app.services.corpus_summary import compute_corpus_summary
+from app.core.exceptions import AppError
+from app.services.ingestion_service import current_index_paths
+from app.storage.vectorstore.snapshots import SnapshotError
 
 router = APIRouter(tags=["corpus"])
 
@@ -17,10 +20,13 @@ def corpus_summary(request: Request) -> dict:
     if isinstance(cached, dict) and cached.get("ok"):
         return {"cached": True, "summary": cached}
 
-    settings = get_settings()
+    try:
+        paths = current_index_paths(get_settings())
+    except SnapshotError as exc:
+        raise AppError("Index bundle cannot be opened", code="bundle_invalid", status_code=409, details={"error": str(exc)})
     summary = compute_corpus_summary(
-        faiss_metadata_path=settings.faiss_metadata_path,
-        index_state_path=settings.index_state_path,
+        faiss_metadata_path=paths["metadata_path"],
+        index_state_path=paths["state_path"],
     )
 
     request.app.state.corpus_summary_cache = summary
@@ -22,12 +22,22 @@ def health(request: Request) -> dict:
 def ready(request: Request) -> dict:
     report = getattr(request.app.state, "ingestion_report", None)
     pipeline_ready = getattr(request.app.state, "rag_pipeline", None) is not None
+    warmup = getattr(request.app.state, "warmup_report", None) or {}
+    warmed_up = bool(warmup.get("done", True))
+
+    if not pipeline_ready:
+        status = "not_ready"
+    elif not warmed_up:
+        status = "warming_up"
+    else:
+        status = "ready"
 
     return {
-        "status": "ready" if pipeline_ready else "not_ready",
+        "status": status,
         "checks": {
             "api": True,
             "rag_pipeline": pipeline_ready,
+            "warmup": warmup,
             "ingestion": report or "not_run",
             "local_provider": "not_connected_in_phase2",
             "api_provider": "not_connected_in_phase2",
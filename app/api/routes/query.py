@@ -1,13 +1,22 @@
 import logging
 import time
+from typing import Optional
+
 from fastapi import APIRouter, Depends, Request
 
 from app.api.deps import get_pipeline, get_generator_router
 from app.core.config import get_settings
+from app.rag.context_formatter import assemble_context
 from app.rag.pipeline import RAGPipeline
-from app.providers.router import GeneratorRouter
+from app.rag.prompt_builder import RAG_SYSTEM_PROMPT, build_rag_prompt
+from app.providers.base import GenerationResult, ProviderError
+from app.providers.router import GeneratorRouter, is_answer
 from app.schemas.query import QueryRequest, QueryResponse, QueryResponseMeta
 from app.services.qa_answering import is_meta_query, choose_best_answer
+from app.services.degradation import LEVELS
+from app.services.reranker import rerank_candidates
+from app.utils.timeouts import Deadline, deadline_from_headers
+from app.utils.tracing import annotate, current_trace, span
 
 logger = logging.getLogger(__name__)
 
@@ -23,6 +32,100 @@ _REASON_MESSAGES = {
 }
 
 
+def _observe_retrieval(metrics, timings: dict, retrieval_mode: str) -> None:
+    if "embed_cached" in timings:
+        result = "hit" if timings["embed_cached"] else "miss"
+        metrics.inc_labeled("cache_requests_total", {"cache": "embedding", "result": result})
+        if not timings["embed_cached"] and "embed_ms" in timings:
+            metrics.observe("stage_duration_ms", timings["embed_ms"], {"stage": "embed"})
+    if "search_ms" in timings:
+        stage = "lexical_search" if retrieval_mode == "lexical" else "search"
+        metrics.observe("stage_duration_ms", timings["search_ms"], {"stage": stage})
+
+
+def _candidate(r: dict) -> dict:
+    out = {"chunk_id": r.get("chunk_id"), "doc_id": r.get("doc_id"), "score": round(float(r.get("score", 0.0)), 4)}
+    for key, name in (("combined_score", "combined"), ("match_char", "char"), ("match_jaccard", "jaccard")):
+        if key in r:
+            out[name] = round(float(r[key]), 4)
+    return out
+
+
+def _log_query(
+    request: Request,
+    payload: QueryRequest,
+    response: QueryResponse,
+    ranked: list,
+    answered: bool,
+    chosen: Optional[dict] = None,
+    reason: Optional[str] = None,
+    index_version: str = "",
+) -> QueryResponse:
+    """
+    Hand the query record to the async query log (analytics / replay); never blocks on disk.
+    """
+    qlog = getattr(request.app.state, "query_log", None)
+    if qlog is None:
+        return response
+    meta = response.meta
+    trace = current_trace()
+    qlog.log({
+        "ts": round(time.time(), 3),
+        "request_id": meta.request_id,
+        "client_request_id": payload.client_request_id,
+        "query": payload.query,
+        "top_k": payload.top_k,
+        "answered": answered,
+        "reason": reason,
+        "provider_used": meta.provider_used,
+        "fallback_reason": meta.fallback_reason,
+        "chosen": {
+            "chunk_id": chosen.get("chunk_id"),
+            "doc_id": chosen.get("doc_id"),
+            "question": chosen.get("question"),
+        } if chosen else None,
+        "candidates": [_candidate(r) for r in ranked[:5]],
+        "latency_ms": meta.latency_ms,
+        "degradation_level": meta.degradation_level,
+        "retrieval_mode": meta.retrieval_mode,
+        "cache_hit": meta.cache_hit,
+        "index_version": index_version,
+        "spans": trace.breakdown() if trace is not None else None,
+    })
+    return response
+
+
+def _build_meta(
+    rid: Optional[str],
+    started: float,
+    deadline: Deadline,
+    retrieval_count: int,
+    level: int,
+    retrieval_mode: Optional[str],
+    provider_used: str,
+    fallback_reason: Optional[str] = None,
+    cache_hit: bool = False,
+) -> QueryResponseMeta:
+    annotate(provider_used=provider_used, fallback_reason=fallback_reason, cache_hit=cache_hit)
+    trace = current_trace()
+    spans = trace.breakdown() if trace is not None and get_settings().query_meta_spans else None
+    return QueryResponseMeta(
+        request_id=rid,
+        provider_used=provider_used,
+        fallback_reason=fallback_reason,
+        retrieval_count=retrieval_count,
+        latency_ms=int((time.perf_counter() - started) * 1000),
+        deadline_ms=deadline.timeout_ms,
+        deadline_exhausted_stage=deadline.exhausted_stage,
+        degraded_stages=list(deadline.degraded_stages),
+        cache_hit=cache_hit,
+        degradation_level=level,
+        degradation_mode=LEVELS[level],
+        retrieval_mode=retrieval_mode,
+        spans=spans,
+    )
+
+
 @router.post("/query", response_model=QueryResponse)
 def query_endpoint(
     request: Request,
@@ -33,38 +136,166 @@ def query_endpoint(
     settings = get_settings()
     started = time.perf_counter()
     rid = getattr(request.state, "request_id", None)
+    deadline = deadline_from_headers(request.headers, settings)
+
+    # Quality level under load (see DegradationController): 0 = full pipeline
+    degradation = getattr(request.app.state, "degradation", None)
+    level = degradation.current() if degradation is not None else 0
 
     top_k = min(payload.top_k, settings.max_top_k)
     candidate_k = max(int(settings.qa_candidate_k), top_k)
+    if level >= LEVELS.index("reduced_candidates"):
+        candidate_k = max(min(candidate_k, int(settings.degradation_candidate_k)), top_k)
 
-    retrieved = pipeline.retrieve(query=payload.query, top_k=candidate_k)
+    mode = "vector"
+    if level >= LEVELS.index("lexical_only"):
+        mode = "lexical"
+    elif level >= LEVELS.index("cache_only"):
+        mode = "cache_only"
+
+    embed_latency = getattr(request.app.state, "query_embed_latency", None)
+    retrieve_started = time.perf_counter()
+    try:
+        retrieved = pipeline.retrieve(query=payload.query, top_k=candidate_k, deadline=deadline, mode=mode)
+    except Exception:
+        if embed_latency is not None and mode == "vector":
+            embed_latency.record((time.perf_counter() - retrieve_started) * 1000, failed=True)
+        raise
+    timings = retrieved["timings"]
+    if embed_latency is not None and timings.get("embed_cached") is False and "embed_ms" in timings:
+        embed_latency.record(timings["embed_ms"])
+    retrieval_count = retrieved["retrieval_count"]
+    retrieval_mode = retrieved["retrieval_mode"]
+    annotate(
+        query=payload.query[:200],
+        top_k=top_k,
+        degradation=LEVELS[level],
+        retrieval_mode=retrieval_mode,
+        retrieval_count=retrieval_count,
+    )
+
+    metrics = getattr(request.app.state, "metrics", None)
+    if metrics:
+        metrics.inc("queries_total", 1)
+        metrics.inc_labeled("queries_by_level_total", {"level": LEVELS[level]})
+        _observe_retrieval(metrics, retrieved["timings"], retrieval_mode)
 
     if is_meta_query(payload.query):
-        elapsed_ms = int((time.perf_counter() - started) * 1000)
-        return QueryResponse(
+        response = QueryResponse(
             answer="این فایل یک دیتاست پرسش/پاسخ (FAQ/Support) است. یک سوال مشخص مشتری بپرس تا جواب دقیق از دیتاست بدهم.",
-            meta=QueryResponseMeta(
-                request_id=rid,
-                provider_used="meta_rule",
-                fallback_reason=None,
-                retrieval_count=retrieved["retrieval_count"],
-                latency_ms=elapsed_ms,
-            ),
+            meta=_build_meta(rid, started, deadline, retrieval_count, level, retrieval_mode, provider_used="meta_rule"),
             sources=retrieved["sources"][:top_k],
         )
+        return _log_query(
+            request, payload, response, retrieved["raw_results"], answered=True,
+            reason="meta_query", index_version=pipeline.index_version,
+        )
+
+    # Rerank is optional work: skip it when the remaining budget is too small.
+    # Lexical results carry overlap scores, not cosine, so they are not reranked either.
+    results = retrieved["raw_results"]
+    if (
+        settings.rerank_enabled
+        and retrieval_mode != "lexical"
+        and deadline.budget_for("rerank", float("inf")) is not None
+    ):
+        with span("rerank") as s:
+            results = rerank_candidates(
+                payload.query,
+                results,
+                alpha=float(settings.rerank_alpha),
+                beta=float(settings.rerank_beta),
+                gamma=float(settings.rerank_gamma),
+                char_similarity_enabled=level < LEVELS.index("no_char_similarity"),
+            )
+        if metrics:
+            metrics.observe("stage_duration_ms", s.ms, {"stage": "rerank"})
+    generation_fallback: Optional[str] = None
+
+    if not settings.qa_mode:
+        # Context budget: configured cap, but never more than the model window leaves
+        # after the output reservation and the prompt around the context.
+        estimator = gen_router.local.token_estimator
+        prompt_overhead = estimator.count(RAG_SYSTEM_PROMPT) + estimator.count(
+            build_rag_prompt(query=payload.query, context="")
+        )
+        context_budget = min(
+            int(settings.max_context_tokens),
+            int(settings.ollama_chat_num_ctx) - int(settings.ollama_chat_max_tokens) - prompt_overhead,
+        )
+        with span("assemble_context"):
+            context = assemble_context(
+                results,
+                estimator=estimator,
+                max_tokens=max(0, context_budget),
+                dedup_threshold=float(settings.context_dedup_threshold),
+                max_blocks=top_k,
+            )
+        logger.info(
+            "context assembled | rid=%s blocks=%d tokens=%d budget=%d dup=%d over=%d",
+            rid, len(context.used), context.tokens, context_budget,
+            context.dropped_duplicates, context.dropped_over_budget,
+        )
+
+        with span("generate") as s:
+            try:
+                gen = gen_router.generate(
+                    system=RAG_SYSTEM_PROMPT,
+                    user=build_rag_prompt(query=payload.query, context=context.text),
+                    deadline=deadline,
+                    index_version=pipeline.index_version,
+                    cache_only=level >= LEVELS.index("cache_only"),
+                )
+            except ProviderError as exc:
+                logger.warning("generation failed | rid=%s %s", rid, exc)
+                gen = GenerationResult(answer="", provider_used="none", fallback_reason=f"generation_failed: {exc}")
+        if metrics:
+            provider = "cache" if gen.cached else gen.provider_used
+            gen_ms = s.ms
+            metrics.observe("stage_duration_ms", gen_ms, {"stage": "generate"})
+            metrics.observe("generation_duration_ms", gen_ms, {"provider": provider})
+            metrics.inc_labeled("generations_total", {"provider": provider})
+            if gen.fallback_reason:
+                metrics.inc_labeled("generation_fallbacks_total", {"reason": gen.fallback_reason.split(":")[0]})
+        if metrics and gen_router.cache is not None:
+            metrics.inc("response_cache_hits" if gen.cached else "response_cache_misses", 1)
+            metrics.inc_labeled("cache_requests_total", {"cache": "response", "result": "hit" if gen.cached else "miss"})
+        if metrics and gen.stats and not gen.cached:
+            metrics.inc_labeled("ollama_num_ctx_total", {"num_ctx": gen.stats.get("num_ctx")})
+            if gen.stats.get("prompt_eval_ms") is not None:
+                metrics.inc("ollama_prefill_calls_total", 1)
+                metrics.inc("ollama_prefill_ms_total", int(gen.stats["prompt_eval_ms"]))
+                metrics.inc("ollama_prefill_tokens_total", int(gen.stats.get("prompt_eval_count") or 0))
+            logger.info("local generation | rid=%s %s", rid, gen.stats)
+        # provider "none" may still carry a status text (e.g. busy with API fallback disabled): not an answer
+        if is_answer(gen):
+            response = QueryResponse(
+                answer=gen.answer,
+                meta=_build_meta(
+                    rid, started, deadline, retrieval_count, level, retrieval_mode,
+                    provider_used=gen.provider_used,
+                    fallback_reason=gen.fallback_reason,
+                    cache_hit=gen.cached,
+                ),
+                sources=retrieved["sources"][:top_k],
+            )
+            return _log_query(
+                request, payload, response, context.used or results, answered=True,
+                index_version=pipeline.index_version,
+            )
+        # No generator fit into the deadline or all of them failed: degrade to the extractive answer below
+        generation_fallback = gen.fallback_reason
 
+    # Lexical hits carry Jaccard overlap, not cosine: they get their own gate
+    lexical = retrieval_mode == "lexical"
     picked = choose_best_answer(
         query=payload.query,
-        results=retrieved["raw_results"],
-        min_vector_score=float(settings.qa_min_score),
-        min_combined=float(settings.qa_min_combined),
-        rerank_enabled=bool(settings.rerank_enabled),
-        alpha=float(settings.rerank_alpha),
-        beta=float(settings.rerank_beta),
-        gamma=float(settings.rerank_gamma),
+        results=results,
+        min_vector_score=float(settings.qa_lexical_min_score if lexical else settings.qa_min_score),
+        min_combined=float(settings.qa_lexical_min_score if lexical else settings.qa_min_combined),
+        rerank_enabled=False,  # already ranked above
     )
-
-    elapsed_ms = int((time.perf_counter() - started) * 1000)
+    extract_provider = "qa_extract_lexical" if lexical else "qa_extract_question_only"
 
     if picked.get("ok"):
         best_meta = picked.get("best", {})
@@ -76,19 +307,23 @@ def query_endpoint(
             float(best_meta.get("match_char", 0)),
             float(best_meta.get("match_jaccard", 0)),
         )
-        return QueryResponse(
+        response = QueryResponse(
             answer=picked["answer"],
-            meta=QueryResponseMeta(
-                request_id=rid,
-                provider_used="qa_extract_question_only",
-                fallback_reason=None,
-                retrieval_count=retrieved["retrieval_count"],
-                latency_ms=elapsed_ms,
+            meta=_build_meta(
+                rid, started, deadline, retrieval_count, level, retrieval_mode,
+                provider_used=extract_provider,
+                fallback_reason=generation_fallback,
             ),
             sources=retrieved["sources"][:top_k],
         )
+        return _log_query(
+            request, payload, response, results, answered=True,
+            chosen=best_meta, index_version=pipeline.index_version,
+        )
 
     reason_code = str(picked.get("reason") or "unknown")
+    if lexical and reason_code in ("low_vector_score", "low_combined"):
+        reason_code = "low_lexical_match"
     reason_text = _REASON_MESSAGES.get(reason_code, "اطمینان پاسخ پایین بود")
     best_dbg = picked.get("best", {})
     logger.warning(
@@ -106,14 +341,17 @@ def query_endpoint(
         }
         for r in ranked_preview[:top_k]
     ]
-    return QueryResponse(
+    response = QueryResponse(
         answer=f"به پاسخ مطمئن نرسیدم: {reason_text}. لطفاً سوال را دقیق‌تر و با جزئیات بیشتری بپرس.",
-        meta=QueryResponseMeta(
-            request_id=rid,
-            provider_used="qa_extract_question_only",
-            fallback_reason=reason_code,
-            retrieval_count=retrieved["retrieval_count"],
-            latency_ms=elapsed_ms,
+        meta=_build_meta(
+            rid, started, deadline, retrieval_count, level, retrieval_mode,
+            provider_used=extract_provider,
+            # why generation was skipped wins; otherwise why the extractive answer was refused
+            fallback_reason=generation_fallback or reason_code,
         ),
         sources=fallback_sources or retrieved["sources"][:top_k],
     )
+    return _log_query(
+        request, payload, response, results, answered=False,
+        reason=reason_code, index_version=pipeline.index_version,
+    )
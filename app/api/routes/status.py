@@ -5,6 +5,8 @@ from fastapi import APIRouter, Request
 
 from app.core.config import get_settings
 from app.schemas.common import StatusResponse
+from app.services.ingestion_service import current_index_paths
+from app.storage.vectorstore.snapshots import SnapshotError
 
 router = APIRouter(tags=["status"])
 
@@ -18,6 +20,9 @@ def _safe_config(settings) -> dict:
         "max_context_chars": settings.max_context_chars,
         "static_source_path": settings.static_source_path,
         "ollama_base_url": settings.ollama_base_url,
+        "ollama_embed_base_urls": settings.embed_backend_urls(),
+        "ollama_chat_base_urls": settings.chat_backend_urls(),
+        "ollama_lb_strategy": settings.ollama_lb_strategy,
         "ollama_embed_model": settings.ollama_embed_model,
         "ollama_chat_model": settings.ollama_chat_model,
         "max_local_concurrent": settings.max_local_concurrent,
@@ -28,6 +33,8 @@ def _safe_config(settings) -> dict:
         "faiss_index_path": settings.faiss_index_path,
         "faiss_metadata_path": settings.faiss_metadata_path,
         "index_state_path": settings.index_state_path,
+        "index_snapshots_dir": settings.index_snapshots_dir,
+        "index_snapshots_keep": settings.index_snapshots_keep,
         "embedding_dim": settings.embedding_dim,
         "auto_ingest_on_startup": settings.auto_ingest_on_startup,
     }
@@ -49,7 +56,22 @@ def status(request: Request) -> StatusResponse:
 
     pipeline_ready = getattr(request.app.state, "rag_pipeline", None) is not None
     ingestion_report = getattr(request.app.state, "ingestion_report", {}) or {}
-    index_state = _read_index_state(settings.index_state_path)
+    # State of the served index, kept with the pipeline; disk only when nothing is loaded
+    index_state = ingestion_report.get("index_state") or {}
+    index_error = None
+    if not index_state:
+        try:
+            index_state = _read_index_state(current_index_paths(settings)["state_path"])
+        except SnapshotError as exc:
+            # Serve-only with a missing / broken bundle: /status must still answer
+            index_error = str(exc)
+
+    warmup = dict(getattr(request.app.state, "warmup_report", {}) or {})
+    scheduler = getattr(request.app.state, "keepalive_scheduler", None)
+    if scheduler is not None:
+        warmup["keepalive"] = scheduler.snapshot()
+
+    degradation = getattr(request.app.state, "degradation", None)
 
     return StatusResponse(
         service=settings.app_name,
@@ -60,4 +82,7 @@ def status(request: Request) -> StatusResponse:
         ingestion_report=ingestion_report,
         index_state=index_state,
         config_safe=_safe_config(settings),
+        warmup=warmup,
+        degradation=degradation.snapshot() if degradation is not None else {},
+        index_error=index_error,
     )
@@ -1,4 +1,5 @@
 from functools import lru_cache
+from typing import Any, Dict, List
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -14,10 +15,23 @@ class Settings(BaseSettings):
 
     api_prefix: str = "/api/v1"
     log_level: str = "INFO"
+    # queue: request threads only enqueue log records; a background thread formats and writes them
+    # sync : handlers write in the calling thread
+    log_mode: str = "queue"
+    # text | json (one object per line, with request_id)
+    log_format: str = "text"
+    log_queue_size: int = 10000
+    # Full queue: "drop" drops records below WARNING at once and WARNING+ after log_queue_block_ms;
+    # "block" waits up to log_queue_block_ms for every record. Drops are counted in /metrics.
+    log_queue_overflow: str = "drop"
+    log_queue_block_ms: int = 100
 
     # ---- Source / Index ----
     static_source_path: str = "./data/input/static_knowledge.txt"
     auto_ingest_on_startup: bool = True
+    # sha256 of the source is reused while its (size, mtime, inode) is unchanged; the file keeps
+    # it across restarts. Empty = re-hash the whole source on every startup / index load.
+    source_hash_cache_path: str = "./data/indexes/source_hash.json"
 
     # chunk_size/overlap are only used in generic_chunks mode (plain-text docs).
     # For JSONL FAQ datasets (qa_full / qa_question_only) each record is its own unit
@@ -28,18 +42,151 @@ class Settings(BaseSettings):
     default_top_k: int = 5
     max_top_k: int = 10
     max_context_chars: int = 4000  # context window passed to LLM if qa_mode=False
+    # Token budget for the retrieved context in generation mode (qa_mode=False).
+    # Also capped by ollama_chat_num_ctx minus the output reservation and the prompt itself.
+    max_context_tokens: int = 1500
+    # FAQ entries whose question or answer token sets overlap at least this much (Jaccard)
+    # with an entry already in the context are dropped as near-duplicates.
+    context_dedup_threshold: float = 0.85
+
+    # ---- Lazy pipeline init ----
+    # Requests that find no pipeline (startup failed, index missing) share one background
+    # load/rebuild. They wait up to pipeline_init_wait_sec for it (0 = 503 at once); after a
+    # failed attempt they get a fast 503 for pipeline_init_backoff_sec before the next try.
+    pipeline_init_wait_sec: float = 5.0
+    pipeline_init_backoff_sec: float = 30.0
+
+    # ---- Request deadline ----
+    # Every /query carries a time budget: the client header (milliseconds) or the default.
+    # The default stays below the UI's 90 s requests timeout so we answer before it gives up.
+    request_timeout_header: str = "X-Request-Timeout-Ms"
+    request_deadline_default_ms: int = 80000
+    request_deadline_max_ms: int = 300000
+    # Minimum remaining budget a stage needs to be started at all.
+    # Below it the stage is skipped (rerank, local, API) or the request fails fast (embed).
+    deadline_min_embed_ms: int = 500
+    deadline_min_rerank_ms: int = 50
+    deadline_min_local_ms: int = 5000
+    deadline_min_api_ms: int = 3000
+
+    # ---- Admission control ----
+    # /query: at most admission_max_in_flight running, a short FIFO queue behind them,
+    # everything else gets a fast 503 + Retry-After. Admin calls have their own lane;
+    # /health, /ready and /metrics bypass admission entirely.
+    admission_enabled: bool = True
+    admission_max_in_flight: int = 8
+    admission_max_queue: int = 16
+    admission_queue_timeout_ms: int = 2000
+    admission_admin_max_in_flight: int = 2
+    admission_admin_max_queue: int = 2
+    # Worker threads kept free for non-query routes on top of both lanes' in-flight limits
+    # (sync routes share one threadpool; it is grown at startup if needed).
+    threadpool_reserve: int = 8
+
+    # ---- Load-adaptive degradation ----
+    # Under load /query answers with cheaper levels instead of timing out:
+    # 1 fewer candidates (degradation_candidate_k), 2 rerank without char similarity,
+    # 3 cached embeddings/generations only, 4 lexical-only retrieval.
+    # Thresholds are where levels 1..4 start (0 = never reached by that signal).
+    degradation_enabled: bool = True
+    # (in-flight + queued /query requests) / admission_max_in_flight
+    degradation_load_thresholds: List[float] = [1.0, 1.5, 2.0, 2.5]
+    # Latency EWMA (ms) of /query embedding calls (reindex batches do not count)
+    degradation_embed_ms_thresholds: List[float] = [1500, 3000, 6000, 12000]
+    # Half-life of that EWMA while no query embeds run (cache_only / lexical_only make none),
+    # so a degraded service steps back down and probes the backend with real queries again
+    degradation_embed_decay_sec: float = 30.0
+    # Seconds below the current level before stepping down one level
+    degradation_recover_sec: int = 10
+    degradation_candidate_k: int = 30
+    # Query-embedding LRU (also lets the cache_only level keep vector search for repeated queries)
+    embedding_cache_max_entries: int = 2048
+
+    # ---- API keys / rate limiting ----
+    # Clients send X-API-Key (or Authorization: Bearer). Env takes JSON, e.g.
+    # '{"<key>": {"name": "crm", "rate_per_sec": 2, "burst": 10, "expensive_rate_per_sec": 0.05,
+    #   "expensive_burst": 1, "admin": false}}'; omitted fields use the anonymous limits below.
+    api_keys: Dict[str, Dict[str, Any]] = {}
+    # True = requests without a valid key get 401 (health/ready/metrics excepted)
+    auth_required: bool = False
+    # Off by default: behind a proxy or the Gradio UI all anonymous users share one client IP
+    # (and so one bucket) unless rate_limit_trusted_proxies is set. Keys are identified either way.
+    rate_limit_enabled: bool = False
+    # Token bucket per client (API key, or client IP without one): refill rate + capacity
+    rate_limit_per_sec: float = 5.0
+    rate_limit_burst: int = 20
+    # Separate bucket for expensive calls: /admin/reindex and /query in generation mode
+    rate_limit_expensive_per_sec: float = 0.1
+    rate_limit_expensive_burst: int = 3
+    # Reverse proxies (IPs or CIDRs) whose X-Forwarded-For is believed: the client IP is the
+    # right-most X-Forwarded-For entry that is not one of them. Empty = the socket peer, and
+    # X-Forwarded-For is ignored (clients could spoof it). Env takes JSON, e.g. '["10.0.0.0/8"]'
+    rate_limit_trusted_proxies: List[str] = []
+    # Optional shared bucket state across replicas (needs the redis package), e.g. redis://redis:6379/0
+    rate_limit_redis_url: str = ""
+
+    # ---- Tracing / slow-query log ----
+    # Every response carries a Server-Timing header with the per-stage breakdown.
+    server_timing_enabled: bool = True
+    # Also return the breakdown in /query meta.spans
+    query_meta_spans: bool = False
+    # Requests slower than this are logged (JSON, full breakdown) to the rag.slow_query logger,
+    # sampled at slow_query_sample_rate; slow_query_log_path additionally writes them to a file.
+    slow_query_threshold_ms: int = 3000
+    slow_query_sample_rate: float = 1.0
+    slow_query_log_path: str = ""
+    # ---- Query log (analytics / replay) ----
+    # Every /query is appended as one JSON line (query, candidates + scores, chosen FAQ, latency,
+    # degradation level, index version) by a background writer; replay with scripts/replay_queries.py.
+    # When the writer falls behind, records beyond query_log_max_queue are dropped, never waited on.
+    query_log_enabled: bool = True
+    query_log_path: str = "./data/logs/queries.jsonl"
+    query_log_max_queue: int = 10000
+    # Rotate at this size or age, whichever comes first; keep query_log_backups rotated files
+    query_log_max_mb: int = 50
+    query_log_rotate_hours: float = 24
+    query_log_backups: int = 14
+    # Upper bound for POST /admin/profile?seconds=... (admin API key required)
+    profile_max_sec: int = 60
 
     # ---- Embedding (Ollama) ----
     ollama_base_url: str = "http://localhost:11434"
     ollama_embed_model: str = "nomic-embed-text"
     ollama_embed_timeout_sec: int = 60
 
+    # ---- Ollama backends / load balancing ----
+    # Several equivalent Ollama hosts, separately for embeddings and chat.
+    # Empty list = ollama_base_url only. Env takes JSON, e.g. '["http://a:11434","http://b:11434"]'.
+    ollama_embed_base_urls: List[str] = []
+    ollama_chat_base_urls: List[str] = []
+    # least_outstanding: fewest in-flight calls | ewma: lowest smoothed latency x load
+    ollama_lb_strategy: str = "least_outstanding"
+    # Passive ejection: a backend failing this many times in a row is skipped for ollama_eject_sec.
+    ollama_eject_after_failures: int = 3
+    ollama_eject_sec: int = 30
+
     # ---- FAISS ----
+    # Pre-snapshot layout: only read when no snapshot exists yet (first start after upgrade).
     faiss_index_path: str = "./data/indexes/faiss.index"
     faiss_metadata_path: str = "./data/processed/faiss_chunks.json"
     index_state_path: str = "./data/processed/index_state.json"
     embedding_dim: int = 0
 
+    # ---- Index snapshots ----
+    # Each build is written to <dir>/<version>/ (index, metadata, state, manifest with checksums);
+    # <dir>/CURRENT names the served one and is switched atomically. Rollback: POST /admin/index/rollback.
+    index_snapshots_dir: str = "./data/indexes/snapshots"
+    index_snapshots_keep: int = 5
+    # Verify sha256 of the snapshot / bundle files before loading them
+    index_snapshot_verify: bool = True
+
+    # ---- Serve-only (prebuilt index bundle) ----
+    # Set to a bundle from scripts/build_index_bundle.py (directory or .tar.gz) to serve it as is:
+    # no source file needed, no source hashing, no ingestion; reindex and rollback are disabled.
+    index_bundle_path: str = ""
+    # Archives are extracted here once per archive version
+    index_bundle_extract_dir: str = "./data/indexes/bundle"
+
     # ---- Index schema/mode ----
     # Bump index_schema_version whenever index_mode or embedding_model changes
     # to force an automatic rebuild on next startup.
@@ -66,6 +213,10 @@ class Settings(BaseSettings):
     # Should be at or slightly above qa_min_score.
     qa_min_combined: float = 0.25
 
+    # Lexical-only retrieval (top degradation level) scores token Jaccard overlap, not cosine:
+    # it is gated by this instead of qa_min_score / qa_min_combined.
+    qa_lexical_min_score: float = 0.2
+
     # Lexical gates are disabled — the embedding model is the primary trust signal.
     qa_min_match_char: float = 0.0
     qa_min_match_jaccard: float = 0.0
@@ -90,6 +241,11 @@ class Settings(BaseSettings):
     ollama_chat_top_k: int = 40
     ollama_chat_repeat_penalty: float = 1.05
     ollama_chat_num_ctx: int = 8192
+    # num_ctx is picked per request from these buckets (capped at ollama_chat_num_ctx)
+    # by estimated prompt length; keep the set small since every change reloads the model.
+    ollama_chat_num_ctx_buckets: List[int] = [2048, 4096, 8192]
+    # Consecutive smaller prompts needed before dropping to a smaller bucket.
+    ollama_chat_num_ctx_shrink_after: int = 20
     ollama_chat_max_tokens: int = 1024
     max_local_concurrent: int = 1
 
@@ -105,10 +261,39 @@ class Settings(BaseSettings):
     api_max_tokens: int = 1024
     api_top_p: float = 0.9
 
+    # Generation response cache (qa_mode=False only).
+    # Keyed by system prompt + user prompt + model/sampling params; cleared when the index version changes.
+    response_cache_enabled: bool = True
+    response_cache_max_entries: int = 512
+    response_cache_ttl_sec: int = 3600
+
+    # ---- Model warm-up / keep-alive ----
+    # Warm-up embeds a probe (and runs a one-token chat call when qa_mode=False)
+    # before /ready reports ready.
+    warmup_enabled: bool = True
+    # Sent as keep_alive on every Ollama call; how long a model stays loaded after use.
+    ollama_keep_alive: str = "30m"
+    # Periodic keep-alive pings so models stay resident during business hours.
+    keepalive_enabled: bool = True
+    keepalive_interval_sec: int = 240
+    keepalive_business_hours: str = "08:00-18:00"
+    # Python weekday numbers (Mon=0 ... Sun=6); default Saturday-Thursday
+    keepalive_business_days: List[int] = [5, 6, 0, 1, 2, 3]
+    keepalive_timezone: str = "Asia/Tehran"
+
     # Circuit breaker
     local_fails_to_open_circuit: int = 3
     local_circuit_reset_sec: int = 60
 
+    def embed_backend_urls(self) -> List[str]:
+        return list(self.ollama_embed_base_urls) or [self.ollama_base_url]
+
+    def chat_backend_urls(self) -> List[str]:
+        return list(self.ollama_chat_base_urls) or [self.ollama_base_url]
+
+    def serve_only(self) -> bool:
+        return bool(self.index_bundle_path)
+
     model_config = SettingsConfigDict(
         env_file=".env",
         env_file_encoding="utf-8",
@@ -18,3 +18,18 @@ class AppError(Exception):
         self.code = code
         self.status_code = status_code
         self.details = details or {}
+
+
+class DeadlineExceeded(AppError):
+    """
+    Raised when a request's time budget cannot cover a stage it cannot skip
+    (e.g. the query embedding).
+    """
+    def __init__(self, stage: str, remaining_ms: int = 0) -> None:
+        super().__init__(
+            "Request deadline exceeded",
+            code="deadline_exceeded",
+            status_code=504,
+            details={"stage": stage, "remaining_ms": int(remaining_ms)},
+        )
+        self.stage = stage
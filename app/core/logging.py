@@ -1,16 +1,201 @@
+import atexit
+import copy
+import json
 import logging
+import logging.handlers
+import queue
 import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
 
+from app.utils.tracing import current_trace
 
-def setup_logging(log_level: str = "INFO") -> None:
+TEXT_FORMAT = "%(asctime)s | %(levelname)s | %(name)s | %(message)s"
+
+_listener: Optional["_FlushingQueueListener"] = None
+_queue_handler: Optional["BoundedQueueHandler"] = None
+
+
+class RequestIdFilter(logging.Filter):
+    """
+    Stamps record.request_id from the current request trace (None outside requests).
+    Runs in the calling thread, where the request context is visible.
+    """
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, "request_id"):
+            trace = current_trace()
+            record.request_id = trace.request_id if trace is not None else None
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line: ts, level, logger, message, request_id (+ exc).
+    """
+    def format(self, record: logging.LogRecord) -> str:
+        out: Dict[str, Any] = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(record.created)) + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            out["exc"] = record.exc_text
+        return json.dumps(out, ensure_ascii=False, default=str)
+
+
+class BoundedQueueHandler(logging.handlers.QueueHandler):
     """
-    Configure basic app logging.
+    Enqueues records for the listener thread; the caller only pays for message interpolation.
+    Overflow policy when the queue is full:
+    - "drop": records below WARNING are dropped; WARNING and above wait up to block_sec,
+      then are dropped too
+    - "block": every record waits up to block_sec
+    Drops are counted and reported by a warning once the queue has room again.
     """
+    def __init__(self, q: "queue.Queue", overflow: str = "drop", block_sec: float = 0.1) -> None:
+        super().__init__(q)
+        self.overflow = overflow
+        self.block_sec = max(0.0, float(block_sec))
+        self.dropped = 0
+        self._unreported = 0
+        self._lock = threading.Lock()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Resolve args / exception here (they may reference objects that change later),
+        # leave the formatting itself to the listener's handlers.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            wait = self.overflow == "block" or record.levelno >= logging.WARNING
+            try:
+                if not wait or self.block_sec <= 0:
+                    raise queue.Full
+                self.queue.put(record, timeout=self.block_sec)
+            except queue.Full:
+                with self._lock:
+                    self.dropped += 1
+                    self._unreported += 1
+                return
+        if self._unreported:
+            with self._lock:
+                n, self._unreported = self._unreported, 0
+            if n:
+                note = logging.LogRecord(
+                    "app.core.logging", logging.WARNING, __file__, 0,
+                    "log queue full: dropped %d record(s)", (n,), None,
+                )
+                note.request_id = None
+                try:
+                    self.queue.put_nowait(self.prepare(note))
+                except queue.Full:
+                    pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": "queue",
+            "overflow": self.overflow,
+            "queue_depth": self.queue.qsize(),
+            "queue_max": self.queue.maxsize,
+            "dropped_total": self.dropped,
+        }
+
+
+class _FlushingQueueListener(logging.handlers.QueueListener):
+    def enqueue_sentinel(self) -> None:
+        # Blocking put: with a full queue the stdlib put_nowait would raise and skip the flush
+        self.queue.put(self._sentinel, timeout=5)
+
+
+def _formatter(fmt: str) -> logging.Formatter:
+    return JsonFormatter() if fmt == "json" else logging.Formatter(TEXT_FORMAT)
+
+
+def setup_logging(
+    log_level: str = "INFO",
+    mode: str = "sync",
+    fmt: str = "text",
+    queue_size: int = 10000,
+    overflow: str = "drop",
+    block_ms: int = 100,
+) -> None:
+    """
+    Configure app logging.
+    - mode "sync": handlers write in the calling thread (the old behaviour)
+    - mode "queue": the root logger only enqueues; a QueueListener thread formats and writes
+    - fmt "text" or "json" (JSON lines with request_id)
+    """
+    global _listener, _queue_handler
+    shutdown_logging()
     level = getattr(logging, log_level.upper(), logging.INFO)
 
-    logging.basicConfig(
-        level=level,
-        format="%(asctime)s | %(levelname)s | %(name)s | %(message)s",
-        handlers=[logging.StreamHandler(sys.stdout)],
-        force=True,
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(_formatter(fmt))
+    if mode != "queue":
+        stream.addFilter(RequestIdFilter())
+        logging.basicConfig(level=level, handlers=[stream], force=True)
+        return
+
+    _queue_handler = BoundedQueueHandler(
+        queue.Queue(maxsize=max(1, int(queue_size))),
+        overflow=overflow,
+        block_sec=block_ms / 1000.0,
     )
+    _queue_handler.addFilter(RequestIdFilter())
+    logging.basicConfig(level=level, handlers=[_queue_handler], force=True)
+    _listener = _FlushingQueueListener(_queue_handler.queue, stream, respect_handler_level=True)
+    _listener.start()
+
+
+def shutdown_logging() -> None:
+    """
+    Flush queued records and stop the listener thread (no-op in sync mode). Safe to call twice.
+    """
+    global _listener
+    listener, _listener = _listener, None
+    if listener is not None:
+        try:
+            listener.stop()
+        except queue.Full:
+            sys.stderr.write("log queue still full at shutdown; pending records lost\n")
+
+
+def logging_stats() -> Dict[str, Any]:
+    if _listener is None or _queue_handler is None:
+        return {"mode": "sync"}
+    return _queue_handler.stats()
+
+
+atexit.register(shutdown_logging)
+
+
+def setup_slow_query_log(path: str, max_bytes: int = 10 * 1024 * 1024, backups: int = 5) -> None:
+    """
+    Also write the rag.slow_query logger to a rotating file (one JSON record per line).
+    In queue mode the file handler runs on the listener thread as well.
+    """
+    if not path:
+        return
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8")
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    if _listener is not None:
+        handler.addFilter(logging.Filter("rag.slow_query"))
+        _listener.handlers = _listener.handlers + (handler,)
+        return
+    logging.getLogger("rag.slow_query").addHandler(handler)
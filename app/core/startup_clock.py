@@ -0,0 +1,7 @@
+"""
+Import-time clock for the startup profile: app.main imports this module first, so
+IMPORT_STARTED is taken before any other application or framework import.
+"""
+import time
+
+IMPORT_STARTED = time.perf_counter()
@@ -1,8 +1,12 @@
+from app.core.startup_clock import IMPORT_STARTED  # keep first: starts the import_ms clock
+
 import logging
 import threading
+import time
 
+import anyio.to_thread
 from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from starlette.exceptions import HTTPException as StarletteHTTPException
 
 from app.api.routes.health import router as health_router
@@ -12,21 +16,43 @@ from app.api.routes.admin import router as admin_router
 from app.api.routes.corpus import router as corpus_router
 
 from app.core.config import get_settings
-from app.core.logging import setup_logging
+from app.core.logging import logging_stats, setup_logging, setup_slow_query_log, shutdown_logging
 from app.core.exceptions import AppError
-from app.middleware.request_id import RequestIDMiddleware
-from app.middleware.timing import TimingMiddleware
+from app.middleware.admission import AdmissionMiddleware
+from app.middleware.auth import ApiKeyRateLimitMiddleware
+from app.middleware.observability import ObservabilityMiddleware
 from app.schemas.common import ErrorResponse
 from app.services.metrics_service import Metrics
-from app.services.ingestion_service import build_pipeline_from_existing_index, rebuild_index_and_pipeline
+from app.services.query_log import QueryLogWriter
+from app.services.ingestion_service import build_embedder, build_pipeline_from_existing_index, rebuild_index_and_pipeline
 
 from app.services.busy_detector import BusyDetector, CircuitBreaker
 from app.providers.local_provider import OllamaChatProvider
 from app.providers.api_provider import OpenAICompatChatProvider
 from app.providers.router import GeneratorRouter
+from app.providers.policies import ContextSizingPolicy
+from app.services.admission import AdmissionController
+from app.services.degradation import DecayingEWMA, DegradationController
+from app.services.pipeline_init import PipelineInitializer
+from app.services.reindex_jobs import ReindexManager
+from app.services.rate_limiter import ClientPolicy, RateLimiter, RedisBucketStore, build_key_policies
+from app.services.response_cache import ResponseCache
+from app.services.warmup import KeepAliveScheduler, warm_up_models
+from app.services.backend_pool import shared_pool
+from app.storage.embeddings.embedder import OllamaEmbedder
+
+IMPORT_MS = round((time.perf_counter() - IMPORT_STARTED) * 1000, 1)
 
 settings = get_settings()
-setup_logging(settings.log_level)
+setup_logging(
+    settings.log_level,
+    mode=settings.log_mode,
+    fmt=settings.log_format,
+    queue_size=settings.log_queue_size,
+    overflow=settings.log_queue_overflow,
+    block_ms=settings.log_queue_block_ms,
+)
+setup_slow_query_log(settings.slow_query_log_path)
 logger = logging.getLogger(__name__)
 
 app = FastAPI(
@@ -35,22 +61,208 @@ app = FastAPI(
     debug=settings.debug,
 )
 
-# Middlewares
-app.add_middleware(RequestIDMiddleware)
-app.add_middleware(TimingMiddleware)
+# Admission lanes (priority classes); paths not mapped to a lane bypass admission
+app.state.admission_lanes = {}
+if settings.admission_enabled:
+    app.state.admission_lanes = {
+        "query": AdmissionController(
+            "query",
+            max_in_flight=settings.admission_max_in_flight,
+            max_queue=settings.admission_max_queue,
+            queue_timeout_sec=settings.admission_queue_timeout_ms / 1000.0,
+        ),
+        "admin": AdmissionController(
+            "admin",
+            max_in_flight=settings.admission_admin_max_in_flight,
+            max_queue=settings.admission_admin_max_queue,
+            queue_timeout_sec=settings.admission_queue_timeout_ms / 1000.0,
+        ),
+    }
+
 
-# App state
+def _admission_lane(path: str) -> str | None:
+    if path.startswith(settings.api_prefix):
+        path = path[len(settings.api_prefix):]
+    if path == "/query":
+        return "query"
+    if path.startswith("/admin/"):
+        return "admin"
+    return None
+
+
+def _rate_limit_class(path: str) -> str | None:
+    if path.startswith(settings.api_prefix):
+        path = path[len(settings.api_prefix):]
+    if path == "/admin/reindex" or (path == "/query" and not settings.qa_mode):
+        return "expensive"
+    if path == "/query" or path.startswith(("/admin/", "/corpus", "/status")):
+        return "default"
+    return None
+
+
+_anonymous_policy = ClientPolicy(
+    name="anonymous",
+    rate_per_sec=settings.rate_limit_per_sec,
+    burst=settings.rate_limit_burst,
+    expensive_rate_per_sec=settings.rate_limit_expensive_per_sec,
+    expensive_burst=settings.rate_limit_expensive_burst,
+)
+app.state.rate_limiter = RateLimiter(
+    anonymous=_anonymous_policy,
+    keys=build_key_policies(settings.api_keys, _anonymous_policy),
+    store=RedisBucketStore(settings.rate_limit_redis_url) if settings.rate_limit_redis_url else None,
+)
+
+# Request counters (filled by the observability middleware and the routes)
 app.state.metrics = Metrics()
+
+# Middlewares (last added = outermost), all pure ASGI. Order, outside in:
+# observability (request id, timing, tracing, status counters), rate limit (abusive
+# clients are refused before they take a queue slot), admission.
+app.add_middleware(AdmissionMiddleware, lanes=app.state.admission_lanes, classify=_admission_lane)
+app.add_middleware(
+    ApiKeyRateLimitMiddleware,
+    limiter=app.state.rate_limiter,
+    classify=_rate_limit_class,
+    require_key=settings.auth_required,
+    enabled=settings.rate_limit_enabled,
+    trusted_proxies=settings.rate_limit_trusted_proxies,
+)
+app.add_middleware(
+    ObservabilityMiddleware,
+    metrics=app.state.metrics,
+    server_timing=settings.server_timing_enabled,
+    slow_ms=settings.slow_query_threshold_ms,
+    slow_sample_rate=settings.slow_query_sample_rate,
+)
+
+# App state
 app.state.reindex_lock = threading.Lock()
 app.state.rag_pipeline = None
 app.state.ingestion_report = {"indexed": False, "reason": "startup_not_run"}
 
+
+def _publish_pipeline(pipeline, report: dict) -> None:
+    # One reference swap: in-flight requests finish on the pipeline they already hold
+    app.state.rag_pipeline = pipeline
+    app.state.ingestion_report = report
+    app.state.corpus_summary_cache = None
+    # Backend stats in /metrics and the degradation signal read the serving embedder's pool
+    app.state.embed_pool = pipeline.retriever.embedder.pool
+    _ensure_warmup(pipeline.retriever.embedder)
+    logger.info("RAG ready (%s): %s", report.get("reason"), report.get("index_version"))
+
+
+# Every publish goes through _publish_pipeline: startup, lazy init, reindex jobs, admin reload / rollback
+app.state.publish_pipeline = _publish_pipeline
+
+
+# Background reindex jobs (POST /admin/reindex)
+app.state.reindex_jobs = ReindexManager(
+    build=lambda progress: rebuild_index_and_pipeline(get_settings(), progress=progress),
+    on_ready=_publish_pipeline,
+    lock=app.state.reindex_lock,
+    metrics=app.state.metrics,
+)
+
+
+def _lazy_build():
+    """
+    Pipeline for requests that found none: the index on disk, else (auto_ingest_on_startup)
+    a reindex job, joining the one already running if any.
+    - the job takes the same slot (reindex_lock) as /admin/reindex and rollback, and is
+      skipped if a pipeline was published while the index was being looked up
+    """
+    settings = get_settings()
+    pipeline, report = build_pipeline_from_existing_index(settings)
+    if pipeline is not None:
+        return pipeline, report
+    if not settings.auto_ingest_on_startup or settings.serve_only():
+        raise RuntimeError(f"index not available ({report.get('reason')})")
+    jobs = app.state.reindex_jobs
+    job = jobs.start(skip_if=lambda: app.state.rag_pipeline is not None) or jobs.current()
+    if job is not None:
+        job.wait()
+        if job.state != "succeeded":
+            raise RuntimeError(f"reindex {job.id} {job.state}: {job.error}")
+    else:
+        # Slot held by a rollback / reload, or a job that just finished: let it publish
+        with app.state.reindex_lock:
+            pass
+    if app.state.rag_pipeline is None:
+        raise RuntimeError("reindex finished without a pipeline")
+    return app.state.rag_pipeline, app.state.ingestion_report
+
+
+# Single-flight lazy init for requests that arrive with no pipeline (see deps.get_pipeline)
+app.state.pipeline_init = PipelineInitializer(
+    build=_lazy_build,
+    publish=_publish_pipeline,
+    wait_sec=settings.pipeline_init_wait_sec,
+    backoff_sec=settings.pipeline_init_backoff_sec,
+    metrics=app.state.metrics,
+)
+
 # Generation router state
 app.state.generator_router = None
 
 # Corpus summary cache (Phase 3.1)
 app.state.corpus_summary_cache = None
 
+# Model warm-up / keep-alive
+app.state.warmup_report = {"done": not settings.warmup_enabled, "reason": "not_started"}
+app.state.warmup_started = False
+app.state.keepalive_scheduler = None
+_warmup_lock = threading.Lock()
+
+# Ollama backend pools (health/latency per backend)
+app.state.embed_pool = None
+app.state.chat_pool = None
+
+
+# Query embedding latency only: the shared embed pool's EWMA also sees reindex batches and
+# failure penalties, and stops moving once the degraded levels make no query embeds
+app.state.query_embed_latency = DecayingEWMA(half_life_sec=settings.degradation_embed_decay_sec)
+
+
+def _degradation_signals() -> dict:
+    lane = app.state.admission_lanes.get("query")
+    return {
+        "load_ratio": lane.backlog / lane.max_in_flight if lane is not None else 0.0,
+        "embed_ewma_ms": app.state.query_embed_latency.value(),
+    }
+
+
+# Load-adaptive quality levels for /query
+app.state.degradation = DegradationController(
+    signals=_degradation_signals,
+    load_thresholds=settings.degradation_load_thresholds,
+    embed_ms_thresholds=settings.degradation_embed_ms_thresholds,
+    recover_sec=settings.degradation_recover_sec,
+    enabled=settings.degradation_enabled,
+)
+
+# Append-only /query log for analytics and replay (background writer, started at startup)
+app.state.query_log = None
+if settings.query_log_enabled:
+    app.state.query_log = QueryLogWriter(
+        settings.query_log_path,
+        max_queue=settings.query_log_max_queue,
+        max_bytes=settings.query_log_max_mb * 1024 * 1024,
+        rotate_interval_sec=settings.query_log_rotate_hours * 3600,
+        backups=settings.query_log_backups,
+    )
+
+# Cold-start profile (import + startup phases); in /metrics, and scripts/profile_startup.py
+app.state.startup_profile = {"import_ms": IMPORT_MS, "phases_ms": {}, "pipeline_load_ms": None, "total_ms": None}
+
+
+def _lap(phase: str, since: float) -> float:
+    now = time.perf_counter()
+    app.state.startup_profile["phases_ms"][phase] = round((now - since) * 1000, 1)
+    return now
+
+
 # Routers
 app.include_router(health_router, prefix=settings.api_prefix)
 app.include_router(status_router, prefix=settings.api_prefix)
@@ -64,11 +276,26 @@ def on_startup() -> None:
     """
     Startup:
     1) Setup generator router (local busy -> api fallback)
-    2) Setup RAG retrieval pipeline (load index or rebuild)
+    2) Setup RAG retrieval pipeline (load index or rebuild; serve-only: load the bundle)
+    3) Warm up models in the background (/ready waits for it), then keep them resident
+    4) Start the query log writer
+    Phase timings go to app.state.startup_profile.
     """
+    started = t = time.perf_counter()
+    if app.state.query_log is not None:
+        app.state.query_log.start()
+
     try:
         # 1) Generator Router
-        busy = BusyDetector(max_concurrent=settings.max_local_concurrent)
+        chat_pool = shared_pool(
+            tuple(settings.chat_backend_urls()),
+            strategy=settings.ollama_lb_strategy,
+            eject_after=settings.ollama_eject_after_failures,
+            eject_sec=settings.ollama_eject_sec,
+        )
+        app.state.chat_pool = chat_pool
+        # max_local_concurrent is per chat backend
+        busy = BusyDetector(max_concurrent=settings.max_local_concurrent * chat_pool.size)
         circuit = CircuitBreaker(
             fails_to_open=settings.local_fails_to_open_circuit,
             reset_sec=settings.local_circuit_reset_sec,
@@ -84,6 +311,13 @@ def on_startup() -> None:
             repeat_penalty=settings.ollama_chat_repeat_penalty,
             num_ctx=settings.ollama_chat_num_ctx,
             max_tokens=settings.ollama_chat_max_tokens,
+            keep_alive=settings.ollama_keep_alive,
+            pool=chat_pool,
+            context_policy=ContextSizingPolicy(
+                buckets=[b for b in settings.ollama_chat_num_ctx_buckets if b <= settings.ollama_chat_num_ctx]
+                or [settings.ollama_chat_num_ctx],
+                shrink_after=settings.ollama_chat_num_ctx_shrink_after,
+            ),
         )
 
         api = None
@@ -100,52 +334,144 @@ def on_startup() -> None:
                 top_p=settings.api_top_p,
             )
 
+        cache = None
+        if settings.response_cache_enabled:
+            cache = ResponseCache(
+                max_entries=settings.response_cache_max_entries,
+                ttl_sec=settings.response_cache_ttl_sec,
+            )
+
         app.state.generator_router = GeneratorRouter(
             local=local,
             api=api,
             busy=busy,
             circuit=circuit,
             api_fallback_enabled=settings.api_fallback_enabled,
+            cache=cache,
         )
+        t = _lap("generator_router", t)
 
         # 2) RAG pipeline
         pipeline, report = build_pipeline_from_existing_index(settings)
+        t = _lap("pipeline_load", t)
+        app.state.startup_profile["pipeline_load_ms"] = report.get("load_ms")
         if pipeline is not None:
-            app.state.rag_pipeline = pipeline
-            app.state.ingestion_report = report
-            logger.info("RAG ready (loaded): %s", report)
-            return
+            _publish_pipeline(pipeline, report)
 
-        if settings.auto_ingest_on_startup:
+        elif settings.auto_ingest_on_startup and not settings.serve_only():
             pipeline, report = rebuild_index_and_pipeline(settings)
-            app.state.rag_pipeline = pipeline
-            app.state.ingestion_report = report
-            logger.info("RAG ready (rebuilt): %s", report)
+            _publish_pipeline(pipeline, report)
+            t = _lap("pipeline_rebuild", t)
 
     except Exception as exc:
         logger.exception("Startup failed: %s", exc)
         app.state.ingestion_report = {"indexed": False, "error": str(exc)}
 
+    try:
+        # 3) Warm-up + keep-alive: already started by the publish above; otherwise (no index, failed
+        # build) start it here so /ready does not wait on a warm-up that never runs
+        _ensure_warmup()
+        _lap("warmup_start", t)
+    except Exception as exc:
+        logger.exception("Warm-up not started: %s", exc)
+    finally:
+        profile = app.state.startup_profile
+        profile["total_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        logger.info("startup profile: %s", profile)
+
+
+def _ensure_warmup(embedder: OllamaEmbedder | None = None) -> None:
+    """
+    Starts warm-up + keep-alive once per process: at startup, or on the first publish if
+    startup could not (embedder omitted: a fresh one on the shared embed pool).
+    """
+    with _warmup_lock:
+        if app.state.warmup_started:
+            return
+        if embedder is None:
+            embedder = build_embedder(settings)
+        app.state.warmup_started = True
+    if app.state.embed_pool is None:
+        app.state.embed_pool = embedder.pool
+    router = app.state.generator_router
+    chat = router.local if router is not None and not settings.qa_mode else None
+    _start_warmup(embedder, chat)
+
+
+def _start_warmup(embedder: OllamaEmbedder, chat: OllamaChatProvider | None) -> None:
+    """
+    Runs in a background thread so liveness (/health) answers while models load.
+    """
+    def run() -> None:
+        if settings.warmup_enabled:
+            app.state.warmup_report = {"done": False, "reason": "warming_up"}
+            chat_num_ctx = None
+            if chat is not None and chat.context_policy is not None:
+                # Load the chat model at the bucket a full-context prompt will use
+                chat_num_ctx = chat.context_policy.choose(settings.max_context_tokens, chat.max_tokens)
+            report = warm_up_models(embedder, chat, chat_num_ctx=chat_num_ctx)
+            app.state.warmup_report = {"done": True, **report}
+            if isinstance(app.state.ingestion_report, dict):
+                app.state.ingestion_report["warmup"] = report
+            logger.info("Warm-up finished: %s", report)
+
+        if settings.keepalive_enabled:
+            scheduler = KeepAliveScheduler(
+                targets=[embedder, chat],
+                interval_sec=settings.keepalive_interval_sec,
+                business_hours=settings.keepalive_business_hours,
+                business_days=settings.keepalive_business_days,
+                timezone=settings.keepalive_timezone,
+            )
+            scheduler.start()
+            app.state.keepalive_scheduler = scheduler
+
+    threading.Thread(target=run, name="model-warmup", daemon=True).start()
+
+
+@app.on_event("startup")
+async def reserve_threadpool() -> None:
+    """
+    Sync routes run in one shared threadpool: make sure it is larger than the admitted
+    in-flight work, so /health and /ready always find a free thread.
+    """
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    lanes = app.state.admission_lanes
+    needed = sum(lane.max_in_flight for lane in lanes.values()) + settings.threadpool_reserve
+    if limiter.total_tokens < needed:
+        limiter.total_tokens = needed
+
+
+@app.on_event("shutdown")
+def on_shutdown() -> None:
+    scheduler = getattr(app.state, "keepalive_scheduler", None)
+    if scheduler is not None:
+        scheduler.stop()
+    if app.state.query_log is not None:
+        app.state.query_log.stop()
+    # last, so the shutdown messages above are flushed too
+    shutdown_logging()
+
 
 # ---- Exception handlers (standard error shape) ----
 
 @app.exception_handler(AppError)
 async def app_error_handler(request: Request, exc: AppError):
     rid = getattr(request.state, "request_id", None)
-    app.state.metrics.inc("requests_error", 1)
     payload = ErrorResponse(
         error=exc.message,
         error_code=exc.code,
         request_id=rid,
         details=exc.details or None,
     )
-    return JSONResponse(status_code=exc.status_code, content=payload.model_dump())
+    retry_after = exc.details.get("retry_after_sec")
+    headers = {"Retry-After": str(retry_after)} if retry_after is not None else None
+    return JSONResponse(status_code=exc.status_code, content=payload.model_dump(), headers=headers)
 
 
 @app.exception_handler(StarletteHTTPException)
 async def http_exception_handler(request: Request, exc: StarletteHTTPException):
     rid = getattr(request.state, "request_id", None)
-    app.state.metrics.inc("requests_error", 1)
     payload = ErrorResponse(
         error=str(exc.detail),
         error_code="http_error",
@@ -158,7 +484,6 @@ async def http_exception_handler(request: Request, exc: StarletteHTTPException):
 @app.exception_handler(Exception)
 async def unhandled_exception_handler(request: Request, exc: Exception):
     rid = getattr(request.state, "request_id", None)
-    app.state.metrics.inc("requests_error", 1)
     payload = ErrorResponse(
         error="Internal server error",
         error_code="internal_error",
@@ -169,21 +494,6 @@ async def unhandled_exception_handler(request: Request, exc: Exception):
     return JSONResponse(status_code=500, content=payload.model_dump())
 
 
-@app.middleware("http")
-async def metrics_middleware(request: Request, call_next):
-    app.state.metrics.inc("requests_total", 1)
-    try:
-        response = await call_next(request)
-        if 200 <= response.status_code < 400:
-            app.state.metrics.inc("requests_ok", 1)
-        else:
-            app.state.metrics.inc("requests_error", 1)
-        return response
-    except Exception:
-        app.state.metrics.inc("requests_error", 1)
-        raise
-
-
 @app.get("/")
 def root() -> dict:
     return {
@@ -194,6 +504,44 @@ def root() -> dict:
     }
 
 
+def _backend_snapshot() -> dict:
+    pools = {"embed": app.state.embed_pool, "chat": app.state.chat_pool}
+    return {name: pool.snapshot() for name, pool in pools.items() if pool is not None}
+
+
 @app.get("/metrics")
-def metrics() -> dict:
-    return app.state.metrics.snapshot()
+async def metrics() -> dict:
+    # async on purpose: admission state is event-loop only, and /metrics must not need a worker thread
+    return {
+        **app.state.metrics.snapshot(),
+        "backends": _backend_snapshot(),
+        "admission": {name: lane.snapshot() for name, lane in app.state.admission_lanes.items()},
+        "rate_limit": app.state.rate_limiter.snapshot(),
+        "degradation": app.state.degradation.snapshot(),
+        "labeled": app.state.metrics.labeled(),
+        "histograms": app.state.metrics.histograms(),
+        "query_log": app.state.query_log.snapshot() if app.state.query_log is not None else None,
+        "logging": logging_stats(),
+        "pipeline_init": app.state.pipeline_init.snapshot(),
+        "startup": app.state.startup_profile,
+    }
+
+
+def _gauges() -> dict:
+    gauges = {"degradation_level": app.state.degradation.snapshot()["level"]}
+    for name, lane in app.state.admission_lanes.items():
+        gauges[f"admission_{name}_in_flight"] = lane.in_flight
+        gauges[f"admission_{name}_queue_depth"] = lane.queue_depth
+    for name, pool in (("embed", app.state.embed_pool), ("chat", app.state.chat_pool)):
+        if pool is not None:
+            gauges[f"ollama_{name}_outstanding"] = pool.outstanding()
+            gauges[f"ollama_{name}_ewma_ms"] = pool.ewma_ms()
+    return gauges
+
+
+@app.get("/metrics/prometheus", response_class=PlainTextResponse)
+async def metrics_prometheus() -> PlainTextResponse:
+    return PlainTextResponse(
+        app.state.metrics.render_prometheus(extra_gauges=_gauges()),
+        media_type="text/plain; version=0.0.4",
+    )
@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import json
+import time
+from typing import Callable, Dict, Optional
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.schemas.common import ErrorResponse
+from app.services.admission import AdmissionController, AdmissionRejected
+
+
+class AdmissionMiddleware:
+    """
+    Pure ASGI admission control in front of the routes.
+    - classify(path) -> lane name, or None for paths that bypass admission
+      (health/ready/metrics are never queued behind queries)
+    - each lane has its own AdmissionController, so admin calls never wait on query traffic
+    - rejected requests get a fast 503 with Retry-After
+    """
+    def __init__(
+        self,
+        app: ASGIApp,
+        lanes: Dict[str, AdmissionController],
+        classify: Callable[[str], Optional[str]],
+    ) -> None:
+        self.app = app
+        self.lanes = lanes
+        self.classify = classify
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        lane = self.lanes.get(self.classify(scope.get("path", "")) or "")
+        if lane is None:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            waited_ms = await lane.acquire()
+        except AdmissionRejected as rej:
+            await self._reject(scope, send, lane, rej)
+            return
+
+        scope.setdefault("state", {})["admission_wait_ms"] = round(waited_ms, 1)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            lane.release(service_sec=time.perf_counter() - started)
+
+    @staticmethod
+    async def _reject(scope: Scope, send: Send, lane: AdmissionController, rej: AdmissionRejected) -> None:
+        rid = (scope.get("state") or {}).get("request_id")
+        payload = ErrorResponse(
+            error="Service is overloaded, retry later",
+            error_code="overloaded",
+            request_id=rid,
+            details={"lane": lane.name, "reason": rej.reason, "retry_after_sec": rej.retry_after_sec},
+        )
+        body = json.dumps(payload.model_dump(), ensure_ascii=False).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(rej.retry_after_sec).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
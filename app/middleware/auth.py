@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import ipaddress
+import json
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.schemas.common import ErrorResponse
+from app.services.rate_limiter import ClientPolicy, RateDecision, RateLimiter
+
+IPNetwork = Union[ipaddress.IPv4Network, ipaddress.IPv6Network]
+
+
+def _header(scope: Scope, name: bytes) -> Optional[str]:
+    for k, v in scope.get("headers") or []:
+        if k == name:
+            return v.decode("latin-1").strip()
+    return None
+
+
+def extract_api_key(scope: Scope) -> Optional[str]:
+    """
+    X-API-Key header, or Authorization: Bearer <key>.
+    """
+    key = _header(scope, b"x-api-key")
+    if key:
+        return key
+    auth = _header(scope, b"authorization") or ""
+    if auth[:7].lower() == "bearer ":
+        return auth[7:].strip() or None
+    return None
+
+
+def _parse_networks(entries: Sequence[str]) -> List[IPNetwork]:
+    return [ipaddress.ip_network(e.strip(), strict=False) for e in entries if e and e.strip()]
+
+
+def _is_trusted(ip: str, networks: Sequence[IPNetwork]) -> bool:
+    try:
+        addr = ipaddress.ip_address(ip)
+    except ValueError:
+        return False
+    return any(addr in net for net in networks)
+
+
+def client_ip(scope: Scope, trusted_proxies: Sequence[IPNetwork] = ()) -> str:
+    """
+    Socket peer IP; when the peer is a trusted proxy, the right-most X-Forwarded-For entry
+    that is not a trusted proxy (entries left of it are client-supplied and not believed).
+    """
+    client = scope.get("client")
+    peer = client[0] if client else "unknown"
+    if not trusted_proxies or not _is_trusted(peer, trusted_proxies):
+        return peer
+    forwarded = [h.strip() for h in (_header(scope, b"x-forwarded-for") or "").split(",") if h.strip()]
+    for hop in reversed(forwarded):
+        if not _is_trusted(hop, trusted_proxies):
+            return hop
+    return forwarded[0] if forwarded else peer
+
+
+class ApiKeyRateLimitMiddleware:
+    """
+    Pure ASGI client identification + token-bucket rate limiting.
+    - client = API key (X-API-Key / Bearer) mapped to its policy; without a key the
+      client IP with the anonymous policy, unless require_key is set (401); see client_ip()
+      for X-Forwarded-For behind trusted_proxies
+    - classify(path) -> "default" | "expensive" | None (None = not limited, e.g. /health);
+      expensive calls (reindex, generation) draw from a separate, smaller bucket
+    - sets RateLimit-Limit / RateLimit-Remaining / RateLimit-Reset; 429 + Retry-After when empty
+    - scope["state"]: client_id, client_admin (for admin-only routes)
+    """
+    def __init__(
+        self,
+        app: ASGIApp,
+        limiter: RateLimiter,
+        classify: Callable[[str], Optional[str]],
+        require_key: bool = False,
+        enabled: bool = True,
+        trusted_proxies: Sequence[str] = (),
+    ) -> None:
+        self.app = app
+        self.limiter = limiter
+        self.classify = classify
+        self.require_key = require_key
+        self.enabled = enabled
+        self.trusted_proxies = _parse_networks(trusted_proxies)
+
+    def _identify(self, scope: Scope) -> Tuple[Optional[str], Optional[ClientPolicy], bool]:
+        """
+        -> (client_id, policy, key_was_presented); unknown keys give policy None.
+        """
+        key = extract_api_key(scope)
+        if key is not None:
+            policy = self.limiter.policy_for_key(key)
+            return (f"key:{policy.name}", policy, True) if policy else (None, None, True)
+        return f"ip:{client_ip(scope, self.trusted_proxies)}", self.limiter.anonymous, False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        client_id, policy, presented = self._identify(scope)
+        state = scope.setdefault("state", {})
+        state["client_id"] = client_id
+        state["client_admin"] = bool(policy and policy.admin)
+
+        limit_class = self.classify(scope.get("path", ""))
+        if limit_class is None:
+            await self.app(scope, receive, send)
+            return
+
+        if policy is None or (self.require_key and not presented):
+            code = "invalid_api_key" if presented else "missing_api_key"
+            await self._error(scope, send, 401, "Valid API key required", code, None, [])
+            return
+
+        if not self.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        decision = await self.limiter.check(client_id, policy, limit_class)
+        headers = self._headers(decision)
+        if not decision.allowed:
+            await self._error(
+                scope, send, 429, "Rate limit exceeded, retry later", "rate_limited",
+                {"client": policy.name, "limit_class": limit_class, "retry_after_sec": decision.retry_after_sec},
+                headers + [(b"retry-after", str(decision.retry_after_sec).encode())],
+            )
+            return
+
+        async def send_with_headers(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": list(message.get("headers") or []) + headers}
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+    @staticmethod
+    def _headers(decision: RateDecision) -> List[Tuple[bytes, bytes]]:
+        return [
+            (b"ratelimit-limit", str(decision.limit).encode()),
+            (b"ratelimit-remaining", str(decision.remaining).encode()),
+            (b"ratelimit-reset", str(decision.reset_sec).encode()),
+        ]
+
+    @staticmethod
+    async def _error(
+        scope: Scope,
+        send: Send,
+        status: int,
+        message: str,
+        code: str,
+        details: Optional[Dict[str, Any]],
+        headers: List[Tuple[bytes, bytes]],
+    ) -> None:
+        rid = (scope.get("state") or {}).get("request_id")
+        payload = ErrorResponse(error=message, error_code=code, request_id=rid, details=details)
+        body = json.dumps(payload.model_dump(), ensure_ascii=False).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                *headers,
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import json
+import logging
+import random
+import time
+import uuid
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.services.metrics_service import Metrics
+from app.utils.tracing import end_trace, start_trace
+
+slow_query_logger = logging.getLogger("rag.slow_query")
+
+
+class ObservabilityMiddleware:
+    """
+    Pure ASGI replacement for the RequestID / Timing / metrics layers.
+    - request id: incoming X-Request-ID or a new UUID4, in scope state and the response header
+    - X-Process-Time-Ms: time until the response headers are sent (streaming bodies are not delayed)
+    - counters: requests_total, requests_ok / requests_error, http_requests_total{status="<code>"}
+    - histogram http_request_duration_ms{route} (route template, so paths cannot explode cardinality)
+    - per-request trace (app.utils.tracing): Server-Timing header with the stage spans, and
+      requests slower than slow_ms are logged as JSON (sampled) to the rag.slow_query logger
+    No extra task or body buffering: messages are passed through, headers are appended once.
+    """
+    request_id_header = "X-Request-ID"
+    timing_header = "X-Process-Time-Ms"
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        metrics: Metrics,
+        server_timing: bool = True,
+        slow_ms: float = 0.0,
+        slow_sample_rate: float = 1.0,
+    ) -> None:
+        self.app = app
+        self.metrics = metrics
+        self.server_timing = server_timing
+        self.slow_ms = float(slow_ms)
+        self.slow_sample_rate = float(slow_sample_rate)
+        self._rid_header = self.request_id_header.lower().encode("latin-1")
+        self._timing_header = self.timing_header.lower().encode("latin-1")
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        rid = None
+        for k, v in scope.get("headers") or ():
+            if k == self._rid_header:
+                rid = v.decode("latin-1").strip() or None
+                break
+        rid = rid or str(uuid.uuid4())
+        state = scope.setdefault("state", {})
+        state["request_id"] = rid
+        status_code = 500
+        trace, token = start_trace(rid)
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                elapsed = (time.perf_counter() - started) * 1000
+                state["process_time_ms"] = int(elapsed)
+                headers = list(message.get("headers") or ())
+                headers.append((self._rid_header, rid.encode("latin-1", "replace")))
+                headers.append((self._timing_header, str(int(elapsed)).encode()))
+                if self.server_timing:
+                    headers.append((b"server-timing", trace.server_timing(total_ms=elapsed).encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            end_trace(token)
+            total_ms = (time.perf_counter() - started) * 1000
+            route_path = getattr(scope.get("route"), "path", None) or "unmatched"
+            # Unhandled exceptions surface here before Starlette's outer error
+            # middleware turns them into a 500, so status_code stays 500.
+            self.metrics.record_response(status_code)
+            self.metrics.observe("http_request_duration_ms", total_ms, {"route": route_path})
+            if self.slow_ms > 0 and total_ms >= self.slow_ms and random.random() < self.slow_sample_rate:
+                self._log_slow(scope, state, trace, route_path, status_code, total_ms)
+
+    @staticmethod
+    def _log_slow(scope: Scope, state: dict, trace, route_path: str, status_code: int, total_ms: float) -> None:
+        record = {
+            "ts": time.time(),
+            "request_id": state.get("request_id"),
+            "method": scope.get("method"),
+            "route": route_path,
+            "status": status_code,
+            "total_ms": round(total_ms, 1),
+            "admission_wait_ms": state.get("admission_wait_ms"),
+            "client_id": state.get("client_id"),
+            "spans": [{"stage": name, "ms": round(ms, 2)} for name, ms in trace.spans],
+            "breakdown": trace.breakdown(),
+            **trace.attrs,
+        }
+        slow_query_logger.warning("%s", json.dumps(record, ensure_ascii=False, default=str))
@@ -1,6 +1,8 @@
 from __future__ import annotations
 
 import time
+from typing import Any, Dict, Optional
+
 import httpx
 from app.providers.base import BaseGeneratorProvider, ProviderError
 
@@ -33,7 +35,21 @@ class OpenAICompatChatProvider(BaseGeneratorProvider):
         self.max_tokens = max_tokens
         self.top_p = top_p
 
-    def generate(self, system: str, user: str) -> str:
+    def cache_signature(self) -> Dict[str, Any]:
+        return {
+            "provider": "openai_compat",
+            "base_url": self.base_url,
+            "model": self.model,
+            "temperature": self.temperature,
+            "top_p": self.top_p,
+            "max_tokens": self.max_tokens,
+        }
+
+    def generate(self, system: str, user: str, timeout_sec: Optional[float] = None) -> str:
+        """
+        timeout_sec is the total budget for all attempts (retries included);
+        each attempt gets min(self.timeout_sec, what is left).
+        """
         if not self.api_key:
             raise ProviderError("api_key_missing")
 
@@ -53,10 +69,17 @@ class OpenAICompatChatProvider(BaseGeneratorProvider):
             "top_p": self.top_p,
         }
 
+        budget = float(timeout_sec) if timeout_sec is not None else float(self.timeout_sec) * (self.max_retries + 1)
+        ends_at = time.monotonic() + budget
+
         last_err = None
         for attempt in range(self.max_retries + 1):
+            remaining = ends_at - time.monotonic()
+            if remaining <= 0:
+                last_err = last_err or TimeoutError("api_budget_exhausted")
+                break
             try:
-                with httpx.Client(timeout=self.timeout_sec) as client:
+                with httpx.Client(timeout=min(float(self.timeout_sec), remaining)) as client:
                     r = client.post(url, headers=headers, json=payload)
                 r.raise_for_status()
                 data = r.json()
@@ -76,9 +99,10 @@ class OpenAICompatChatProvider(BaseGeneratorProvider):
 
             except (httpx.TimeoutException, httpx.HTTPError, Exception) as exc:
                 last_err = exc
-                # simple backoff
-                if attempt < self.max_retries:
-                    time.sleep(0.4 * (attempt + 1))
+                # simple backoff, only if another attempt still fits in the budget
+                backoff = 0.4 * (attempt + 1)
+                if attempt < self.max_retries and ends_at - time.monotonic() > backoff:
+                    time.sleep(backoff)
                     continue
                 break
 
@@ -1,6 +1,6 @@
 from __future__ import annotations
-from dataclasses import dataclass
-from typing import Optional
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Tuple
 
 
 @dataclass
@@ -8,6 +8,9 @@ class GenerationResult:
     answer: str
     provider_used: str
     fallback_reason: Optional[str] = None
+    cached: bool = False
+    # Provider timing counters (e.g. Ollama num_ctx / prefill time); empty when not reported
+    stats: Dict[str, Any] = field(default_factory=dict)
 
 
 class ProviderError(RuntimeError):
@@ -15,5 +18,19 @@ class ProviderError(RuntimeError):
 
 
 class BaseGeneratorProvider:
-    def generate(self, system: str, user: str) -> str:
+    def generate(self, system: str, user: str, timeout_sec: Optional[float] = None) -> str:
+        raise NotImplementedError
+
+    def generate_with_stats(
+        self,
+        system: str,
+        user: str,
+        timeout_sec: Optional[float] = None,
+    ) -> Tuple[str, Dict[str, Any]]:
+        return self.generate(system=system, user=user, timeout_sec=timeout_sec), {}
+
+    def cache_signature(self) -> Dict[str, Any]:
+        """
+        Model + sampling parameters that change the output (part of the response cache key).
+        """
         raise NotImplementedError
@@ -1,12 +1,29 @@
 from __future__ import annotations
 
+from typing import Any, Dict, Optional, Tuple
+
 import httpx
 from app.providers.base import BaseGeneratorProvider, ProviderError
+from app.providers.policies import ContextSizingPolicy
+from app.rag.token_estimator import TokenEstimator
+from app.services.backend_pool import BackendPool
+
+_NS_PER_MS = 1_000_000
+
+
+def _duration_ms(data: dict, key: str) -> Optional[float]:
+    v = data.get(key)
+    if isinstance(v, (int, float)):
+        return round(float(v) / _NS_PER_MS, 2)
+    return None
 
 
 class OllamaChatProvider(BaseGeneratorProvider):
     """
     Ollama chat provider via /api/chat
+    - num_ctx comes from the context sizing policy when one is set (else the fixed num_ctx)
+    - generate_with_stats also returns Ollama's timing counters (prefill = prompt_eval_duration)
+    - with a multi-backend pool each call goes to the backend the pool picks
     """
     def __init__(
         self,
@@ -19,8 +36,12 @@ class OllamaChatProvider(BaseGeneratorProvider):
         repeat_penalty: float = 1.1,
         num_ctx: int = 8192,
         max_tokens: int = 1024,
+        context_policy: Optional[ContextSizingPolicy] = None,
+        keep_alive: Optional[str] = None,
+        pool: Optional[BackendPool] = None,
     ) -> None:
-        self.base_url = base_url.rstrip("/")
+        self.pool = pool or BackendPool([base_url])
+        self.base_url = self.pool.urls[0]
         self.model = model
         self.timeout_sec = timeout_sec
         self.temperature = temperature
@@ -29,8 +50,92 @@ class OllamaChatProvider(BaseGeneratorProvider):
         self.repeat_penalty = repeat_penalty
         self.num_ctx = num_ctx
         self.max_tokens = max_tokens
+        self.context_policy = context_policy
+        # How long Ollama keeps the model loaded after each call (e.g. "30m"); None = server default
+        self.keep_alive = keep_alive
+        self.token_estimator = TokenEstimator(model)
+
+    def cache_signature(self) -> Dict[str, Any]:
+        return {
+            "provider": "ollama",
+            "model": self.model,
+            "temperature": self.temperature,
+            "top_p": self.top_p,
+            "top_k": self.top_k,
+            "repeat_penalty": self.repeat_penalty,
+            "num_predict": self.max_tokens,
+        }
+
+    def _current_num_ctx(self) -> int:
+        if self.context_policy is not None:
+            current = self.context_policy.snapshot()["current"]
+            return int(current or self.context_policy.buckets[-1])
+        return int(self.num_ctx)
+
+    def warm_up(self, num_ctx: Optional[int] = None, timeout_sec: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Tiny chat call (one output token) on every backend; loads the model with the given num_ctx.
+        Returns Ollama's load/total timings per backend.
+        """
+        num_ctx = int(num_ctx or self._current_num_ctx())
+        payload = {
+            "model": self.model,
+            "stream": False,
+            "messages": [{"role": "user", "content": "ping"}],
+            "options": {"num_ctx": num_ctx, "num_predict": 1},
+        }
+        if self.keep_alive:
+            payload["keep_alive"] = self.keep_alive
+        backends: Dict[str, Any] = {}
+        with httpx.Client(timeout=timeout_sec or self.timeout_sec) as client:
+            for url in self.pool.urls:
+                r = client.post(f"{url}/api/chat", json=payload)
+                r.raise_for_status()
+                data = r.json()
+                backends[url] = {
+                    "load_ms": _duration_ms(data, "load_duration"),
+                    "total_ms": _duration_ms(data, "total_duration"),
+                }
+        return {"num_ctx": num_ctx, "backends": backends}
+
+    def keep_alive_ping(self, timeout_sec: Optional[float] = None) -> None:
+        """
+        Refresh residency on every backend without generating: /api/generate with
+        no prompt only loads the model (same num_ctx as live traffic, so no reload).
+        """
+        payload: Dict[str, Any] = {
+            "model": self.model,
+            "options": {"num_ctx": self._current_num_ctx()},
+        }
+        if self.keep_alive:
+            payload["keep_alive"] = self.keep_alive
+        errors = []
+        with httpx.Client(timeout=timeout_sec or self.timeout_sec) as client:
+            for url in self.pool.urls:
+                try:
+                    r = client.post(f"{url}/api/generate", json=payload)
+                    r.raise_for_status()
+                except Exception as exc:
+                    errors.append(f"{url}: {exc}")
+        if errors:
+            raise RuntimeError("; ".join(errors))
+
+    def generate(self, system: str, user: str, timeout_sec: Optional[float] = None) -> str:
+        return self.generate_with_stats(system=system, user=user, timeout_sec=timeout_sec)[0]
+
+    def generate_with_stats(
+        self,
+        system: str,
+        user: str,
+        timeout_sec: Optional[float] = None,
+    ) -> Tuple[str, Dict[str, Any]]:
+        # The system message goes first and unchanged on every call so Ollama can
+        # reuse the KV cache for that prefix; keep anything per-request out of it.
+        prompt_tokens = self.token_estimator.count(system) + self.token_estimator.count(user)
+        num_ctx = self.num_ctx
+        if self.context_policy is not None:
+            num_ctx = self.context_policy.choose(prompt_tokens, self.max_tokens)
 
-    def generate(self, system: str, user: str) -> str:
         payload = {
             "model": self.model,
             "stream": False,
@@ -43,27 +148,47 @@ class OllamaChatProvider(BaseGeneratorProvider):
                 "top_p": self.top_p,
                 "top_k": self.top_k,
                 "repeat_penalty": self.repeat_penalty,
-                "num_ctx": self.num_ctx,
+                "num_ctx": num_ctx,
                 "num_predict": self.max_tokens,
             },
         }
+        if self.keep_alive:
+            payload["keep_alive"] = self.keep_alive
 
         try:
-            with httpx.Client(timeout=self.timeout_sec) as client:
-                r = client.post(f"{self.base_url}/api/chat", json=payload)
+            timeout = timeout_sec if timeout_sec is not None else self.timeout_sec
+            with self.pool.acquire() as backend, httpx.Client(timeout=timeout) as client:
+                r = client.post(f"{backend.url}/api/chat", json=payload)
                 r.raise_for_status()
                 data = r.json()
 
+            stats = {
+                "backend": backend.url,
+                "num_ctx": num_ctx,
+                "prompt_tokens_est": prompt_tokens,
+                "prompt_eval_count": data.get("prompt_eval_count"),
+                "prompt_eval_ms": _duration_ms(data, "prompt_eval_duration"),
+                "load_ms": _duration_ms(data, "load_duration"),
+                "eval_count": data.get("eval_count"),
+                "eval_ms": _duration_ms(data, "eval_duration"),
+                "total_ms": _duration_ms(data, "total_duration"),
+            }
+            # prompt_eval_count only covers tokens not served from the prefix cache;
+            # calibrate only when (almost) the whole prompt was evaluated.
+            evaluated = data.get("prompt_eval_count")
+            if isinstance(evaluated, int) and evaluated >= prompt_tokens * 0.5:
+                self.token_estimator.calibrate(prompt_tokens, evaluated)
+
             # Typical shape: {"message": {"role":"assistant","content":"..."}}
             msg = data.get("message") or {}
             content = msg.get("content")
             if isinstance(content, str) and content.strip():
-                return content.strip()
+                return content.strip(), stats
 
             # Fallback: some versions return "response"
             resp = data.get("response")
             if isinstance(resp, str) and resp.strip():
-                return resp.strip()
+                return resp.strip(), stats
 
             raise ProviderError(f"Ollama returned unexpected response: {data}")
 
@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import threading
+from typing import Any, Dict, Iterable
+
+
+class ContextSizingPolicy:
+    """
+    Picks Ollama's num_ctx from a small fixed set of buckets.
+    - bucket = smallest one that holds prompt + output reservation (largest if none does)
+    - grows immediately, shrinks only after `shrink_after` consecutive requests
+      that would fit a smaller bucket: every num_ctx change makes Ollama
+      reload the model, so we trade a little KV memory for fewer reloads
+    """
+    def __init__(self, buckets: Iterable[int] = (2048, 4096, 8192), shrink_after: int = 20) -> None:
+        self.buckets = sorted({int(b) for b in buckets if int(b) > 0}) or [8192]
+        self.shrink_after = max(0, int(shrink_after))
+        self._lock = threading.Lock()
+        self._current = 0
+        self._smaller_streak = 0
+        self._changes = 0
+
+    def fit(self, prompt_tokens: int, max_output_tokens: int) -> int:
+        need = int(prompt_tokens) + int(max_output_tokens)
+        for b in self.buckets:
+            if need <= b:
+                return b
+        return self.buckets[-1]
+
+    def choose(self, prompt_tokens: int, max_output_tokens: int) -> int:
+        wanted = self.fit(prompt_tokens, max_output_tokens)
+        with self._lock:
+            if wanted >= self._current:
+                if wanted != self._current:
+                    self._changes += 1
+                self._current = wanted
+                self._smaller_streak = 0
+                return wanted
+
+            self._smaller_streak += 1
+            if self._smaller_streak > self.shrink_after:
+                self._current = wanted
+                self._smaller_streak = 0
+                self._changes += 1
+            return self._current
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "buckets": list(self.buckets),
+                "current": self._current,
+                "shrink_after": self.shrink_after,
+                "changes": self._changes,
+            }
@@ -1,9 +1,22 @@
 from __future__ import annotations
 
-from app.providers.base import GenerationResult
+from dataclasses import replace
+from typing import Optional
+
+from app.providers.base import GenerationResult, ProviderError
 from app.providers.local_provider import OllamaChatProvider
 from app.providers.api_provider import OpenAICompatChatProvider
 from app.services.busy_detector import BusyDetector, CircuitBreaker
+from app.services.response_cache import ResponseCache
+from app.utils.singleflight import SingleFlight, SingleFlightTimeout
+from app.utils.timeouts import Deadline, budget_or_default
+
+# Only real generations are cached; "none" results (busy, circuit open, deadline) are transient
+_CACHEABLE_PROVIDERS = ("local", "api")
+
+
+def is_answer(res: GenerationResult) -> bool:
+    return bool(res.answer) and res.provider_used in _CACHEABLE_PROVIDERS
 
 
 class GeneratorRouter:
@@ -14,63 +27,146 @@ class GeneratorRouter:
         busy: BusyDetector,
         circuit: CircuitBreaker,
         api_fallback_enabled: bool = True,
+        cache: ResponseCache | None = None,
     ) -> None:
         self.local = local
         self.api = api
         self.busy = busy
         self.circuit = circuit
         self.api_fallback_enabled = bool(api_fallback_enabled)
+        self.cache = cache
+        self._flight = SingleFlight()
+
+    def cache_key(self, system: str, user: str) -> str:
+        return ResponseCache.make_key(
+            system=system,
+            user=user,
+            local=self.local.cache_signature(),
+            api=self.api.cache_signature() if self.api is not None else None,
+        )
+
+    def generate(
+        self,
+        system: str,
+        user: str,
+        deadline: Optional[Deadline] = None,
+        index_version: Optional[str] = None,
+        cache_only: bool = False,
+    ) -> GenerationResult:
+        """
+        Cached + coalesced generation:
+        - a cache hit returns immediately
+        - concurrent identical prompts share one generation (single-flight); only a real
+          answer is shared, waiters run their own call when the leader got none
+        - cache_only=True (load shedding): never call a model, a miss returns an empty answer
+        """
+        if self.cache is None:
+            if cache_only:
+                return GenerationResult(answer="", provider_used="none", fallback_reason="degraded_cache_only")
+            return self._generate(system, user, deadline=deadline)
+
+        self.cache.ensure_index_version(index_version)
+        key = self.cache_key(system, user)
+        hit = self.cache.get(key)
+        if hit is not None:
+            return replace(hit, cached=True)
+        if cache_only:
+            return GenerationResult(answer="", provider_used="none", fallback_reason="degraded_cache_only")
+
+        def run() -> GenerationResult:
+            res = self._generate(system, user, deadline=deadline)
+            if is_answer(res):
+                self.cache.put(key, res)
+            return res
 
-    def generate(self, system: str, user: str) -> GenerationResult:
+        wait_sec = deadline.remaining_sec() if deadline is not None else None
+        try:
+            res, shared = self._flight.do(key, run, timeout=wait_sec)
+        except SingleFlightTimeout:
+            if deadline is not None:
+                deadline.mark_exhausted("generate_wait")
+            return GenerationResult(answer="", provider_used="none", fallback_reason="deadline_exceeded")
+        if not shared:
+            return res
+        if is_answer(res):
+            return replace(res, cached=True)
+        # The leader's non-answer (its own deadline, busy local, failed providers) is not
+        # ours to reuse: run our own call with our own deadline
+        return run()
+
+    def _fallback(
+        self,
+        system: str,
+        user: str,
+        reason: str,
+        no_api_answer: str,
+        no_api_reason: str,
+        deadline: Optional[Deadline] = None,
+    ) -> GenerationResult:
+        """
+        Send the request to the API provider if enabled and the deadline still covers it.
+        - an API failure returns an empty answer (provider "none"), never raises
+        """
+        if not (self.api_fallback_enabled and self.api is not None):
+            return GenerationResult(answer=no_api_answer, provider_used="none", fallback_reason=no_api_reason)
+
+        timeout_sec = budget_or_default(deadline, "api_fallback", self.api.timeout_sec * (self.api.max_retries + 1))
+        if timeout_sec is None:
+            return GenerationResult(answer="", provider_used="none", fallback_reason="deadline_exceeded")
+
+        try:
+            ans = self.api.generate(system=system, user=user, timeout_sec=timeout_sec)
+        except ProviderError as exc:
+            # No key, API down or budget spent: no generated answer, the caller degrades
+            return GenerationResult(answer="", provider_used="none", fallback_reason=f"api_failed: {exc} ({reason})")
+        return GenerationResult(answer=ans, provider_used="api", fallback_reason=reason)
+
+    def _generate(self, system: str, user: str, deadline: Optional[Deadline] = None) -> GenerationResult:
         # If circuit is open, skip local
         if self.circuit.is_open():
-            if self.api_fallback_enabled and self.api is not None:
-                ans = self.api.generate(system=system, user=user)
-                return GenerationResult(
-                    answer=ans,
-                    provider_used="api",
-                    fallback_reason="local_circuit_open",
-                )
-            return GenerationResult(
-                answer="Local provider is temporarily unavailable (circuit open) and API fallback is disabled.",
-                provider_used="none",
-                fallback_reason="local_circuit_open_no_api",
+            return self._fallback(
+                system, user,
+                reason="local_circuit_open",
+                no_api_answer="Local provider is temporarily unavailable (circuit open) and API fallback is disabled.",
+                no_api_reason="local_circuit_open_no_api",
+                deadline=deadline,
+            )
+
+        # Not enough budget left for a local generation: go straight to the API
+        local_timeout = budget_or_default(deadline, "local_generate", self.local.timeout_sec)
+        if local_timeout is None:
+            return self._fallback(
+                system, user,
+                reason="deadline_local_skipped",
+                no_api_answer="",
+                no_api_reason="deadline_exceeded",
+                deadline=deadline,
             )
 
         # Busy detection (non-blocking)
         acq = self.busy.acquire_nowait()
         if not acq.acquired:
-            if self.api_fallback_enabled and self.api is not None:
-                ans = self.api.generate(system=system, user=user)
-                return GenerationResult(
-                    answer=ans,
-                    provider_used="api",
-                    fallback_reason=acq.reason,
-                )
-            return GenerationResult(
-                answer="Local provider is busy and API fallback is disabled.",
-                provider_used="none",
-                fallback_reason="local_busy_no_api",
+            return self._fallback(
+                system, user,
+                reason=acq.reason,
+                no_api_answer="Local provider is busy and API fallback is disabled.",
+                no_api_reason="local_busy_no_api",
+                deadline=deadline,
             )
 
         # Have local slot: try local then fallback on error/timeout
         try:
-            ans = self.local.generate(system=system, user=user)
+            ans, stats = self.local.generate_with_stats(system=system, user=user, timeout_sec=local_timeout)
             self.circuit.record_success()
-            return GenerationResult(answer=ans, provider_used="local")
+            return GenerationResult(answer=ans, provider_used="local", stats=stats)
         except Exception as exc:
             self.circuit.record_failure()
-            if self.api_fallback_enabled and self.api is not None:
-                ans = self.api.generate(system=system, user=user)
-                return GenerationResult(
-                    answer=ans,
-                    provider_used="api",
-                    fallback_reason=f"local_failed: {type(exc).__name__}",
-                )
-            return GenerationResult(
-                answer=f"Local provider failed and API fallback is disabled. Error: {exc}",
-                provider_used="none",
-                fallback_reason="local_failed_no_api",
+            return self._fallback(
+                system, user,
+                reason=f"local_failed: {type(exc).__name__}",
+                no_api_answer=f"Local provider failed and API fallback is disabled. Error: {exc}",
+                no_api_reason="local_failed_no_api",
+                deadline=deadline,
             )
         finally:
             self.busy.release()
@@ -1,4 +1,20 @@
-from typing import Dict, List
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set
+
+from app.rag.token_estimator import TokenEstimator
+from app.services.reranker import tokenize_for_match
+
+
+def _record_text(r: Dict) -> str:
+    text = (r.get("text") or "").strip()
+    if text:
+        return text
+    # QA records carry question/answer instead of raw text
+    q = (r.get("question") or "").strip()
+    a = (r.get("answer") or "").strip()
+    return f"Q: {q}\nA: {a}".strip() if (q or a) else ""
 
 
 def format_context_blocks(results: List[Dict], max_context_chars: int = 2400) -> str:
@@ -11,7 +27,7 @@ def format_context_blocks(results: List[Dict], max_context_chars: int = 2400) ->
     blocks = []
     used = 0
     for i, r in enumerate(results, start=1):
-        text = (r.get("text") or "").strip()
+        text = _record_text(r)
         score = r.get("score", 0.0)
         chunk_id = r.get("chunk_id", f"chunk-{i}")
         block = f"[{i}] ({chunk_id}, score={score:.4f})\n{text}"
@@ -21,3 +37,86 @@ def format_context_blocks(results: List[Dict], max_context_chars: int = 2400) ->
         used += len(block) + 2
 
     return "\n\n".join(blocks)
+
+
+@dataclass
+class AssembledContext:
+    text: str
+    tokens: int
+    used: List[Dict[str, Any]] = field(default_factory=list)
+    dropped_duplicates: int = 0
+    dropped_over_budget: int = 0
+
+
+def _near_duplicate(tokens: Set[str], kept: List[Set[str]], threshold: float) -> bool:
+    if not tokens:
+        return False
+    for other in kept:
+        if not other:
+            continue
+        overlap = len(tokens & other) / (len(tokens | other) or 1)
+        if overlap >= threshold:
+            return True
+    return False
+
+
+def assemble_context(
+    results: List[Dict],
+    estimator: TokenEstimator,
+    max_tokens: int,
+    dedup_threshold: float = 0.85,
+    max_blocks: Optional[int] = None,
+) -> AssembledContext:
+    """
+    Token-budgeted context for generation.
+    - ranks candidates by rerank score (combined_score, falling back to vector score)
+    - drops near-duplicate FAQ entries (token Jaccard of question / answer >= dedup_threshold)
+    - fills the token budget greedily; blocks that do not fit are skipped, smaller ones may still fit
+    """
+    ranked = sorted(
+        results,
+        key=lambda r: float(r.get("combined_score", r.get("score", 0.0)) or 0.0),
+        reverse=True,
+    )
+
+    blocks: List[str] = []
+    used: List[Dict[str, Any]] = []
+    kept_q: List[Set[str]] = []
+    kept_a: List[Set[str]] = []
+    total = 0
+    dup = 0
+    over = 0
+    sep_tokens = estimator.count("\n\n")
+
+    for r in ranked:
+        if max_blocks is not None and len(blocks) >= max_blocks:
+            break
+        text = _record_text(r)
+        if not text:
+            continue
+
+        q_tokens = set(tokenize_for_match(r.get("question") or text))
+        a_tokens = set(tokenize_for_match(r.get("answer") or ""))
+        if _near_duplicate(q_tokens, kept_q, dedup_threshold) or _near_duplicate(a_tokens, kept_a, dedup_threshold):
+            dup += 1
+            continue
+
+        block = f"[{len(blocks) + 1}] {text}"
+        cost = estimator.count(block) + (sep_tokens if blocks else 0)
+        if total + cost > max_tokens:
+            over += 1
+            continue
+
+        blocks.append(block)
+        used.append(r)
+        kept_q.append(q_tokens)
+        kept_a.append(a_tokens)
+        total += cost
+
+    return AssembledContext(
+        text="\n\n".join(blocks),
+        tokens=total,
+        used=used,
+        dropped_duplicates=dup,
+        dropped_over_budget=over,
+    )
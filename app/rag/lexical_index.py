@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+from typing import Dict, List, Optional, Sequence, Set
+
+from app.services.reranker import jaccard, tokenize_for_match
+
+
+class LexicalIndex:
+    """
+    Inverted index over FAQ questions (match-normalised tokens).
+    Used when no query embedding can be afforded: candidates share at least one
+    token with the query and are scored by Jaccard overlap with the question.
+    """
+    def __init__(self, records: Sequence[Dict], tokens: Optional[Sequence[Sequence[str]]] = None) -> None:
+        """
+        tokens: precomputed token lists per record (see token_lists(), index bundles);
+        tokenised here when omitted.
+        """
+        self.records = list(records)
+        if tokens is not None and len(tokens) != len(self.records):
+            raise ValueError(f"Records/tokens mismatch: {len(self.records)} != {len(tokens)}")
+        self._tokens: List[Set[str]] = []
+        self._postings: Dict[str, List[int]] = {}
+        for i, rec in enumerate(self.records):
+            if tokens is not None:
+                rec_tokens = set(tokens[i])
+            else:
+                rec_tokens = set(tokenize_for_match(rec.get("question") or rec.get("text") or ""))
+            self._tokens.append(rec_tokens)
+            for t in rec_tokens:
+                self._postings.setdefault(t, []).append(i)
+
+    def token_lists(self) -> List[List[str]]:
+        return [sorted(t) for t in self._tokens]
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def search(self, query: str, top_k: int = 5) -> List[Dict]:
+        q_tokens = tokenize_for_match(query)
+        candidates: Set[int] = set()
+        for t in set(q_tokens):
+            candidates.update(self._postings.get(t, ()))
+
+        scored = [(jaccard(q_tokens, list(self._tokens[i])), i) for i in candidates]
+        scored.sort(key=lambda x: (-x[0], x[1]))
+        return [
+            {**self.records[i], "score": score, "match_jaccard": score}
+            for score, i in scored[: max(1, int(top_k))]
+        ]
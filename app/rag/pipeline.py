@@ -1,13 +1,38 @@
 from __future__ import annotations
-from typing import Dict
+from typing import Any, Dict, Optional
+
+from app.utils.timeouts import Deadline
+
 
 class RAGPipeline:
-    def __init__(self, retriever, max_context_chars: int = 2400) -> None:
+    def __init__(self, retriever, max_context_chars: int = 2400, index_version: str = "") -> None:
         self.retriever = retriever
         self.max_context_chars = max_context_chars
+        # Identifies the index build this pipeline serves (used to invalidate caches on swap)
+        self.index_version = index_version
 
-    def retrieve(self, query: str, top_k: int = 5) -> Dict:
-        results = self.retriever.retrieve(query=query, top_k=top_k)
+    def retrieve(
+        self,
+        query: str,
+        top_k: int = 5,
+        deadline: Optional[Deadline] = None,
+        mode: str = "vector",
+    ) -> Dict:
+        """
+        mode: "vector" (embed + search), "cache_only" (vector search only with a cached
+        query embedding, else lexical), "lexical" (no embedding at all).
+        """
+        results = None
+        used = mode
+        timings: Dict[str, Any] = {}
+        if mode == "cache_only":
+            results = self.retriever.retrieve_cached(query=query, top_k=top_k, timings=timings)
+            used = "vector_cached" if results is not None else "lexical"
+        elif mode == "vector":
+            results = self.retriever.retrieve(query=query, top_k=top_k, deadline=deadline, timings=timings)
+        if results is None:
+            results = self.retriever.lexical_search(query=query, top_k=top_k, timings=timings)
+            used = "lexical"
 
         sources = []
         for r in results:
@@ -25,4 +50,6 @@ class RAGPipeline:
             "raw_results": results,
             "sources": sources,
             "retrieval_count": len(results),
+            "retrieval_mode": used,
+            "timings": timings,
         }
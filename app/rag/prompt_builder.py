@@ -9,3 +9,12 @@ def build_rag_prompt(query: str, context: str) -> str:
         f"متن مرتبط با سوال:\n{context}\n\n"
         "اگر پاسخی در متن مرتبط نبود، بگو که نمی دونی."
     )
+
+
+# Sent as the first message on every generation call. Keep it a constant
+# (no dates, ids or per-request text): Ollama reuses the KV cache for an
+# identical prompt prefix, so a byte-stable system prompt is never re-prefilled.
+RAG_SYSTEM_PROMPT = (
+    "You are a QA assistant. The CONTEXT contains retrieved QA entries.\n"
+    "Answer using ONLY the CONTEXT. If not found, say you don't know."
+)
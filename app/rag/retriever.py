@@ -1,16 +1,104 @@
-from typing import Dict, List
+import threading
+from typing import Any, Dict, List, Optional
 
+from app.rag.lexical_index import LexicalIndex
+from app.storage.embeddings.cache import EmbeddingCache
 from app.storage.embeddings.embedder import OllamaEmbedder
 from app.storage.vectorstore.base import VectorStoreProtocol
 from app.services.text_normalizer import normalize_chars_fa
+from app.core.exceptions import DeadlineExceeded
+from app.utils.timeouts import Deadline
+from app.utils.tracing import span
 
 
 class RAGRetriever:
-    def __init__(self, store: VectorStoreProtocol, embedder: OllamaEmbedder) -> None:
+    def __init__(
+        self,
+        store: VectorStoreProtocol,
+        embedder: OllamaEmbedder,
+        embedding_cache: Optional[EmbeddingCache] = None,
+        lexical: Optional[LexicalIndex] = None,
+    ) -> None:
         self.store = store
         self.embedder = embedder
+        self.embedding_cache = embedding_cache
+        # Prebuilt when the index is loaded from disk; otherwise built on first lexical_search()
+        self._lexical: Optional[LexicalIndex] = lexical
+        self._lexical_lock = threading.Lock()
 
-    def retrieve(self, query: str, top_k: int = 5) -> List[Dict]:
-        q_norm = normalize_chars_fa(query)
-        qvec = self.embedder.embed_text(q_norm)
-        return self.store.search(query_vector=qvec, top_k=top_k)
+    def retrieve(
+        self,
+        query: str,
+        top_k: int = 5,
+        deadline: Optional[Deadline] = None,
+        timings: Optional[Dict[str, Any]] = None,
+    ) -> List[Dict]:
+        """
+        timings (optional, filled in): embed_ms, embed_cached, search_ms.
+        """
+        timings = timings if timings is not None else {}
+        with span("normalize"):
+            q_norm = normalize_chars_fa(query)
+
+        with span("embed") as s:
+            qvec = self.embedding_cache.get(q_norm) if self.embedding_cache is not None else None
+            timings["embed_cached"] = qvec is not None
+            if qvec is None:
+                timeout_sec = None
+                if deadline is not None:
+                    timeout_sec = deadline.require("embed", self.embedder.timeout_sec)
+                qvec = self.embedder.embed_text(q_norm, timeout_sec=timeout_sec)
+                if self.embedding_cache is not None:
+                    self.embedding_cache.put(q_norm, qvec)
+        timings["embed_ms"] = s.ms
+
+        # FAISS search cannot be interrupted; only refuse to start it once the budget is gone
+        if deadline is not None and deadline.expired():
+            deadline.mark_exhausted("search")
+            raise DeadlineExceeded("search")
+        with span("search") as s:
+            results = self.store.search(query_vector=qvec, top_k=top_k)
+        timings["search_ms"] = s.ms
+        return results
+
+    def retrieve_cached(
+        self,
+        query: str,
+        top_k: int = 5,
+        timings: Optional[Dict[str, Any]] = None,
+    ) -> Optional[List[Dict]]:
+        """
+        Vector search only if the query embedding is already cached; None otherwise (no model call).
+        """
+        if self.embedding_cache is None:
+            return None
+        with span("normalize"):
+            q_norm = normalize_chars_fa(query)
+        qvec = self.embedding_cache.get(q_norm)
+        if qvec is None:
+            return None
+        with span("search") as s:
+            results = self.store.search(query_vector=qvec, top_k=top_k)
+        if timings is not None:
+            timings.update(embed_cached=True, search_ms=s.ms)
+        return results
+
+    def lexical_search(
+        self,
+        query: str,
+        top_k: int = 5,
+        timings: Optional[Dict[str, Any]] = None,
+    ) -> List[Dict]:
+        """
+        Token-overlap search over the stored FAQ questions (no embedding call).
+        The inverted index is built on first use from the vector store's metadata.
+        """
+        with span("lexical_search") as s:
+            if self._lexical is None:
+                with self._lexical_lock:
+                    if self._lexical is None:
+                        self._lexical = LexicalIndex(getattr(self.store, "metadata", None) or [])
+            results = self._lexical.search(normalize_chars_fa(query), top_k=top_k)
+        if timings is not None:
+            timings["search_ms"] = s.ms
+        return results
@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import math
+import re
+import threading
+from typing import Dict, Optional
+
+# Rough chars-per-token ratios by model family for Persian support text;
+# calibrate() corrects them at runtime from the counts the server reports.
+# fa    : Persian/Arabic letter runs
+# latin : Latin letter runs
+# digit : digit runs (gemma/qwen/llama split digits one by one)
+_PROFILES: Dict[str, Dict[str, float]] = {
+    "gemma": {"fa": 2.8, "latin": 4.0, "digit": 1.0},
+    "qwen": {"fa": 2.2, "latin": 4.0, "digit": 1.0},
+    "llama": {"fa": 2.0, "latin": 4.0, "digit": 1.0},
+    "gpt": {"fa": 3.2, "latin": 4.2, "digit": 3.0},
+    "default": {"fa": 2.4, "latin": 4.0, "digit": 1.5},
+}
+
+_SEGMENT = re.compile(r"([\u0600-\u06FF\u200c]+)|([A-Za-z]+)|(\d+)|(\s+)|(.)", flags=re.UNICODE)
+
+
+def _profile_for(model: str) -> Dict[str, float]:
+    m = (model or "").lower()
+    for family in ("gemma", "qwen", "llama", "gpt"):
+        if family in m:
+            return _PROFILES[family]
+    return _PROFILES["default"]
+
+
+def _load_tiktoken(model: str):
+    """
+    tiktoken is optional; only used for models it knows (OpenAI-compatible API models).
+    """
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return None
+
+
+class TokenEstimator:
+    """
+    Token counter for the configured chat model.
+    - exact counts via tiktoken when installed and it knows the model
+    - otherwise a per-script heuristic with chars-per-token ratios by model family
+    - calibrate(): feed back real prompt token counts reported by the server;
+      a smoothed correction factor is applied to later estimates
+    """
+    def __init__(self, model: str, smoothing: float = 0.2) -> None:
+        self.model = model
+        self.smoothing = min(1.0, max(0.0, float(smoothing)))
+        self._profile = _profile_for(model)
+        self._encoding = _load_tiktoken(model)
+        self._lock = threading.Lock()
+        self._correction = 1.0
+
+    @property
+    def exact(self) -> bool:
+        return self._encoding is not None
+
+    @property
+    def correction(self) -> float:
+        return self._correction
+
+    def _heuristic(self, text: str) -> float:
+        p = self._profile
+        total = 0.0
+        for fa, latin, digit, space, other in _SEGMENT.findall(text):
+            if fa:
+                total += math.ceil(len(fa) / p["fa"])
+            elif latin:
+                total += math.ceil(len(latin) / p["latin"])
+            elif digit:
+                total += math.ceil(len(digit) / p["digit"])
+            elif space:
+                # single spaces merge into the next token; runs of newlines do not
+                total += space.count("\n")
+            elif other:
+                total += 1
+        return total
+
+    def count(self, text: Optional[str]) -> int:
+        if not text:
+            return 0
+        if self._encoding is not None:
+            return len(self._encoding.encode(text))
+        return int(math.ceil(self._heuristic(text) * self._correction))
+
+    def calibrate(self, estimated: int, actual: int) -> None:
+        """
+        estimated: what count() returned for a prompt; actual: what the server counted.
+        """
+        if self._encoding is not None or estimated <= 0 or actual <= 0:
+            return
+        ratio = float(actual) / float(estimated)
+        with self._lock:
+            target = self._correction * ratio
+            self._correction += self.smoothing * (target - self._correction)
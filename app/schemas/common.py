@@ -18,3 +18,7 @@ class StatusResponse(BaseModel):
     ingestion_report: Dict[str, Any]
     index_state: Dict[str, Any]
     config_safe: Dict[str, Any]
+    warmup: Dict[str, Any] = {}
+    degradation: Dict[str, Any] = {}
+    # Why the served index files could not be located (e.g. an unreadable bundle)
+    index_error: Optional[str] = None
@@ -14,6 +14,15 @@ class QueryResponseMeta(BaseModel):
     fallback_reason: Optional[str] = None
     retrieval_count: int = 0
     latency_ms: Optional[int] = None
+    deadline_ms: Optional[int] = None
+    deadline_exhausted_stage: Optional[str] = None
+    degraded_stages: List[str] = []
+    cache_hit: bool = False
+    degradation_level: int = 0
+    degradation_mode: str = "normal"
+    retrieval_mode: Optional[str] = None
+    # Per-stage milliseconds (normalize, embed, search, rerank, polish, generate, ...); only when query_meta_spans is on
+    spans: Optional[Dict[str, float]] = None
 
 
 class QueryResponse(BaseModel):
@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Any, Deque, Dict
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, reason: str, retry_after_sec: int) -> None:
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after_sec = retry_after_sec
+
+
+class AdmissionController:
+    """
+    Admission for one priority lane: bounded in-flight + short bounded FIFO queue.
+    - acquire(): admitted immediately, queued up to queue_timeout_sec, or rejected
+      (queue_full / queue_timeout) with a Retry-After estimate
+    - release() hands the slot straight to the oldest waiter
+    Event-loop only (no locks): call from ASGI middleware, never from worker threads.
+    """
+    def __init__(
+        self,
+        name: str,
+        max_in_flight: int,
+        max_queue: int,
+        queue_timeout_sec: float,
+        ewma_alpha: float = 0.2,
+    ) -> None:
+        self.name = name
+        self.max_in_flight = max(1, int(max_in_flight))
+        self.max_queue = max(0, int(max_queue))
+        self.queue_timeout_sec = max(0.0, float(queue_timeout_sec))
+        self.ewma_alpha = ewma_alpha
+        self._in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._service_ewma_sec = 0.0
+        self._admitted = 0
+        self._rejected: Dict[str, int] = {"queue_full": 0, "queue_timeout": 0}
+        self._queued = 0
+        self._wait_ms_total = 0.0
+        self._wait_ms_max = 0.0
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(1 for f in self._waiters if not f.done())
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def backlog(self) -> int:
+        """
+        In-flight + queued. Approximate (may count waiters that already gave up),
+        but only reads plain attributes, so worker threads can call it.
+        """
+        return self._in_flight + len(self._waiters)
+
+    def _retry_after(self) -> int:
+        # Time for the current backlog to drain through max_in_flight slots
+        per_slot = self._service_ewma_sec or 1.0
+        backlog = self.queue_depth + self._in_flight
+        return max(1, int(math.ceil(per_slot * backlog / self.max_in_flight)))
+
+    def _reject(self, reason: str) -> AdmissionRejected:
+        self._rejected[reason] = self._rejected.get(reason, 0) + 1
+        return AdmissionRejected(reason, self._retry_after())
+
+    async def acquire(self) -> float:
+        """
+        Returns queue wait in milliseconds; raises AdmissionRejected.
+        """
+        while self._waiters and self._waiters[0].done():
+            self._waiters.popleft()  # timed-out / cancelled waiters
+        if self._in_flight < self.max_in_flight and not self.queue_depth:
+            self._in_flight += 1
+            self._admitted += 1
+            return 0.0
+
+        if self.queue_depth >= self.max_queue:
+            raise self._reject("queue_full")
+
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.append(fut)
+        self._queued += 1
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.shield(fut), timeout=self.queue_timeout_sec)
+        except asyncio.TimeoutError:
+            if fut.done() and not fut.cancelled():
+                # Slot was handed over right as we timed out: give it back
+                self.release()
+            else:
+                fut.cancel()
+            raise self._reject("queue_timeout")
+        except asyncio.CancelledError:
+            # Client went away while queued
+            if fut.done() and not fut.cancelled():
+                self.release()
+            else:
+                fut.cancel()
+            raise
+
+        waited_ms = (time.perf_counter() - started) * 1000
+        self._admitted += 1
+        self._wait_ms_total += waited_ms
+        self._wait_ms_max = max(self._wait_ms_max, waited_ms)
+        return waited_ms
+
+    def release(self, service_sec: float | None = None) -> None:
+        if service_sec is not None:
+            self._service_ewma_sec = service_sec if self._service_ewma_sec == 0.0 else (
+                self.ewma_alpha * service_sec + (1.0 - self.ewma_alpha) * self._service_ewma_sec
+            )
+        while self._waiters:
+            fut = self._waiters.popleft()
+            if not fut.done():
+                # Hand the slot over; in_flight stays the same
+                fut.set_result(None)
+                return
+        self._in_flight = max(0, self._in_flight - 1)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self._in_flight,
+            "max_in_flight": self.max_in_flight,
+            "queue_depth": self.queue_depth,
+            "max_queue": self.max_queue,
+            "admitted_total": self._admitted,
+            "queued_total": self._queued,
+            "rejected_total": sum(self._rejected.values()),
+            "rejected_by_reason": dict(self._rejected),
+            "queue_wait_ms_total": round(self._wait_ms_total, 1),
+            "queue_wait_ms_max": round(self._wait_ms_max, 1),
+            "service_ewma_ms": round(self._service_ewma_sec * 1000, 1),
+        }
@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Sequence, Tuple
+
+STRATEGIES = ("least_outstanding", "ewma")
+_FAILURE_PENALTY_MS = 1000.0
+
+
+@dataclass
+class Backend:
+    url: str
+    outstanding: int = 0
+    ewma_ms: float = 0.0
+    requests: int = 0
+    failures: int = 0
+    consecutive_failures: int = 0
+    ejected_until: float = 0.0
+    ejections: int = 0
+    last_error: str = ""
+
+    def healthy(self, now: float) -> bool:
+        return now >= self.ejected_until
+
+
+class BackendPool:
+    """
+    Thread-safe balancer over equivalent backends (e.g. several Ollama hosts).
+    - least_outstanding: fewest in-flight calls, ties broken by lower EWMA latency
+    - ewma: lowest EWMA latency scaled by (in-flight + 1)
+    - passive ejection: eject_after consecutive failures => skipped for eject_sec
+      (if every backend is ejected, the one whose ejection ends first is used)
+    """
+    def __init__(
+        self,
+        urls: Sequence[str],
+        strategy: str = "least_outstanding",
+        eject_after: int = 3,
+        eject_sec: float = 30.0,
+        ewma_alpha: float = 0.3,
+    ) -> None:
+        cleaned = [u.rstrip("/") for u in urls if u and u.strip()]
+        if not cleaned:
+            raise ValueError("BackendPool needs at least one URL")
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown balancing strategy: {strategy} (expected one of {STRATEGIES})")
+        self.backends: List[Backend] = [Backend(url=u) for u in dict.fromkeys(cleaned)]
+        self.strategy = strategy
+        self.eject_after = max(1, int(eject_after))
+        self.eject_sec = max(0.0, float(eject_sec))
+        self.ewma_alpha = min(1.0, max(0.01, float(ewma_alpha)))
+        self._lock = threading.Lock()
+
+    @property
+    def size(self) -> int:
+        return len(self.backends)
+
+    @property
+    def urls(self) -> List[str]:
+        return [b.url for b in self.backends]
+
+    def _score(self, b: Backend) -> Tuple[float, float]:
+        if self.strategy == "ewma":
+            return (b.ewma_ms * (b.outstanding + 1), b.outstanding)
+        return (b.outstanding, b.ewma_ms)
+
+    def _pick(self) -> Backend:
+        now = time.monotonic()
+        healthy = [b for b in self.backends if b.healthy(now)]
+        if not healthy:
+            return min(self.backends, key=lambda b: b.ejected_until)
+        return min(healthy, key=self._score)
+
+    def _record(self, b: Backend, elapsed_ms: float, error: BaseException | None) -> None:
+        with self._lock:
+            b.outstanding = max(0, b.outstanding - 1)
+            b.requests += 1
+            if error is not None:
+                # Fast failures (connection refused) must not make a backend look fast
+                elapsed_ms = max(elapsed_ms, b.ewma_ms * 2.0, _FAILURE_PENALTY_MS)
+            b.ewma_ms = elapsed_ms if b.ewma_ms == 0.0 else (
+                self.ewma_alpha * elapsed_ms + (1.0 - self.ewma_alpha) * b.ewma_ms
+            )
+            if error is None:
+                b.consecutive_failures = 0
+                b.ejected_until = 0.0
+                return
+            b.failures += 1
+            b.consecutive_failures += 1
+            b.last_error = f"{type(error).__name__}: {error}"[:200]
+            if b.consecutive_failures >= self.eject_after:
+                b.ejected_until = time.monotonic() + self.eject_sec
+                b.ejections += 1
+                b.consecutive_failures = 0
+
+    @contextmanager
+    def acquire(self) -> Iterator[Backend]:
+        """
+        with pool.acquire() as backend: ... call backend.url ...
+        An exception escaping the block counts as a backend failure.
+        """
+        with self._lock:
+            b = self._pick()
+            b.outstanding += 1
+        started = time.perf_counter()
+        try:
+            yield b
+        except BaseException as exc:
+            self._record(b, (time.perf_counter() - started) * 1000, exc)
+            raise
+        self._record(b, (time.perf_counter() - started) * 1000, None)
+
+    def ewma_ms(self) -> float:
+        """
+        Pool-level latency signal: mean EWMA of backends that have served traffic.
+        """
+        with self._lock:
+            seen = [b.ewma_ms for b in self.backends if b.requests]
+        return sum(seen) / len(seen) if seen else 0.0
+
+    def outstanding(self) -> int:
+        with self._lock:
+            return sum(b.outstanding for b in self.backends)
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        now = time.monotonic()
+        with self._lock:
+            return [
+                {
+                    "url": b.url,
+                    "healthy": b.healthy(now),
+                    "outstanding": b.outstanding,
+                    "ewma_ms": round(b.ewma_ms, 2),
+                    "requests": b.requests,
+                    "failures": b.failures,
+                    "ejections": b.ejections,
+                    "ejected_for_sec": round(max(0.0, b.ejected_until - now), 1),
+                    "last_error": b.last_error,
+                }
+                for b in self.backends
+            ]
+
+
+@lru_cache(maxsize=8)
+def shared_pool(
+    urls: Tuple[str, ...],
+    strategy: str = "least_outstanding",
+    eject_after: int = 3,
+    eject_sec: float = 30.0,
+) -> BackendPool:
+    """
+    One pool per backend list, so latency/health state survives pipeline rebuilds.
+    """
+    return BackendPool(urls, strategy=strategy, eject_after=eject_after, eject_sec=eject_sec)
@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Sequence
+
+# Ordered from full quality to cheapest; each level includes the ones before it.
+LEVELS = (
+    "normal",
+    "reduced_candidates",   # fewer FAISS candidates to rerank
+    "no_char_similarity",   # rerank without SequenceMatcher
+    "cache_only",           # no new model calls: cached query embeddings / cached generations only
+    "lexical_only",         # no embedding at all: token-overlap search over FAQ questions
+)
+
+
+def _level_for(value: float, thresholds: Sequence[float]) -> int:
+    """
+    thresholds[i] is where level i+1 starts; returns the highest level reached.
+    """
+    level = 0
+    for i, t in enumerate(thresholds):
+        if t > 0 and value >= t:
+            level = i + 1
+    return min(level, len(LEVELS) - 1)
+
+
+class DecayingEWMA:
+    """
+    EWMA of a latency (ms) fed by one kind of call, e.g. /query embeddings.
+    - failed calls count as at least twice the current value
+    - between samples the value halves every half_life_sec: a signal nobody feeds
+      (the levels that stop making the call) cannot hold a level forever
+    Thread-safe.
+    """
+    def __init__(self, alpha: float = 0.3, half_life_sec: float = 30.0) -> None:
+        self.alpha = min(1.0, max(0.01, float(alpha)))
+        self.half_life_sec = max(0.0, float(half_life_sec))
+        self._lock = threading.Lock()
+        self._value = 0.0
+        self._at: Optional[float] = None
+        self._samples = 0
+
+    def _decayed(self, now: float) -> float:
+        if self._at is None or self.half_life_sec <= 0:
+            return self._value
+        return self._value * 0.5 ** (max(0.0, now - self._at) / self.half_life_sec)
+
+    def record(self, ms: float, failed: bool = False) -> None:
+        now = time.monotonic()
+        with self._lock:
+            current = self._decayed(now)
+            if failed:
+                ms = max(float(ms), current * 2.0)
+            self._value = float(ms) if self._samples == 0 else self.alpha * ms + (1.0 - self.alpha) * current
+            self._at = now
+            self._samples += 1
+
+    def value(self) -> float:
+        with self._lock:
+            return self._decayed(time.monotonic())
+
+
+class DegradationController:
+    """
+    Picks a quality level for each query from live load signals.
+    - load ratio: (admitted + queued /query requests) / max_in_flight
+    - embed latency: EWMA of /query embedding calls (ms), see DecayingEWMA
+    - target level = highest level any signal reaches; raised immediately,
+      lowered one step at a time after recover_sec below the current level
+    Thread-safe; current() is cheap enough to call on every request.
+    """
+    def __init__(
+        self,
+        signals: Callable[[], Dict[str, float]],
+        load_thresholds: Sequence[float] = (1.0, 1.5, 2.0, 2.5),
+        embed_ms_thresholds: Sequence[float] = (1500, 3000, 6000, 12000),
+        recover_sec: float = 10.0,
+        enabled: bool = True,
+    ) -> None:
+        self.signals = signals
+        self.load_thresholds = list(load_thresholds)
+        self.embed_ms_thresholds = list(embed_ms_thresholds)
+        self.recover_sec = max(0.0, float(recover_sec))
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._level = 0
+        self._below_since: Optional[float] = None
+        self._last_signals: Dict[str, float] = {}
+        self._changes = 0
+        self._served: Dict[str, int] = {name: 0 for name in LEVELS}
+
+    def _target(self, signals: Dict[str, float]) -> int:
+        return max(
+            _level_for(float(signals.get("load_ratio", 0.0)), self.load_thresholds),
+            _level_for(float(signals.get("embed_ewma_ms", 0.0)), self.embed_ms_thresholds),
+        )
+
+    def current(self) -> int:
+        """
+        Re-evaluates the signals and returns the level for the next request.
+        """
+        if not self.enabled:
+            return 0
+        signals = self.signals()
+        target = self._target(signals)
+        now = time.monotonic()
+        with self._lock:
+            self._last_signals = signals
+            if target > self._level:
+                self._level = target
+                self._below_since = None
+                self._changes += 1
+            elif target < self._level:
+                if self._below_since is None:
+                    self._below_since = now
+                elif now - self._below_since >= self.recover_sec:
+                    self._level -= 1
+                    self._below_since = now if target < self._level else None
+                    self._changes += 1
+            else:
+                self._below_since = None
+            self._served[LEVELS[self._level]] += 1
+            return self._level
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "level": self._level,
+                "level_name": LEVELS[self._level],
+                "signals": {k: round(float(v), 2) for k, v in self._last_signals.items()},
+                "load_thresholds": self.load_thresholds,
+                "embed_ms_thresholds": self.embed_ms_thresholds,
+                "recover_sec": self.recover_sec,
+                "level_changes": self._changes,
+                "served_by_level": dict(self._served),
+            }
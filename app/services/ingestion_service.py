@@ -1,19 +1,39 @@
 from __future__ import annotations
 
+import hashlib
 import json
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 from pathlib import Path
-from typing import Any, Dict, Optional, Tuple, List
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, Optional, Tuple, List
 
 from app.core.config import Settings
 from app.rag.pipeline import RAGPipeline
+from app.rag.lexical_index import LexicalIndex
 from app.rag.retriever import RAGRetriever
-from app.storage.documents.loader import load_source_documents
+from app.storage.documents.loader import count_lines, iter_source_documents
+from app.storage.embeddings.cache import EmbeddingCache
 from app.storage.embeddings.embedder import OllamaEmbedder
-from app.storage.vectorstore.faiss_store import FaissStore
-from app.utils.hashing import sha256_file
+from app.storage.vectorstore.faiss_store import FaissStore, read_index, read_metadata
+from app.storage.vectorstore.bundle import open_bundle, verify_bundle
+from app.storage.vectorstore.snapshots import (
+    FEATURES_FILE,
+    INDEX_FILE,
+    METADATA_FILE,
+    STATE_FILE,
+    SnapshotError,
+    SnapshotStore,
+)
+from app.services.backend_pool import shared_pool
+from app.utils.hashing import sha256_file_cached
 from app.services.text_normalizer import normalize_chars_fa
 
 
+EMBED_BATCH_SIZE = 32
+
+
 def _load_state(path: str) -> Dict[str, Any]:
     p = Path(path)
     if not p.exists():
@@ -23,79 +43,308 @@ def _load_state(path: str) -> Dict[str, Any]:
     except Exception:
         return {}
 
-def _save_state(path: str, state: Dict[str, Any]) -> None:
-    p = Path(path)
-    p.parent.mkdir(parents=True, exist_ok=True)
-    p.write_text(json.dumps(state, ensure_ascii=False, indent=2), encoding="utf-8")
+def build_embedder(settings: Settings) -> OllamaEmbedder:
+    """
+    Embedder over the configured embedding backends (shared pool, so health/latency
+    state survives pipeline rebuilds).
+    """
+    pool = shared_pool(
+        tuple(settings.embed_backend_urls()),
+        strategy=settings.ollama_lb_strategy,
+        eject_after=settings.ollama_eject_after_failures,
+        eject_sec=settings.ollama_eject_sec,
+    )
+    return OllamaEmbedder(
+        base_url=settings.ollama_base_url,
+        model=settings.ollama_embed_model,
+        timeout_sec=settings.ollama_embed_timeout_sec,
+        keep_alive=settings.ollama_keep_alive,
+        pool=pool,
+    )
 
 
-def build_pipeline_from_existing_index(settings: Settings) -> Tuple[Optional[RAGPipeline], Dict[str, Any]]:
-    source_hash = sha256_file(settings.static_source_path)
-    state = _load_state(settings.index_state_path)
+def build_retriever(
+    settings: Settings,
+    store: FaissStore,
+    embedder: OllamaEmbedder,
+    lexical: Optional[LexicalIndex] = None,
+) -> RAGRetriever:
+    cache = None
+    if settings.embedding_cache_max_entries > 0:
+        cache = EmbeddingCache(max_entries=settings.embedding_cache_max_entries)
+    return RAGRetriever(store=store, embedder=embedder, embedding_cache=cache, lexical=lexical)
+
+
+def index_version_of(state: Dict[str, Any]) -> str:
+    """
+    Short stable id of an index build, derived from its index_state.
+    """
+    raw = json.dumps(state, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def snapshot_store(settings: Settings) -> SnapshotStore:
+    return SnapshotStore(settings.index_snapshots_dir, keep=settings.index_snapshots_keep)
+
+
+def _paths_in(directory: Path, snapshot: Optional[str]) -> Dict[str, Any]:
+    return {
+        "snapshot": snapshot,
+        "index_path": str(directory / INDEX_FILE),
+        "metadata_path": str(directory / METADATA_FILE),
+        "state_path": str(directory / STATE_FILE),
+        "features_path": str(directory / FEATURES_FILE),
+    }
+
+
+def current_index_paths(settings: Settings) -> Dict[str, Any]:
+    """
+    Files of the served index: the bundle's (serve-only), the CURRENT snapshot's, or the
+    pre-snapshot flat files.
+    - raises SnapshotError when the bundle cannot be opened
+    """
+    if settings.serve_only():
+        directory, manifest = open_bundle(settings.index_bundle_path, settings.index_bundle_extract_dir)
+        return _paths_in(directory, manifest.get("snapshot"))
+    snapshots = snapshot_store(settings)
+    version = snapshots.current()
+    if version:
+        return _paths_in(snapshots.path(version), version)
+    return {
+        "snapshot": None,
+        "index_path": settings.faiss_index_path,
+        "metadata_path": settings.faiss_metadata_path,
+        "state_path": settings.index_state_path,
+        "features_path": None,
+    }
 
-    # Require schema match (forces one-time rebuild when we change index design)
-    if not state:
-        return None, {"loaded": False, "reason": "missing_index_state", "source_hash": source_hash}
 
+def _incompatible(settings: Settings, state: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Why an index built with `state` cannot serve the current settings (None if it can).
+    """
+    # Require schema match (forces one-time rebuild when we change index design)
     if int(state.get("index_schema_version", -1)) != int(settings.index_schema_version):
-        return None, {"loaded": False, "reason": "schema_version_mismatch", "state": state}
+        return {"loaded": False, "reason": "schema_version_mismatch", "state": state}
 
     if str(state.get("index_mode", "")) != str(settings.index_mode):
-        return None, {"loaded": False, "reason": "index_mode_mismatch", "state": state}
+        return {"loaded": False, "reason": "index_mode_mismatch", "state": state}
 
     if str(state.get("embedding_model", "")) != str(settings.ollama_embed_model):
-        return None, {"loaded": False, "reason": "embedding_model_mismatch", "state": state}
+        return {"loaded": False, "reason": "embedding_model_mismatch", "state": state}
+    return None
 
-    if str(state.get("source_hash", "")) != str(source_hash):
-        return None, {"loaded": False, "reason": "source_changed", "prev_hash": state.get("source_hash"), "source_hash": source_hash}
 
-    store = FaissStore(
-        index_path=settings.faiss_index_path,
-        metadata_path=settings.faiss_metadata_path,
-        embedding_dim=settings.embedding_dim,
-    )
-    if not store.load():
-        return None, {"loaded": False, "reason": "faiss_missing_or_unreadable"}
+def _load_store(
+    settings: Settings,
+    index_path: str,
+    metadata_path: str,
+    verify: Optional[Callable[[], Any]] = None,
+    features_path: Optional[str] = None,
+) -> Tuple[FaissStore, LexicalIndex, Dict[str, float]]:
+    """
+    Reads the index, the metadata (+ the lexical index built from it) and, if given, runs
+    verify() concurrently: faiss and hashlib release the GIL, so they overlap with the
+    JSON parse and lexical build in this thread. Returns per-step timings.
+    - features_path: precomputed lexical tokens (snapshots / bundles); tokenised here if absent
+    """
+    if not Path(index_path).exists() or not Path(metadata_path).exists():
+        raise FileNotFoundError(f"missing {index_path} or {metadata_path}")
+    timings: Dict[str, float] = {}
 
-    embedder = OllamaEmbedder(
-        base_url=settings.ollama_base_url,
-        model=settings.ollama_embed_model,
-        timeout_sec=settings.ollama_embed_timeout_sec,
+    def timed(name: str, fn: Callable, *args: Any) -> Any:
+        t0 = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            timings[name] = round((time.perf_counter() - t0) * 1000, 1)
+
+    with ThreadPoolExecutor(max_workers=2, thread_name_prefix="index-load") as pool:
+        index_f = pool.submit(timed, "index_ms", read_index, index_path)
+        verify_f = pool.submit(timed, "verify_ms", verify) if verify is not None else None
+        metadata = timed("metadata_ms", read_metadata, metadata_path)
+        tokens = None
+        if features_path and Path(features_path).exists():
+            tokens = timed("features_ms", _read_lexical_tokens, features_path)
+        lexical = timed("lexical_ms", LexicalIndex, metadata, tokens)
+        index = index_f.result()
+        if verify_f is not None:
+            verify_f.result()
+
+    store = FaissStore(index_path=index_path, metadata_path=metadata_path, embedding_dim=settings.embedding_dim)
+    store.set_loaded(index, metadata)
+    return store, lexical, timings
+
+
+def _read_lexical_tokens(path: str) -> Optional[List[List[str]]]:
+    return json.loads(Path(path).read_text(encoding="utf-8")).get("lexical_tokens")
+
+
+def _pipeline_for(
+    settings: Settings,
+    store: FaissStore,
+    state: Dict[str, Any],
+    embedder: Optional[OllamaEmbedder] = None,
+    lexical: Optional[LexicalIndex] = None,
+) -> Tuple[RAGPipeline, str]:
+    embedder = embedder or build_embedder(settings)
+    retriever = build_retriever(settings, store, embedder, lexical=lexical)
+    index_version = index_version_of(state)
+    pipeline = RAGPipeline(
+        retriever=retriever,
+        max_context_chars=settings.max_context_chars,
+        index_version=index_version,
     )
-    retriever = RAGRetriever(store=store, embedder=embedder)
-    pipeline = RAGPipeline(retriever=retriever, max_context_chars=settings.max_context_chars)
+    return pipeline, index_version
+
+
+def build_pipeline_from_existing_index(settings: Settings) -> Tuple[Optional[RAGPipeline], Dict[str, Any]]:
+    """
+    Load the snapshot CURRENT points at (or the pre-snapshot flat files if there is none).
+    - a pinned snapshot (rollback) is served even if the source file has changed since
+    - the source is only re-hashed when its (size, mtime, inode) changed
+    - serve-only (index_bundle_path set): the bundle, see build_pipeline_from_bundle()
+    """
+    if settings.serve_only():
+        return build_pipeline_from_bundle(settings)
+    started = time.perf_counter()
+    source_hash = sha256_file_cached(settings.static_source_path, settings.source_hash_cache_path)
+    hash_ms = round((time.perf_counter() - started) * 1000, 1)
+    snapshots = snapshot_store(settings)
+    pointer = snapshots.pointer()
+
+    if pointer:
+        snapshot = pointer["version"]
+        try:
+            state = snapshots.manifest(snapshot).get("index_state") or {}
+        except SnapshotError as exc:
+            return None, {"loaded": False, "reason": "snapshot_unreadable", "snapshot": snapshot, "error": str(exc)}
+    else:
+        snapshot = None
+        state = _load_state(settings.index_state_path)
+
+    if not state:
+        return None, {"loaded": False, "reason": "missing_index_state", "source_hash": source_hash}
+
+    failed = _incompatible(settings, state)
+    if failed is not None:
+        return None, failed
 
+    pinned = bool(pointer.get("pinned"))
+    if str(state.get("source_hash", "")) != str(source_hash) and not pinned:
+        return None, {"loaded": False, "reason": "source_changed", "prev_hash": state.get("source_hash"), "source_hash": source_hash}
+
+    if snapshot is not None:
+        paths = current_index_paths(settings)
+        verify = (lambda: snapshots.verify(snapshot)) if settings.index_snapshot_verify else None
+        try:
+            store, lexical, timings = _load_store(
+                settings, paths["index_path"], paths["metadata_path"], verify, paths["features_path"]
+            )
+        except Exception as exc:
+            return None, {"loaded": False, "reason": "snapshot_invalid", "snapshot": snapshot, "error": str(exc)}
+    else:
+        try:
+            store, lexical, timings = _load_store(settings, settings.faiss_index_path, settings.faiss_metadata_path)
+        except Exception as exc:
+            return None, {"loaded": False, "reason": "faiss_missing_or_unreadable", "error": str(exc)}
+
+    pipeline, index_version = _pipeline_for(settings, store, state, lexical=lexical)
     return pipeline, {
         "loaded": True,
         "reason": "loaded_from_disk",
         "source_hash": source_hash,
+        "index_version": index_version,
+        "snapshot": snapshot,
+        "pinned": pinned,
         "index_state": state,
+        "load_ms": {"source_hash_ms": hash_ms, **timings, "total_ms": round((time.perf_counter() - started) * 1000, 1)},
     }
 
 
-def rebuild_index_and_pipeline(settings: Settings) -> Tuple[RAGPipeline, Dict[str, Any]]:
-    docs, load_report = load_source_documents(settings.static_source_path)
+def build_pipeline_from_snapshot(settings: Settings, snapshot: str) -> Tuple[RAGPipeline, Dict[str, Any]]:
+    """
+    Pipeline over an existing snapshot, for rollback: no re-embedding, and the source hash
+    is not checked (serving an older build is the point). Raises SnapshotError.
+    """
+    snapshots = snapshot_store(settings)
+    state = snapshots.manifest(snapshot).get("index_state") or {}
+    failed = _incompatible(settings, state)
+    if failed is not None:
+        raise SnapshotError(f"{snapshot}: {failed['reason']}")
+    d = snapshots.path(snapshot)
+    verify = (lambda: snapshots.verify(snapshot)) if settings.index_snapshot_verify else None
+    try:
+        paths = _paths_in(d, snapshot)
+        store, lexical, timings = _load_store(
+            settings, paths["index_path"], paths["metadata_path"], verify, paths["features_path"]
+        )
+    except SnapshotError:
+        raise
+    except Exception as exc:
+        raise SnapshotError(f"{snapshot}: {exc}") from exc
+    pipeline, index_version = _pipeline_for(settings, store, state, lexical=lexical)
+    return pipeline, {
+        "loaded": True,
+        "reason": "rolled_back",
+        "source_hash": state.get("source_hash"),
+        "index_version": index_version,
+        "snapshot": snapshot,
+        "pinned": True,
+        "index_state": state,
+        "load_ms": timings,
+    }
 
-    embedder = OllamaEmbedder(
-        base_url=settings.ollama_base_url,
-        model=settings.ollama_embed_model,
-        timeout_sec=settings.ollama_embed_timeout_sec,
-    )
 
-    store = FaissStore(
-        index_path=settings.faiss_index_path,
-        metadata_path=settings.faiss_metadata_path,
-        embedding_dim=settings.embedding_dim,
-    )
+def build_pipeline_from_bundle(settings: Settings) -> Tuple[Optional[RAGPipeline], Dict[str, Any]]:
+    """
+    Serve-only: the prebuilt bundle at index_bundle_path (scripts/build_index_bundle.py).
+    No source file, no source hash, no ingestion; only what the query path depends on
+    (schema version, index mode, embedding model) is checked against the settings.
+    """
+    started = time.perf_counter()
+    bundle = settings.index_bundle_path
+    try:
+        directory, manifest = open_bundle(bundle, settings.index_bundle_extract_dir)
+    except SnapshotError as exc:
+        return None, {"loaded": False, "reason": "bundle_invalid", "bundle": bundle, "error": str(exc)}
 
-    items: List[Dict[str, Any]] = []
-    embed_inputs: List[str] = []
+    state = manifest.get("index_state") or {}
+    failed = _incompatible(settings, state)
+    if failed is not None:
+        return None, {**failed, "bundle": bundle}
+
+    paths = _paths_in(directory, manifest.get("snapshot"))
+    verify = (lambda: verify_bundle(directory, manifest)) if settings.index_snapshot_verify else None
+    try:
+        store, lexical, timings = _load_store(
+            settings, paths["index_path"], paths["metadata_path"], verify, paths["features_path"]
+        )
+    except Exception as exc:
+        return None, {"loaded": False, "reason": "bundle_invalid", "bundle": bundle, "error": str(exc)}
+
+    pipeline, index_version = _pipeline_for(settings, store, state, lexical=lexical)
+    return pipeline, {
+        "loaded": True,
+        "reason": "loaded_from_bundle",
+        "bundle": bundle,
+        "source_hash": state.get("source_hash"),
+        "index_version": index_version,
+        "snapshot": manifest.get("snapshot"),
+        "index_state": state,
+        "load_ms": {**timings, "total_ms": round((time.perf_counter() - started) * 1000, 1)},
+    }
 
+
+def iter_index_items(docs: Iterable[Dict[str, Any]], index_mode: str) -> Iterator[Tuple[Dict[str, Any], str]]:
+    """
+    (index metadata item, embedding input) per doc for the given index_mode, lazily.
+    """
     # qa_full: embed question + answer together.
     # Best for support FAQs where users describe their problem using words
     # that appear in the answer, not necessarily the question.
-    if settings.index_mode in ("qa_full", "qa_question_only"):
-        full_mode = settings.index_mode == "qa_full"
+    if index_mode in ("qa_full", "qa_question_only"):
+        full_mode = index_mode == "qa_full"
         for d in docs:
             q = (d.get("question") or "").strip()
             if not q:
@@ -104,19 +353,20 @@ def rebuild_index_and_pipeline(settings: Settings) -> Tuple[RAGPipeline, Dict[st
             doc_id = d.get("doc_id")
             ri = (d.get("meta") or {}).get("record_index")
 
-            items.append({
+            item = {
                 "chunk_id": f"{doc_id}",
                 "doc_id": doc_id,
                 "record_index": ri,
                 "question": q,
                 "answer": a,
-            })
+            }
             if full_mode and a:
                 # Embed both sides so queries phrased like the answer also match
                 embed_text = normalize_chars_fa(q + " " + a)
             else:
                 embed_text = normalize_chars_fa(q)
-            embed_inputs.append(embed_text)
+            if embed_text.strip():
+                yield item, embed_text
 
     # Generic fallback for plain-text documents
     else:
@@ -124,38 +374,125 @@ def rebuild_index_and_pipeline(settings: Settings) -> Tuple[RAGPipeline, Dict[st
             text = (d.get("text") or "").strip()
             if not text:
                 continue
-            items.append({
+            item = {
                 "chunk_id": d.get("doc_id"),
                 "doc_id": d.get("doc_id"),
                 "question": text[:200],
                 "answer": "",
-            })
-            embed_inputs.append(normalize_chars_fa(text))
+            }
+            yield item, normalize_chars_fa(text)
+
+
+def build_index_items(docs: List[Dict[str, Any]], index_mode: str) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """
+    Index metadata items and the matching embedding inputs for the given index_mode.
+    """
+    items: List[Dict[str, Any]] = []
+    embed_inputs: List[str] = []
+    for item, embed_text in iter_index_items(docs, index_mode):
+        items.append(item)
+        embed_inputs.append(embed_text)
+    return items, embed_inputs
+
+
+def validate_pipeline(pipeline: RAGPipeline, expected_items: int) -> None:
+    """
+    Sanity checks on a freshly built pipeline before it is saved or served.
+    Raises ValueError with the reason.
+    """
+    store = pipeline.retriever.store
+    if expected_items <= 0:
+        raise ValueError("no items indexed")
+    ntotal = int(store.index.ntotal) if store.index is not None else 0
+    if ntotal != expected_items or len(store.metadata) != expected_items:
+        raise ValueError(f"index/metadata size mismatch: ntotal={ntotal} metadata={len(store.metadata)} expected={expected_items}")
+    probe = (store.metadata[0].get("question") or "").strip()
+    if probe:
+        results = pipeline.retriever.retrieve(query=probe, top_k=1)
+        if not results:
+            raise ValueError("probe query returned no results")
+
 
-    embeddings = embedder.embed_many(embed_inputs) if embed_inputs else []
-    store.build_from_embeddings(items=items, embeddings=embeddings)
-    store.save()
+def rebuild_index_and_pipeline(
+    settings: Settings,
+    progress: Optional[Callable[[str, int, int], None]] = None,
+) -> Tuple[RAGPipeline, Dict[str, Any]]:
+    """
+    Embed the source and build a new index + pipeline.
+    - progress(stage, done, total): stages loading, embedding, building, validating, saving;
+      an exception raised by it aborts the rebuild (nothing is written)
+    - files are written only after the new pipeline passed validate_pipeline(), as a new
+      snapshot that CURRENT is switched to once it is complete
+    - streaming: records are parsed, embedded in batches and added to the index as they
+      are read, so the corpus is never held in memory as docs / inputs / vector lists
+    """
+    def report_stage(stage: str, done: int = 0, total: int = 0) -> None:
+        if progress is not None:
+            progress(stage, done, total)
+
+    report_stage("loading")
+    # Hash before reading, so an edit during the (long) embedding run forces the next rebuild
+    source_hash = sha256_file_cached(settings.static_source_path, settings.source_hash_cache_path)
+    load_report: Dict[str, Any] = {}
+    docs = iter_source_documents(settings.static_source_path, load_report)
+    # Progress total = line count (cheap pre-scan); blank or invalid lines make it an upper bound
+    source = Path(settings.static_source_path)
+    total = count_lines(str(source)) if source.suffix.lower() == ".jsonl" and source.exists() else 1
+
+    embedder = build_embedder(settings)
+
+    store = FaissStore(index_path="", metadata_path="", embedding_dim=settings.embedding_dim)
+
+    # Items of the batches handed to the embedder and not yet indexed (bounded by its read-ahead)
+    pending_items: Deque[List[Dict[str, Any]]] = deque()
+
+    def batches() -> Iterator[List[str]]:
+        pairs = iter_index_items(docs, settings.index_mode)
+        while True:
+            batch = list(islice(pairs, EMBED_BATCH_SIZE))
+            if not batch:
+                return
+            pending_items.append([item for item, _ in batch])
+            yield [embed_text for _, embed_text in batch]
+
+    report_stage("embedding", 0, total)
+    for vectors in embedder.embed_batches(batches(), progress=lambda n: report_stage("embedding", n, max(n, total))):
+        store.add_embeddings(pending_items.popleft(), vectors)
+
+    items_indexed = len(store.metadata)
+    report_stage("building", items_indexed, items_indexed)
 
-    source_hash = sha256_file(settings.static_source_path)
     state = {
         "index_schema_version": settings.index_schema_version,
         "index_mode": settings.index_mode,
         "source_path": settings.static_source_path,
         "source_hash": source_hash,
         "embedding_model": settings.ollama_embed_model,
-        "items_indexed": len(items),
+        "items_indexed": items_indexed,
     }
-    _save_state(settings.index_state_path, state)
 
-    retriever = RAGRetriever(store=store, embedder=embedder)
-    pipeline = RAGPipeline(retriever=retriever, max_context_chars=settings.max_context_chars)
+    lexical = LexicalIndex(store.metadata)
+    pipeline, index_version = _pipeline_for(settings, store, state, embedder, lexical=lexical)
+
+    report_stage("validating", items_indexed, items_indexed)
+    validate_pipeline(pipeline, items_indexed)
+
+    report_stage("saving", items_indexed, items_indexed)
+    snapshot = snapshot_store(settings).publish(
+        store,
+        state,
+        version=f"{time.strftime('%Y%m%d-%H%M%S')}-{index_version[:8]}",
+        features={"lexical_tokens": lexical.token_lists()},
+    )
 
     report = {
         **load_report,
         "loaded": False,
         "reason": "rebuilt_question_only",
-        "items_indexed": len(items),
+        "items_indexed": items_indexed,
         "source_hash": source_hash,
+        "index_version": index_version,
+        "snapshot": snapshot,
         "index_state": state,
     }
     return pipeline, report
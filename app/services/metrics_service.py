@@ -1,24 +1,235 @@
 from __future__ import annotations
-from dataclasses import dataclass, field
-from typing import Dict
+
 import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# Upper bounds (ms) shared by all latency histograms; the last bucket is +Inf.
+DEFAULT_BUCKETS_MS: Tuple[float, ...] = (
+    1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000, 120000,
+)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Optional[Dict[str, Any]]) -> Labels:
+    if not labels:
+        return ()
+    return tuple(sorted((str(k), str(v)) for k, v in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _counter_name(name: str) -> str:
+    # Prometheus convention: counters end in _total (snapshot() keeps the historical names)
+    return name if name.endswith("_total") else f"{name}_total"
+
+
+def _label_str(labels: Labels) -> str:
+    return ",".join(f'{k}="{_escape(v)}"' for k, v in labels)
+
+
+class _Shard:
+    """
+    One thread's private counters. Only the owning thread writes; readers copy.
+    """
+    __slots__ = ("counters", "labeled", "hists")
+
+    def __init__(self) -> None:
+        self.counters: Dict[str, int] = {}
+        self.labeled: Dict[Tuple[str, Labels], int] = {}
+        # (name, labels) -> [count per bucket (+Inf last)..., sum, count]
+        self.hists: Dict[Tuple[str, Labels], List[float]] = {}
 
 
-@dataclass
 class Metrics:
-    lock: threading.Lock = field(default_factory=threading.Lock)
-    counters: Dict[str, int] = field(default_factory=lambda: {
-        "requests_total": 0,
-        "requests_ok": 0,
-        "requests_error": 0,
-        "queries_total": 0,
-        "reindex_total": 0,
-    })
+    """
+    Low-contention metrics registry.
+    - every thread (worker threads, the event loop) writes to its own shard, so
+      inc/observe take no lock; snapshot() merges the shards
+    - flat counters (inc), labelled counters (inc_labeled), latency histograms (observe)
+    - snapshot() keeps the historical flat-dict shape; histograms() / labeled() add the rest;
+      render_prometheus() emits the text exposition format
+    """
+    def __init__(self, buckets_ms: Sequence[float] = DEFAULT_BUCKETS_MS, namespace: str = "rag") -> None:
+        self.buckets_ms = tuple(sorted(float(b) for b in buckets_ms))
+        self.namespace = namespace
+        self._local = threading.local()
+        self._registry_lock = threading.Lock()
+        self._shards: List[Tuple[threading.Thread, _Shard]] = []
+        # Shards of finished threads are folded in here (no more writers)
+        self._retired = _Shard()
+        self._retired.counters.update({
+            "requests_total": 0,
+            "requests_ok": 0,
+            "requests_error": 0,
+            "queries_total": 0,
+            "reindex_total": 0,
+        })
+
+    def _shard(self) -> _Shard:
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = _Shard()
+            self._local.shard = shard
+            with self._registry_lock:
+                self._shards.append((threading.current_thread(), shard))
+            return shard
+
+    # ---- recording ----
 
     def inc(self, key: str, n: int = 1) -> None:
-        with self.lock:
-            self.counters[key] = int(self.counters.get(key, 0)) + int(n)
+        c = self._shard().counters
+        c[key] = c.get(key, 0) + int(n)
+
+    def inc_labeled(self, name: str, labels: Dict[str, Any], n: int = 1) -> None:
+        key = (name, _labels(labels))
+        c = self._shard().labeled
+        c[key] = c.get(key, 0) + int(n)
+
+    def observe(self, name: str, value_ms: float, labels: Optional[Dict[str, Any]] = None) -> None:
+        key = (name, _labels(labels))
+        hists = self._shard().hists
+        h = hists.get(key)
+        if h is None:
+            h = [0.0] * (len(self.buckets_ms) + 3)
+            hists[key] = h
+        i = 0
+        for bound in self.buckets_ms:
+            if value_ms <= bound:
+                break
+            i += 1
+        h[i] += 1
+        h[-2] += value_ms
+        h[-1] += 1
+
+    def record_response(self, status_code: int) -> None:
+        """
+        Per-response counters (called by the observability middleware).
+        """
+        shard = self._shard()
+        c = shard.counters
+        outcome = "requests_ok" if 200 <= status_code < 400 else "requests_error"
+        c["requests_total"] = c.get("requests_total", 0) + 1
+        c[outcome] = c.get(outcome, 0) + 1
+        key = ("http_requests_total", (("status", str(int(status_code))),))
+        shard.labeled[key] = shard.labeled.get(key, 0) + 1
+
+    # ---- reading ----
+
+    def _merged(self) -> _Shard:
+        with self._registry_lock:
+            alive = []
+            for thread, shard in self._shards:
+                if thread.is_alive():
+                    alive.append((thread, shard))
+                else:
+                    self._fold(self._retired, shard)
+            self._shards = alive
+            out = _Shard()
+            self._fold(out, self._retired)
+            for _, shard in alive:
+                self._fold(out, shard)
+        return out
+
+    @staticmethod
+    def _fold(into: _Shard, shard: _Shard) -> None:
+        # dict.copy()/list() are atomic under the GIL, so a concurrent writer cannot break iteration
+        for k, v in shard.counters.copy().items():
+            into.counters[k] = into.counters.get(k, 0) + v
+        for k, v in shard.labeled.copy().items():
+            into.labeled[k] = into.labeled.get(k, 0) + v
+        for k, h in shard.hists.copy().items():
+            h = list(h)
+            acc = into.hists.get(k)
+            if acc is None:
+                into.hists[k] = h
+            else:
+                for i, v in enumerate(h):
+                    acc[i] += v
 
     def snapshot(self) -> Dict[str, int]:
-        with self.lock:
-            return dict(self.counters)
+        return dict(self._merged().counters)
+
+    def labeled(self) -> Dict[str, Dict[str, int]]:
+        out: Dict[str, Dict[str, int]] = {}
+        for (name, labels), v in sorted(self._merged().labeled.items()):
+            out.setdefault(name, {})[_label_str(labels) or "_"] = v
+        return out
+
+    def _quantile(self, h: List[float], q: float) -> Optional[float]:
+        count = h[-1]
+        if not count:
+            return None
+        rank = q * count
+        seen = 0.0
+        lower = 0.0
+        for i, bound in enumerate(self.buckets_ms):
+            n = h[i]
+            if seen + n >= rank and n:
+                # linear interpolation inside the bucket
+                return round(lower + (bound - lower) * (rank - seen) / n, 2)
+            seen += n
+            lower = bound
+        return lower  # in the +Inf bucket: report the last finite bound
+
+    def histograms(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """
+        {name: {labels: {count, sum_ms, mean_ms, p50_ms, p90_ms, p99_ms}}} (quantiles estimated from buckets)
+        """
+        out: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        for (name, labels), h in sorted(self._merged().hists.items()):
+            count = int(h[-1])
+            out.setdefault(name, {})[_label_str(labels) or "_"] = {
+                "count": count,
+                "sum_ms": round(h[-2], 2),
+                "mean_ms": round(h[-2] / count, 2) if count else None,
+                "p50_ms": self._quantile(h, 0.50),
+                "p90_ms": self._quantile(h, 0.90),
+                "p99_ms": self._quantile(h, 0.99),
+            }
+        return out
+
+    def render_prometheus(self, extra_gauges: Optional[Dict[str, float]] = None) -> str:
+        """
+        Prometheus text exposition (format 0.0.4).
+        """
+        m = self._merged()
+        ns = self.namespace
+        lines: List[str] = []
+
+        for key, v in sorted(m.counters.items()):
+            name = _counter_name(key)
+            lines.append(f"# TYPE {ns}_{name} counter")
+            lines.append(f"{ns}_{name} {v}")
+
+        seen_types = set()
+        for (key, labels), v in sorted(m.labeled.items()):
+            name = _counter_name(key)
+            if name not in seen_types:
+                lines.append(f"# TYPE {ns}_{name} counter")
+                seen_types.add(name)
+            lines.append(f"{ns}_{name}{{{_label_str(labels)}}} {v}")
+
+        for (name, labels), h in sorted(m.hists.items()):
+            if name not in seen_types:
+                lines.append(f"# TYPE {ns}_{name} histogram")
+                seen_types.add(name)
+            prefix = _label_str(labels)
+            sep = "," if prefix else ""
+            cumulative = 0.0
+            for i, bound in enumerate(self.buckets_ms):
+                cumulative += h[i]
+                lines.append(f'{ns}_{name}_bucket{{{prefix}{sep}le="{bound:g}"}} {int(cumulative)}')
+            lines.append(f'{ns}_{name}_bucket{{{prefix}{sep}le="+Inf"}} {int(h[-1])}')
+            label_part = f"{{{prefix}}}" if prefix else ""
+            lines.append(f"{ns}_{name}_sum{label_part} {h[-2]:.3f}")
+            lines.append(f"{ns}_{name}_count{label_part} {int(h[-1])}")
+
+        for key, v in sorted((extra_gauges or {}).items()):
+            lines.append(f"# TYPE {ns}_{key} gauge")
+            lines.append(f"{ns}_{key} {float(v):g}")
+
+        return "\n".join(lines) + "\n"
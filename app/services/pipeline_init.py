@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import logging
+import math
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class PipelineUnavailable(Exception):
+    def __init__(self, reason: str, retry_after_sec: int, error: Optional[str] = None) -> None:
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after_sec = retry_after_sec
+        self.error = error
+
+
+class PipelineInitializer:
+    """
+    Single-flight lazy init for requests that find no published pipeline.
+    - the first caller starts one background build; later callers join it instead of
+      starting their own (one source hash / one re-embed, however many requests arrive)
+    - callers wait at most wait_sec, then get PipelineUnavailable("initializing");
+      the build keeps running and publishes when done
+    - a failed build is remembered for backoff_sec: callers in that window fail fast
+      with PipelineUnavailable("init_failed") instead of retrying it
+    """
+    def __init__(
+        self,
+        build: Callable[[], Tuple[Any, Dict[str, Any]]],
+        publish: Callable[[Any, Dict[str, Any]], None],
+        wait_sec: float = 5.0,
+        backoff_sec: float = 30.0,
+        metrics: Any = None,
+    ) -> None:
+        self.build = build
+        self.publish = publish
+        self.wait_sec = max(0.0, float(wait_sec))
+        self.backoff_sec = max(0.0, float(backoff_sec))
+        self.metrics = metrics
+        self._lock = threading.Lock()
+        self._running: Optional[threading.Event] = None
+        self._started_at = 0.0
+        self._failed_at = 0.0
+        self.last_error: Optional[str] = None
+
+    def ensure(self, wait_sec: Optional[float] = None) -> None:
+        """
+        Returns once a build has succeeded; raises PipelineUnavailable otherwise.
+        """
+        with self._lock:
+            if self._running is None:
+                backoff_left = self._failed_at + self.backoff_sec - time.monotonic()
+                if self.last_error is not None and backoff_left > 0:
+                    self._inc("pipeline_init_fast_fail_total")
+                    raise PipelineUnavailable("init_failed", math.ceil(backoff_left), self.last_error)
+                self._running = threading.Event()
+                self._started_at = time.monotonic()
+                threading.Thread(target=self._run, args=(self._running,), name="pipeline-init", daemon=True).start()
+            done = self._running
+
+        if not done.wait(self.wait_sec if wait_sec is None else wait_sec):
+            self._inc("pipeline_init_wait_timeout_total")
+            raise PipelineUnavailable("initializing", max(1, math.ceil(self.wait_sec)))
+        if self.last_error is not None:
+            raise PipelineUnavailable("init_failed", max(1, math.ceil(self.backoff_sec)), self.last_error)
+
+    def _run(self, done: threading.Event) -> None:
+        try:
+            pipeline, report = self.build()
+            self.publish(pipeline, report)
+            self.last_error = None
+            self._inc("pipeline_init_total")
+            logger.info("RAG ready (lazy init, %.1fs): %s", time.monotonic() - self._started_at, report.get("index_version"))
+        except Exception as exc:
+            self.last_error = f"{type(exc).__name__}: {exc}"
+            self._failed_at = time.monotonic()
+            self._inc("pipeline_init_failed_total")
+            logger.warning("lazy pipeline init failed (next try in %.0fs): %s", self.backoff_sec, self.last_error)
+        finally:
+            with self._lock:
+                self._running = None
+            done.set()
+
+    def _inc(self, name: str) -> None:
+        if self.metrics is not None:
+            self.metrics.inc(name, 1)
+
+    def snapshot(self) -> Dict[str, Any]:
+        running = self._running is not None
+        backoff_left = self._failed_at + self.backoff_sec - time.monotonic() if self.last_error else 0.0
+        return {
+            "running": running,
+            "running_sec": round(time.monotonic() - self._started_at, 1) if running else None,
+            "last_error": self.last_error,
+            "backoff_remaining_sec": round(max(0.0, backoff_left), 1),
+        }
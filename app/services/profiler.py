@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+# Leaf frames that mean "thread is parked", not "thread is using CPU"
+_IDLE_LEAVES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+    ("selectors.py", "select"),
+    ("thread.py", "_worker"),
+    ("_thread.py", "_worker"),  # anyio worker waiting for work
+}
+
+
+def _short_path(filename: str) -> str:
+    i = filename.rfind("site-packages" + os.sep)
+    if i >= 0:
+        return filename[i + len("site-packages") + 1:]
+    for marker in ("app", "scripts"):
+        i = filename.rfind(os.sep + marker + os.sep)
+        if i >= 0:
+            return filename[i + 1:]
+    return os.path.basename(filename)
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler over all threads (event loop, threadpool workers, background threads).
+    - a daemon thread snapshots sys._current_frames() every interval_sec
+    - output is collapsed stacks ("thread;outer;...;leaf count"), the input format of
+      flamegraph.pl / speedscope / inferno
+    - only one profile at a time per process (acquire() guard)
+    Cost is one stack walk per thread per sample; at 10 ms that is well under 1% of a core.
+    """
+    _guard = threading.Lock()
+
+    def __init__(self, interval_sec: float = 0.01, include_idle: bool = False) -> None:
+        self.interval_sec = max(0.001, float(interval_sec))
+        self.include_idle = include_idle
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._started = 0.0
+        self._elapsed = 0.0
+        self._labels: Dict[Any, str] = {}
+
+    @classmethod
+    def acquire(cls) -> bool:
+        return cls._guard.acquire(blocking=False)
+
+    @classmethod
+    def release(cls) -> None:
+        cls._guard.release()
+
+    @staticmethod
+    def _frame_label(code) -> str:
+        return f"{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})"
+
+    def _thread_names(self) -> Dict[int, str]:
+        return {t.ident: t.name for t in threading.enumerate() if t.ident is not None}
+
+    def _sample(self, own_ident: int, names: Dict[int, str]) -> None:
+        for ident, frame in sys._current_frames().items():
+            if ident == own_ident:
+                continue
+            code = frame.f_code
+            if not self.include_idle and (os.path.basename(code.co_filename), code.co_name) in _IDLE_LEAVES:
+                continue
+            stack: List[str] = []
+            while frame is not None:
+                code = frame.f_code
+                label = self._labels.get(code)
+                if label is None:
+                    label = self._labels[code] = self._frame_label(code)
+                stack.append(label)
+                frame = frame.f_back
+            stack.append(names.get(ident, f"thread-{ident}").replace(";", ":").replace(" ", "_"))
+            stack.reverse()
+            self.stacks[";".join(stack)] += 1
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        names = self._thread_names()
+        next_names = time.monotonic() + 1.0
+        while not self._stop.wait(self.interval_sec):
+            if time.monotonic() >= next_names:
+                names = self._thread_names()
+                next_names = time.monotonic() + 1.0
+            self._sample(own, names)
+            self.samples += 1
+
+    def start(self) -> None:
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self._elapsed = time.perf_counter() - self._started
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {n}\n" for stack, n in self.stacks.most_common())
+
+    def summary(self, top: int = 30) -> Dict[str, Any]:
+        """
+        Self time (leaf frames) and inclusive time per function, in samples.
+        """
+        self_counts: Counter = Counter()
+        incl_counts: Counter = Counter()
+        threads: Counter = Counter()
+        for stack, n in self.stacks.items():
+            frames = stack.split(";")
+            threads[frames[0]] += n
+            self_counts[frames[-1]] += n
+            for f in set(frames[1:]):
+                incl_counts[f] += n
+        return {
+            "duration_sec": round(self._elapsed, 3),
+            "interval_ms": round(self.interval_sec * 1000, 2),
+            "samples": self.samples,
+            "stack_samples": sum(self.stacks.values()),
+            "distinct_stacks": len(self.stacks),
+            "threads": dict(threads.most_common()),
+            "top_self": self_counts.most_common(top),
+            "top_inclusive": incl_counts.most_common(top),
+        }
@@ -4,6 +4,7 @@ import re
 from typing import Any, Dict, List
 
 from app.services.reranker import rerank_candidates
+from app.utils.tracing import span
 
 META_PATTERNS = [
     r"این\s*فایل", r"درباره\s*چی", r"درباره\s*چیه",
@@ -110,4 +111,6 @@ def choose_best_answer(
     if not ans:
         return {"ok": False, "reason": "empty_answer", "best": {"vector_score": v, "combined": c}}
 
-    return {"ok": True, "answer": polish_answer_for_user(ans), "best": best, "ranked_preview": ranked[:5]}
+    with span("polish"):
+        answer = polish_answer_for_user(ans)
+    return {"ok": True, "answer": answer, "best": best, "ranked_preview": ranked[:5]}
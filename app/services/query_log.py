@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import json
+import logging
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class QueryLogWriter:
+    """
+    Append-only JSONL query log written by a background thread.
+    - log() only enqueues the record dict (put_nowait); serialization and disk I/O
+      happen on the writer thread, so the request path never waits on the disk
+    - bounded queue: when full the record is dropped and counted
+    - rotation by size or age: the live file is renamed to <name>.<YYYYmmdd-HHMMSS>.jsonl,
+      keeping the newest `backups` rotated files
+    """
+    def __init__(
+        self,
+        path: str,
+        max_queue: int = 10000,
+        max_bytes: int = 50 * 1024 * 1024,
+        rotate_interval_sec: float = 86400,
+        backups: int = 14,
+        batch_size: int = 256,
+    ) -> None:
+        self.path = Path(path)
+        self.max_bytes = max(1024, int(max_bytes))
+        self.rotate_interval_sec = float(rotate_interval_sec)
+        self.backups = max(0, int(backups))
+        self.batch_size = max(1, int(batch_size))
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(maxsize=max(1, int(max_queue)))
+        self._thread: Optional[threading.Thread] = None
+        self._file = None
+        self._opened_at = 0.0
+        self._size = 0
+        self.written = 0
+        self.dropped = 0
+        self.write_errors = 0
+        self.rotations = 0
+
+    # ---- request path ----
+
+    def log(self, record: Dict[str, Any]) -> bool:
+        try:
+            self._queue.put_nowait(record)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    # ---- writer thread ----
+
+    def _open(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._size = self.path.stat().st_size
+        self._opened_at = time.time()
+
+    def _rotated_files(self) -> List[Path]:
+        # oldest first; mtime because same-second rotations get a "-n" suffix that sorts before "."
+        return sorted(self.path.parent.glob(f"{self.path.stem}.*{self.path.suffix}"), key=lambda p: p.stat().st_mtime)
+
+    def _rotate(self) -> None:
+        self._file.close()
+        self._file = None
+        if self._size > 0:
+            stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime())
+            target = self.path.with_name(f"{self.path.stem}.{stamp}{self.path.suffix}")
+            n = 1
+            while target.exists():
+                target = self.path.with_name(f"{self.path.stem}.{stamp}-{n}{self.path.suffix}")
+                n += 1
+            self.path.rename(target)
+            self.rotations += 1
+            for old in self._rotated_files()[:-self.backups or None]:
+                old.unlink(missing_ok=True)
+        self._open()
+
+    def _should_rotate(self) -> bool:
+        if self._size >= self.max_bytes:
+            return True
+        return self.rotate_interval_sec > 0 and time.time() - self._opened_at >= self.rotate_interval_sec
+
+    def _write(self, batch: List[Dict[str, Any]]) -> None:
+        data = "".join(
+            json.dumps(r, ensure_ascii=False, separators=(",", ":"), default=str) + "\n" for r in batch
+        )
+        try:
+            if self._file is None:
+                self._open()
+            elif self._should_rotate():
+                self._rotate()
+            self._file.write(data)
+            self._file.flush()
+            self._size += len(data.encode("utf-8"))
+            self.written += len(batch)
+        except Exception as exc:
+            self.write_errors += 1
+            logger.warning("query log write failed (%d records lost): %s", len(batch), exc)
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            batch: List[Dict[str, Any]] = []
+            if first is None:
+                stopping = True
+            else:
+                batch.append(first)
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    continue
+                batch.append(item)
+            if batch:
+                self._write(batch)
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="query-log-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """
+        Flush what is queued and stop the writer thread.
+        """
+        if self._thread is None:
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            logger.warning("query log queue full at shutdown; pending records may be lost")
+        self._thread.join(timeout=timeout)
+        self._thread = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "path": str(self.path),
+            "running": self._thread is not None,
+            "queue_depth": self._queue.qsize(),
+            "written_total": self.written,
+            "dropped_total": self.dropped,
+            "write_errors_total": self.write_errors,
+            "rotations_total": self.rotations,
+        }
@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+import hashlib
+import math
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+
+@dataclass(frozen=True)
+class ClientPolicy:
+    name: str
+    rate_per_sec: float
+    burst: int
+    expensive_rate_per_sec: float
+    expensive_burst: int
+    admin: bool = False
+
+    def limits(self, limit_class: str) -> Tuple[float, int]:
+        if limit_class == "expensive":
+            return self.expensive_rate_per_sec, self.expensive_burst
+        return self.rate_per_sec, self.burst
+
+
+def build_key_policies(keys: Mapping[str, Mapping[str, Any]], default: ClientPolicy) -> Dict[str, ClientPolicy]:
+    """
+    {"<api key>": {"name": "crm", "rate_per_sec": 2, "burst": 10, "admin": false, ...}}
+    -> {api key: ClientPolicy}; missing fields take the default policy's values.
+    """
+    policies: Dict[str, ClientPolicy] = {}
+    for key, spec in (keys or {}).items():
+        spec = dict(spec or {})
+        policies[key] = ClientPolicy(
+            name=str(spec.get("name") or f"key-{hashlib.sha256(key.encode()).hexdigest()[:8]}"),
+            rate_per_sec=float(spec.get("rate_per_sec", default.rate_per_sec)),
+            burst=int(spec.get("burst", default.burst)),
+            expensive_rate_per_sec=float(spec.get("expensive_rate_per_sec", default.expensive_rate_per_sec)),
+            expensive_burst=int(spec.get("expensive_burst", default.expensive_burst)),
+            admin=bool(spec.get("admin", False)),
+        )
+    return policies
+
+
+@dataclass
+class RateDecision:
+    allowed: bool
+    limit: int
+    remaining: int
+    reset_sec: int
+    retry_after_sec: int = 0
+
+
+def _decide(allowed: bool, tokens: float, rate: float, burst: int, cost: float) -> RateDecision:
+    # reset: time until the bucket is full again; retry: time until `cost` tokens are available
+    reset = math.ceil(max(0.0, burst - tokens) / rate) if rate > 0 else 0
+    retry = 0 if allowed else math.ceil(max(0.0, cost - tokens) / rate) if rate > 0 else 60
+    return RateDecision(
+        allowed=allowed,
+        limit=int(burst),
+        remaining=max(0, int(math.floor(tokens))),
+        reset_sec=int(reset),
+        retry_after_sec=max(1, int(retry)) if not allowed else 0,
+    )
+
+
+class InMemoryBucketStore:
+    """
+    Token buckets for a single process. Event-loop only (no locks).
+    Idle, full buckets are dropped once the table grows past max_entries.
+    """
+    def __init__(self, max_entries: int = 10000) -> None:
+        self.max_entries = max(100, int(max_entries))
+        # key -> (tokens, last update, seconds until full again at the bucket's own rate)
+        self._buckets: Dict[str, Tuple[float, float, float]] = {}
+
+    def _prune(self, now: float) -> None:
+        stale = [k for k, (tokens, ts, refill) in self._buckets.items() if now - ts >= refill]
+        for k in stale:
+            del self._buckets[k]
+
+    async def take(self, key: str, rate: float, burst: int, cost: float = 1.0) -> RateDecision:
+        now = time.monotonic()
+        tokens, ts, _ = self._buckets.get(key, (float(burst), now, 0.0))
+        tokens = min(float(burst), tokens + max(0.0, now - ts) * rate)
+        allowed = tokens >= cost
+        if allowed:
+            tokens -= cost
+        if key not in self._buckets and len(self._buckets) >= self.max_entries:
+            self._prune(now)
+        # rate 0 never refills: such a bucket is never idle-full, keep it
+        refill = (float(burst) - tokens) / rate if rate > 0 else math.inf
+        self._buckets[key] = (tokens, now, refill)
+        return _decide(allowed, tokens, rate, burst, cost)
+
+
+# Atomic token bucket in Redis; uses the server clock so replicas agree on time.
+_REDIS_TOKEN_BUCKET = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local data = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(data[1]) or burst
+local ts = tonumber(data[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+if tokens >= cost then
+  tokens = tokens - cost
+  allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+-- Expire once the bucket would be full again; rate 0 never refills, keep it for a day
+local ttl = 86400
+if rate > 0 then
+  ttl = math.min(ttl, math.ceil(burst / rate) + 1)
+end
+redis.call('EXPIRE', KEYS[1], ttl)
+return {allowed, tostring(tokens)}
+"""
+
+
+class RedisBucketStore:
+    """
+    Token buckets shared by all replicas (needs the optional `redis` package).
+    If Redis is unreachable the request is allowed (fail open) and counted.
+    """
+    def __init__(self, url: str, prefix: str = "rl:") -> None:
+        try:
+            import redis.asyncio as redis_asyncio
+        except ImportError as exc:
+            raise RuntimeError("rate_limit_redis_url is set but the 'redis' package is not installed") from exc
+        self.prefix = prefix
+        self._client = redis_asyncio.from_url(url)
+        self._script = self._client.register_script(_REDIS_TOKEN_BUCKET)
+        self.errors = 0
+
+    async def take(self, key: str, rate: float, burst: int, cost: float = 1.0) -> RateDecision:
+        try:
+            allowed, tokens = await self._script(keys=[self.prefix + key], args=[rate, burst, cost])
+        except Exception:
+            self.errors += 1
+            return RateDecision(allowed=True, limit=int(burst), remaining=int(burst), reset_sec=0)
+        return _decide(bool(int(allowed)), float(tokens), rate, burst, cost)
+
+
+class RateLimiter:
+    """
+    Per-client token buckets: one "default" and one "expensive" bucket per client.
+    - anonymous: policy for callers without an API key (bucketed per client IP)
+    - keys: API key -> ClientPolicy
+    - store: InMemoryBucketStore (per process) or RedisBucketStore (shared by replicas)
+    """
+    def __init__(
+        self,
+        anonymous: ClientPolicy,
+        keys: Optional[Dict[str, ClientPolicy]] = None,
+        store: Any = None,
+    ) -> None:
+        self.anonymous = anonymous
+        self.keys = keys or {}
+        self.store = store or InMemoryBucketStore()
+        self._checked = 0
+        self._limited: Dict[str, int] = {}
+
+    def policy_for_key(self, api_key: str) -> Optional[ClientPolicy]:
+        return self.keys.get(api_key)
+
+    async def check(self, client_id: str, policy: ClientPolicy, limit_class: str) -> RateDecision:
+        rate, burst = policy.limits(limit_class)
+        decision = await self.store.take(f"{client_id}:{limit_class}", rate, burst)
+        self._checked += 1
+        if not decision.allowed:
+            self._limited[policy.name] = self._limited.get(policy.name, 0) + 1
+        return decision
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "store": type(self.store).__name__,
+            "store_errors": getattr(self.store, "errors", 0),
+            "keys": len(self.keys),
+            "checked_total": self._checked,
+            "limited_total": sum(self._limited.values()),
+            "limited_by_client": dict(self._limited),
+        }
@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# build(progress) -> (pipeline, report); on_ready(pipeline, report) publishes the result
+BuildFn = Callable[[Callable[[str, int, int], None]], Tuple[Any, Dict[str, Any]]]
+ReadyFn = Callable[[Any, Dict[str, Any]], None]
+
+FINISHED = ("succeeded", "failed", "cancelled")
+# Files are being written / the pipeline swapped: the job completes, cancel is refused
+UNCANCELLABLE_STAGES = ("saving", "swapping", "done")
+
+
+class ReindexCancelled(Exception):
+    pass
+
+
+class ReindexJob:
+    """
+    One background rebuild. progress() is called from the build thread (and the
+    embedding workers' consumer); it raises ReindexCancelled once cancel() was requested.
+    """
+    def __init__(self) -> None:
+        self.id = uuid.uuid4().hex[:12]
+        self.state = "queued"
+        self.stage = "queued"
+        self.done = 0
+        self.total = 0
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.error: Optional[str] = None
+        self.report: Optional[Dict[str, Any]] = None
+        self._embed_started: Optional[float] = None
+        self._cancel = threading.Event()
+        self._finished = threading.Event()
+        # Orders cancel() against stage changes: a cancel is either seen by progress() or refused
+        self._stage_lock = threading.Lock()
+
+    def progress(self, stage: str, done: int, total: int) -> None:
+        with self._stage_lock:
+            if self._cancel.is_set():
+                raise ReindexCancelled()
+            if stage == "embedding" and self._embed_started is None:
+                self._embed_started = time.monotonic()
+            self.stage, self.done, self.total = stage, done, total
+
+    def set_stage(self, stage: str) -> None:
+        with self._stage_lock:
+            self.stage = stage
+
+    def cancellable(self) -> bool:
+        return self.state not in FINISHED and self.stage not in UNCANCELLABLE_STAGES
+
+    def cancel(self) -> bool:
+        """
+        False once the job finished or started writing files (it will complete).
+        """
+        with self._stage_lock:
+            if not self.cancellable():
+                return False
+            self._cancel.set()
+            return True
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._finished.wait(timeout)
+
+    def snapshot(self) -> Dict[str, Any]:
+        rate = eta = None
+        if self._embed_started is not None and self.stage == "embedding" and self.state == "running":
+            elapsed = time.monotonic() - self._embed_started
+            if elapsed > 0 and self.done > 0:
+                rate = self.done / elapsed
+                eta = (self.total - self.done) / rate
+        end = self.finished_at or time.time()
+        return {
+            "job_id": self.id,
+            "state": self.state,
+            "stage": self.stage,
+            "cancel_requested": self._cancel.is_set() and self.state not in FINISHED,
+            "cancellable": self.cancellable(),
+            "records_embedded": self.done,
+            "records_total": self.total,
+            "progress": round(self.done / self.total, 4) if self.total else 0.0,
+            "records_per_sec": round(rate, 2) if rate is not None else None,
+            "eta_sec": round(eta, 1) if eta is not None else None,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "elapsed_sec": round(end - self.started_at, 2) if self.started_at else None,
+            "error": self.error,
+            "report": self.report,
+        }
+
+
+class ReindexManager:
+    """
+    Runs index rebuilds as background jobs, one at a time.
+    - the current pipeline keeps serving while a job runs; on success on_ready() swaps
+      the new one in (a single reference assignment, so requests see old or new, never half)
+    - a failed or cancelled job leaves the served pipeline and the files on disk untouched
+    - the last `history` jobs stay queryable
+    """
+    def __init__(
+        self,
+        build: BuildFn,
+        on_ready: ReadyFn,
+        lock: Optional[threading.Lock] = None,
+        metrics: Any = None,
+        history: int = 20,
+    ) -> None:
+        self.build = build
+        self.on_ready = on_ready
+        self.lock = lock or threading.Lock()
+        self.metrics = metrics
+        self.history = max(1, int(history))
+        self._jobs: "OrderedDict[str, ReindexJob]" = OrderedDict()
+        self._jobs_lock = threading.Lock()
+
+    def start(self, skip_if: Optional[Callable[[], bool]] = None) -> Optional[ReindexJob]:
+        """
+        Starts a job; None if a rebuild already holds the lock.
+        - skip_if() is checked while holding the lock (earlier jobs have published by then);
+          True = nothing to do, no job is started and None is returned
+        """
+        if not self.lock.acquire(blocking=False):
+            return None
+        if skip_if is not None and skip_if():
+            self.lock.release()
+            return None
+        job = ReindexJob()
+        with self._jobs_lock:
+            self._jobs[job.id] = job
+            while len(self._jobs) > self.history:
+                self._jobs.popitem(last=False)
+        threading.Thread(target=self._run, args=(job,), name=f"reindex-{job.id}", daemon=True).start()
+        return job
+
+    def _run(self, job: ReindexJob) -> None:
+        job.state = "running"
+        job.started_at = time.time()
+        try:
+            pipeline, report = self.build(job.progress)
+            job.set_stage("swapping")  # files are written by now: no cancelling past this point
+            self.on_ready(pipeline, report)
+            job.report = report
+            job.set_stage("done")
+            job.state = "succeeded"
+            self._inc("reindex_total")
+        except ReindexCancelled:
+            job.state = "cancelled"
+            self._inc("reindex_cancelled_total")
+            logger.info("reindex %s cancelled at stage=%s (%d/%d)", job.id, job.stage, job.done, job.total)
+        except Exception as exc:
+            job.state = "failed"
+            job.error = f"{type(exc).__name__}: {exc}"
+            self._inc("reindex_failed_total")
+            logger.exception("reindex %s failed at stage=%s: %s", job.id, job.stage, exc)
+        finally:
+            job.finished_at = time.time()
+            self.lock.release()
+            job._finished.set()
+
+    def _inc(self, name: str) -> None:
+        if self.metrics is not None:
+            self.metrics.inc(name, 1)
+
+    def get(self, job_id: str) -> Optional[ReindexJob]:
+        with self._jobs_lock:
+            return self._jobs.get(job_id)
+
+    def current(self) -> Optional[ReindexJob]:
+        with self._jobs_lock:
+            for job in reversed(self._jobs.values()):
+                if job.state not in FINISHED:
+                    return job
+        return None
+
+    def list(self) -> List[Dict[str, Any]]:
+        with self._jobs_lock:
+            jobs = list(self._jobs.values())
+        return [j.snapshot() for j in reversed(jobs)]
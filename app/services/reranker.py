@@ -15,6 +15,12 @@ def _tokenize(text: str) -> List[str]:
     tokens = re.findall(r"\w+", (text or "").lower(), flags=re.UNICODE)
     return [t for t in tokens if len(t) > 1 and t not in STOPWORDS]
 
+def tokenize_for_match(text: str) -> List[str]:
+    """
+    Match-normalised content tokens (stopwords and 1-char tokens removed).
+    """
+    return _tokenize(normalize_for_match(text))
+
 def jaccard(a_tokens: List[str], b_tokens: List[str]) -> float:
     if not a_tokens or not b_tokens:
         return 0.0
@@ -32,9 +38,17 @@ def rerank_candidates(
     alpha: float = 0.65,
     beta: float = 0.25,
     gamma: float = 0.10,
+    char_similarity_enabled: bool = True,
 ) -> List[Dict[str, Any]]:
+    """
+    char_similarity_enabled=False skips SequenceMatcher (the costly part) and spreads
+    beta over alpha/gamma proportionally, so combined scores stay on the same scale.
+    """
     q_norm = normalize_for_match(query)
     q_tokens = _tokenize(q_norm)
+    if not char_similarity_enabled and (alpha + gamma) > 0:
+        scale = (alpha + beta + gamma) / (alpha + gamma)
+        alpha, beta, gamma = alpha * scale, 0.0, gamma * scale
 
     ranked: List[Dict[str, Any]] = []
     for r in results:
@@ -43,7 +57,7 @@ def rerank_candidates(
         cand_tokens = _tokenize(cand_q_norm)
 
         vscore = float(r.get("score", 0.0) or 0.0)
-        cscore = char_similarity(q_norm, cand_q_norm)
+        cscore = char_similarity(q_norm, cand_q_norm) if char_similarity_enabled else 0.0
         jscore = jaccard(q_tokens, cand_tokens)
         combined = alpha * vscore + beta * cscore + gamma * jscore
 
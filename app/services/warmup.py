@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from datetime import datetime, tzinfo
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+WARMUP_PROBE_TEXT = "سلام، این یک درخواست آزمایشی برای آماده‌سازی مدل است."
+
+
+def warm_up_models(embedder, chat_provider=None, chat_num_ctx: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Load models before the service reports ready.
+    - embeds a probe string on every embedding backend (loads the embedding model)
+    - if chat_provider is given (generation enabled), runs a one-token chat call on every chat backend
+    Never raises; failures are recorded in the report.
+    """
+    report: Dict[str, Any] = {"ok": True, "started_at": time.time(), "steps": {}}
+
+    t0 = time.perf_counter()
+    try:
+        backends = embedder.warm_up(WARMUP_PROBE_TEXT)
+        report["steps"]["embed"] = {
+            "ok": True,
+            "model": embedder.model,
+            "ms": int((time.perf_counter() - t0) * 1000),
+            "backends": backends,
+        }
+    except Exception as exc:
+        report["ok"] = False
+        report["steps"]["embed"] = {"ok": False, "model": embedder.model, "error": str(exc)}
+
+    if chat_provider is not None:
+        t0 = time.perf_counter()
+        try:
+            stats = chat_provider.warm_up(num_ctx=chat_num_ctx)
+            report["steps"]["chat"] = {
+                "ok": True,
+                "model": chat_provider.model,
+                "ms": int((time.perf_counter() - t0) * 1000),
+                **stats,
+            }
+        except Exception as exc:
+            report["ok"] = False
+            report["steps"]["chat"] = {"ok": False, "model": chat_provider.model, "error": str(exc)}
+
+    report["total_ms"] = sum(int(s.get("ms", 0)) for s in report["steps"].values())
+    return report
+
+
+def _parse_hours(spec: str) -> Tuple[int, int]:
+    """
+    "08:00-18:00" -> (480, 1080) minutes since midnight.
+    """
+    start, end = (spec or "00:00-24:00").split("-", 1)
+
+    def _minutes(hhmm: str) -> int:
+        h, m = hhmm.strip().split(":", 1)
+        return int(h) * 60 + int(m)
+
+    return _minutes(start), _minutes(end)
+
+
+def _load_tz(name: str) -> Optional[tzinfo]:
+    if not name:
+        return None
+    try:
+        from zoneinfo import ZoneInfo
+        return ZoneInfo(name)
+    except Exception:
+        logger.warning("Unknown keep-alive timezone %r; using local time", name)
+        return None
+
+
+class KeepAliveScheduler:
+    """
+    Background thread that keeps models resident during business hours.
+    - every interval_sec, inside the hours/days window, calls keep_alive_ping()
+      on each target (embedder, chat provider)
+    - outside the window it does nothing and lets Ollama unload idle models
+    """
+    def __init__(
+        self,
+        targets: Iterable[Any],
+        interval_sec: int = 240,
+        business_hours: str = "08:00-18:00",
+        business_days: Iterable[int] = (5, 6, 0, 1, 2, 3),
+        timezone: str = "",
+    ) -> None:
+        self.targets: List[Any] = [t for t in targets if t is not None]
+        self.interval_sec = max(5, int(interval_sec))
+        self.start_min, self.end_min = _parse_hours(business_hours)
+        self.business_days = {int(d) for d in business_days}
+        self.tz = _load_tz(timezone)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._pings = 0
+        self._failures = 0
+        self._last_ping_at: Optional[float] = None
+        self._last_error: Optional[str] = None
+
+    def in_window(self, now: Optional[datetime] = None) -> bool:
+        now = now or datetime.now(self.tz)
+        if now.weekday() not in self.business_days:
+            return False
+        minute = now.hour * 60 + now.minute
+        return self.start_min <= minute < self.end_min
+
+    def tick(self) -> None:
+        if not self.in_window():
+            return
+        for target in self.targets:
+            try:
+                target.keep_alive_ping()
+                with self._lock:
+                    self._pings += 1
+                    self._last_ping_at = time.time()
+            except Exception as exc:
+                with self._lock:
+                    self._failures += 1
+                    self._last_error = f"{type(target).__name__}: {exc}"
+                logger.warning("keep-alive ping failed: %s: %s", type(target).__name__, exc)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_sec):
+            self.tick()
+
+    def start(self) -> None:
+        if self._thread is not None or not self.targets:
+            return
+        self._thread = threading.Thread(target=self._run, name="ollama-keepalive", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "running": self._thread is not None,
+                "interval_sec": self.interval_sec,
+                "in_window": self.in_window(),
+                "targets": [type(t).__name__ for t in self.targets],
+                "pings": self._pings,
+                "failures": self._failures,
+                "last_ping_at": self._last_ping_at,
+                "last_error": self._last_error,
+            }
@@ -2,7 +2,14 @@ from __future__ import annotations
 
 import json
 from pathlib import Path
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, Iterator, List, Tuple
+
+try:
+    import orjson  # optional: several times faster than json for these records
+except ImportError:
+    orjson = None
+
+_BAD = object()
 
 
 def _pick_first_str(d: dict, keys: List[str]) -> str:
@@ -13,77 +20,114 @@ def _pick_first_str(d: dict, keys: List[str]) -> str:
     return ""
 
 
-def load_source_documents(path: str) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+def _parse_line(raw: bytes) -> Any:
     """
-    Supports:
-      - .jsonl (each line a record) -> returns docs with {doc_id, question, answer, meta}
-      - .txt -> a single doc with {text}
+    JSON value of one line; _BAD if it is not valid JSON. Lines the fast parser rejects
+    (invalid UTF-8, NaN, huge ints) are retried with json on the leniently decoded text.
+    """
+    if orjson is not None:
+        try:
+            return orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            pass
+    try:
+        return json.loads(raw.decode("utf-8", errors="ignore").strip())
+    except Exception:
+        return _BAD
+
+
+def count_lines(path: str) -> int:
+    """
+    Number of lines without decoding them (cheap progress total for streaming loads).
+    """
+    n = 0
+    last = b"\n"
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            n += chunk.count(b"\n")
+            last = chunk[-1:]
+    return n + (last != b"\n")
+
+
+def iter_source_documents(path: str, report: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """
+    Streams docs one at a time (same records as load_source_documents), reading the file
+    line by line, so memory does not grow with the corpus.
+    - report is filled like load_source_documents' report; the jsonl_* counters are final
+      once the generator is exhausted
     """
     file_path = Path(path)
-    report: Dict[str, Any] = {
+    report.update({
         "source_path": str(file_path),
         "exists": file_path.exists(),
         "file_type": file_path.suffix.lower(),
-    }
+    })
     if not file_path.exists():
-        return [], report
-
-    suffix = file_path.suffix.lower()
-
-    if suffix == ".jsonl":
-        docs: List[Dict[str, Any]] = []
-        total = 0
-        parsed = 0
-        skipped = 0
-        bad_json = 0
-
-        lines = file_path.read_text(encoding="utf-8", errors="ignore").splitlines()
-        for i, line in enumerate(lines):
-            total += 1
-            s = (line or "").strip()
-            if not s:
-                skipped += 1
-                continue
-            try:
-                obj = json.loads(s)
-            except Exception:
-                bad_json += 1
-                continue
-            if not isinstance(obj, dict):
-                skipped += 1
-                continue
-
-            q = _pick_first_str(obj, ["question","q","query","prompt","title","input"])
-            a = _pick_first_str(obj, ["answer","a","response","completion","output"])
-
-            # fallback: if the record has text/content, treat it as q (still fine for embedding)
-            if not q:
-                q = _pick_first_str(obj, ["text","content","body","message","document"])
-            if not q:
-                skipped += 1
-                continue
-
-            docs.append({
-                "doc_id": f"jsonl-{parsed:06d}",
-                "question": q,
-                "answer": a,
-                "meta": {"record_index": parsed},
-            })
-            parsed += 1
+        return
+
+    if file_path.suffix.lower() != ".jsonl":
+        # plain text fallback
+        text = file_path.read_text(encoding="utf-8", errors="ignore").strip()
+        report.update({"raw_chars": len(text)})
+        yield {"doc_id": "doc-000000", "text": text, "meta": {}}
+        return
+
+    report.update({"jsonl_total_lines": 0, "jsonl_parsed_records": 0, "jsonl_skipped": 0, "jsonl_bad_json": 0})
+    total = parsed = skipped = bad_json = 0
+    try:
+        with file_path.open("rb") as f:
+            for raw in f:
+                total += 1
+                line = raw.strip()
+                if not line:
+                    skipped += 1
+                    continue
+                obj = _parse_line(line)
+                if obj is _BAD:
+                    # Unicode-only whitespace lines count as empty, like str.strip() would
+                    if not line.decode("utf-8", errors="ignore").strip():
+                        skipped += 1
+                    else:
+                        bad_json += 1
+                    continue
+                if not isinstance(obj, dict):
+                    skipped += 1
+                    continue
+
+                q = _pick_first_str(obj, ["question","q","query","prompt","title","input"])
+                a = _pick_first_str(obj, ["answer","a","response","completion","output"])
 
+                # fallback: if the record has text/content, treat it as q (still fine for embedding)
+                if not q:
+                    q = _pick_first_str(obj, ["text","content","body","message","document"])
+                if not q:
+                    skipped += 1
+                    continue
+
+                doc = {
+                    "doc_id": f"jsonl-{parsed:06d}",
+                    "question": q,
+                    "answer": a,
+                    "meta": {"record_index": parsed},
+                }
+                parsed += 1  # before yielding: a consumer that stops here still got this record
+                yield doc
+    finally:
         report.update({
             "jsonl_total_lines": total,
             "jsonl_parsed_records": parsed,
             "jsonl_skipped": skipped,
             "jsonl_bad_json": bad_json,
         })
-        return docs, report
-
-    # plain text fallback
-    text = file_path.read_text(encoding="utf-8", errors="ignore").strip()
-    report.update({"raw_chars": len(text)})
-    return [{
-        "doc_id": "doc-000000",
-        "text": text,
-        "meta": {},
-    }], report
+
+
+def load_source_documents(path: str) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Supports:
+      - .jsonl (each line a record) -> returns docs with {doc_id, question, answer, meta}
+      - .txt -> a single doc with {text}
+    Whole corpus in memory; iter_source_documents() streams the same docs.
+    """
+    report: Dict[str, Any] = {}
+    docs = list(iter_source_documents(path, report))
+    return docs, report
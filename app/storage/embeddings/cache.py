@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+
+class EmbeddingCache:
+    """
+    Thread-safe LRU of query embeddings keyed by the normalised query text.
+    One cache per retriever (and so per embedding model / index build).
+    """
+    def __init__(self, max_entries: int = 2048) -> None:
+        self.max_entries = max(1, int(max_entries))
+        self._data: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, text: str) -> Optional[List[float]]:
+        with self._lock:
+            vec = self._data.get(text)
+            if vec is None:
+                self._misses += 1
+                return None
+            self._data.move_to_end(text)
+            self._hits += 1
+            return vec
+
+    def put(self, text: str, vector: List[float]) -> None:
+        with self._lock:
+            self._data[text] = vector
+            self._data.move_to_end(text)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._data),
+                "max_entries": self.max_entries,
+                "hits": self._hits,
+                "misses": self._misses,
+            }
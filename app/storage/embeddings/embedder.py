@@ -1,17 +1,69 @@
-from typing import Iterable, List, Sequence
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Deque, Dict, Iterable, Iterator, List, Optional, Sequence
 import httpx
 
+from app.services.backend_pool import BackendPool
+
 
 class OllamaEmbedder:
     """
     Ollama embeddings client.
     Tries /api/embed first (newer), then falls back to /api/embeddings (legacy).
+    With a multi-backend pool each call goes to the backend the pool picks,
+    and embed_many / embed_batches spread batches over all backends in parallel.
     """
 
-    def __init__(self, base_url: str, model: str, timeout_sec: int = 30) -> None:
-        self.base_url = base_url.rstrip("/")
+    def __init__(
+        self,
+        base_url: str,
+        model: str,
+        timeout_sec: int = 30,
+        keep_alive: Optional[str] = None,
+        pool: Optional[BackendPool] = None,
+    ) -> None:
+        self.pool = pool or BackendPool([base_url])
+        self.base_url = self.pool.urls[0]
         self.model = model
         self.timeout_sec = timeout_sec
+        # How long Ollama keeps the model loaded after each call (e.g. "30m"); None = server default
+        self.keep_alive = keep_alive
+
+    def _payload(self, **fields) -> dict:
+        payload = {"model": self.model, **fields}
+        if self.keep_alive:
+            payload["keep_alive"] = self.keep_alive
+        return payload
+
+    def keep_alive_ping(self, timeout_sec: Optional[float] = None) -> None:
+        """
+        Refresh residency on every backend: an /api/embed call with empty input only loads the model.
+        """
+        errors = []
+        with httpx.Client(timeout=timeout_sec or self.timeout_sec) as client:
+            for url in self.pool.urls:
+                try:
+                    resp = client.post(f"{url}/api/embed", json=self._payload(input=[]))
+                    resp.raise_for_status()
+                except Exception as exc:
+                    errors.append(f"{url}: {exc}")
+        if errors:
+            raise RuntimeError("; ".join(errors))
+
+    def warm_up(self, probe: str) -> Dict[str, int]:
+        """
+        Embed the probe on every backend; returns {url: ms}. Raises if any backend fails.
+        """
+        timings: Dict[str, int] = {}
+        with httpx.Client(timeout=self.timeout_sec) as client:
+            for url in self.pool.urls:
+                t0 = time.perf_counter()
+                resp = client.post(f"{url}/api/embed", json=self._payload(input=probe))
+                resp.raise_for_status()
+                self._parse_embedding_response(resp.json())
+                timings[url] = int((time.perf_counter() - t0) * 1000)
+        return timings
 
     def _parse_embedding_response(self, data: dict) -> List[float]:
         """
@@ -37,61 +89,123 @@ class OllamaEmbedder:
 
         raise ValueError(f"Unsupported Ollama embedding response format: {data}")
 
-    def embed_text(self, text: str) -> List[float]:
+    def embed_text(self, text: str, timeout_sec: Optional[float] = None) -> List[float]:
+        """
+        timeout_sec bounds the whole call (both endpoints together);
+        defaults to the client's configured timeout.
+        """
         text = (text or "").strip()
         if not text:
             raise ValueError("Cannot embed empty text")
 
-        with httpx.Client(timeout=self.timeout_sec) as client:
+        budget = float(timeout_sec) if timeout_sec is not None else float(self.timeout_sec)
+        ends_at = time.monotonic() + budget
+
+        with self.pool.acquire() as backend, httpx.Client(timeout=budget) as client:
             # Try modern endpoint first
             try:
                 resp = client.post(
-                    f"{self.base_url}/api/embed",
-                    json={"model": self.model, "input": text},
+                    f"{backend.url}/api/embed",
+                    json=self._payload(input=text),
                 )
                 resp.raise_for_status()
                 return self._parse_embedding_response(resp.json())
             except Exception:
-                # Fallback to legacy endpoint
+                # Fallback to legacy endpoint, only with whatever budget is left
+                remaining = ends_at - time.monotonic()
+                if remaining <= 0:
+                    raise
                 resp = client.post(
-                    f"{self.base_url}/api/embeddings",
-                    json={"model": self.model, "prompt": text},
+                    f"{backend.url}/api/embeddings",
+                    json=self._payload(prompt=text),
+                    timeout=remaining,
                 )
                 resp.raise_for_status()
                 return self._parse_embedding_response(resp.json())
 
     def _embed_batch(self, client: httpx.Client, batch: List[str]) -> List[List[float]]:
-        """Send one mini-batch; returns list of vectors or raises."""
-        resp = client.post(
-            f"{self.base_url}/api/embed",
-            json={"model": self.model, "input": batch},
-        )
-        resp.raise_for_status()
-        data = resp.json()
+        """Send one mini-batch to the pool's pick; returns list of vectors or raises."""
+        with self.pool.acquire() as backend:
+            resp = client.post(
+                f"{backend.url}/api/embed",
+                json=self._payload(input=batch),
+            )
+            resp.raise_for_status()
+            data = resp.json()
         if "embeddings" in data and isinstance(data["embeddings"], list):
             rows = data["embeddings"]
             if rows and isinstance(rows[0], list):
                 return [[float(x) for x in row] for row in rows]
         raise ValueError(f"Unexpected batch response format: {list(data.keys())}")
 
-    def embed_many(self, texts: Iterable[str], batch_size: int = 32) -> List[List[float]]:
+    def _embed_batch_or_items(self, client: httpx.Client, batch: List[str]) -> List[List[float]]:
+        try:
+            return self._embed_batch(client, batch)
+        except Exception:
+            # Per-item fallback for this batch only
+            return [self.embed_text(text) for text in batch]
+
+    def embed_many(
+        self,
+        texts: Iterable[str],
+        batch_size: int = 32,
+        progress: Optional[Callable[[int], None]] = None,
+    ) -> List[List[float]]:
+        """
+        progress(n_embedded) is called after every batch; an exception raised
+        by it (e.g. a cancelled job) stops the run and cancels queued batches.
+        """
         cleaned: List[str] = [(t or "").strip() for t in texts]
         cleaned = [t for t in cleaned if t]
         if not cleaned:
             return []
 
+        batches = (cleaned[i : i + batch_size] for i in range(0, len(cleaned), batch_size))
         results: List[List[float]] = []
-        with httpx.Client(timeout=self.timeout_sec) as client:
-            for i in range(0, len(cleaned), batch_size):
-                batch = cleaned[i : i + batch_size]
-                try:
-                    results.extend(self._embed_batch(client, batch))
-                except Exception:
-                    # Per-item fallback for this batch only
-                    for text in batch:
-                        results.append(self.embed_text(text))
+        for vectors in self.embed_batches(batches, progress=progress):
+            results.extend(vectors)
         return results
 
+    def embed_batches(
+        self,
+        batches: Iterable[List[str]],
+        progress: Optional[Callable[[int], None]] = None,
+    ) -> Iterator[List[List[float]]]:
+        """
+        Embeds batches lazily and yields their vectors in input order.
+        - batches may be a generator over a large corpus: it is consumed only as far as
+          needed to keep two batches per backend in flight
+        - progress(n_embedded) after every batch; an exception raised by it (or closing
+          the generator) cancels the queued batches
+        """
+        done = 0
+
+        def finished(vectors: List[List[float]]) -> List[List[float]]:
+            nonlocal done
+            done += len(vectors)
+            if progress is not None:
+                progress(done)
+            return vectors
+
+        with httpx.Client(timeout=self.timeout_sec) as client:
+            if self.pool.size > 1:
+                # One worker per backend
+                with ThreadPoolExecutor(max_workers=self.pool.size) as ex:
+                    pending: Deque[Future] = deque()
+                    try:
+                        for batch in batches:
+                            pending.append(ex.submit(self._embed_batch_or_items, client, batch))
+                            if len(pending) >= 2 * self.pool.size:
+                                yield finished(pending.popleft().result())
+                        while pending:
+                            yield finished(pending.popleft().result())
+                    finally:
+                        for f in pending:
+                            f.cancel()  # batches not started yet
+            else:
+                for batch in batches:
+                    yield finished(self._embed_batch_or_items(client, batch))
+
     @staticmethod
     def infer_dimension(vec: Sequence[float]) -> int:
         if not vec:
@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import tarfile
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from app.storage.vectorstore.snapshots import (
+    FEATURES_FILE,
+    INDEX_FILE,
+    MANIFEST_FILE,
+    METADATA_FILE,
+    STATE_FILE,
+    SnapshotError,
+    file_entries,
+    verify_files,
+)
+from app.utils.hashing import file_fingerprint
+
+BUNDLE_FORMAT = 1
+BUNDLE_KIND = "rag-index-bundle"
+
+
+def _is_archive(path: str) -> bool:
+    return str(path).endswith((".tar.gz", ".tgz"))
+
+
+def write_bundle(snapshot_dir: str, out: str, features: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Packs a snapshot as a self-contained index bundle: index, metadata, state, features and
+    a manifest (model, schema version, index mode, source hash, checksums).
+    - out ending in .tar.gz / .tgz: one archive; otherwise a directory (replaced if it exists)
+    - features: used when the snapshot has no features file (older snapshots)
+    """
+    src = Path(snapshot_dir)
+    try:
+        snap = json.loads((src / MANIFEST_FILE).read_text(encoding="utf-8"))
+    except Exception as exc:
+        raise SnapshotError(f"not a snapshot: {src} ({exc})") from exc
+    state = snap.get("index_state") or {}
+
+    with tempfile.TemporaryDirectory(prefix="bundle-") as tmp:
+        staging = Path(tmp) / "bundle"
+        staging.mkdir()
+        for name in (INDEX_FILE, METADATA_FILE, STATE_FILE):
+            shutil.copy2(src / name, staging / name)
+        if (src / FEATURES_FILE).exists():
+            shutil.copy2(src / FEATURES_FILE, staging / FEATURES_FILE)
+        elif features is not None:
+            (staging / FEATURES_FILE).write_text(json.dumps(features, ensure_ascii=False), encoding="utf-8")
+
+        names = sorted(p.name for p in staging.iterdir())
+        manifest = {
+            "format": BUNDLE_FORMAT,
+            "kind": BUNDLE_KIND,
+            "created_at": time.time(),
+            "snapshot": snap.get("version"),
+            "items": snap.get("items"),
+            "dim": snap.get("dim"),
+            "embedding_model": state.get("embedding_model"),
+            "index_schema_version": state.get("index_schema_version"),
+            "index_mode": state.get("index_mode"),
+            "source_hash": state.get("source_hash"),
+            "index_state": state,
+            "files": file_entries(staging, names),
+        }
+        (staging / MANIFEST_FILE).write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+
+        dest = Path(out)
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        tmp_dest = dest.with_name(f".{dest.name}.tmp")
+        if _is_archive(out):
+            with tarfile.open(tmp_dest, "w:gz") as tf:
+                for name in names + [MANIFEST_FILE]:
+                    tf.add(staging / name, arcname=name)
+            os.replace(tmp_dest, dest)
+        else:
+            shutil.rmtree(tmp_dest, ignore_errors=True)
+            shutil.copytree(staging, tmp_dest)
+            if dest.exists():
+                shutil.rmtree(dest)
+            os.rename(tmp_dest, dest)
+    return manifest
+
+
+def _extract(archive: Path, extract_root: Path) -> Path:
+    """
+    Extracts once per archive version (keyed by its fingerprint); older extractions are removed.
+    """
+    fp = file_fingerprint(str(archive))
+    key = hashlib.sha256(f"{archive.resolve()}|{fp}".encode("utf-8")).hexdigest()[:16]
+    target = extract_root / key
+    if (target / MANIFEST_FILE).exists():
+        return target
+
+    extract_root.mkdir(parents=True, exist_ok=True)
+    tmp = extract_root / f".tmp-{key}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir()
+    try:
+        with tarfile.open(archive, "r:gz") as tf:
+            for member in tf.getmembers():
+                # Flat archive of regular files only: no paths, links or devices
+                if not member.isfile() or "/" in member.name or "\\" in member.name or member.name.startswith("."):
+                    raise SnapshotError(f"unexpected bundle member: {member.name!r}")
+                with tf.extractfile(member) as src, (tmp / member.name).open("wb") as dst:
+                    shutil.copyfileobj(src, dst)
+        os.rename(tmp, target)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    for old in extract_root.iterdir():
+        if old.is_dir() and old != target and not old.name.startswith("."):
+            shutil.rmtree(old, ignore_errors=True)
+    return target
+
+
+def open_bundle(path: str, extract_dir: str) -> Tuple[Path, Dict[str, Any]]:
+    """
+    Directory holding the bundle files (archives are extracted under extract_dir) and its
+    manifest. Checksums are not verified here (see verify_files). Raises SnapshotError.
+    """
+    p = Path(path)
+    if not p.exists():
+        raise SnapshotError(f"bundle not found: {path}")
+    try:
+        directory = _extract(p, Path(extract_dir)) if p.is_file() else p
+        manifest = json.loads((directory / MANIFEST_FILE).read_text(encoding="utf-8"))
+    except SnapshotError:
+        raise
+    except Exception as exc:
+        raise SnapshotError(f"unreadable bundle {path}: {exc}") from exc
+    if manifest.get("kind") != BUNDLE_KIND or int(manifest.get("format") or 0) != BUNDLE_FORMAT:
+        raise SnapshotError(f"unsupported bundle format: {manifest.get('kind')} v{manifest.get('format')}")
+    return directory, manifest
+
+
+def verify_bundle(directory: Path, manifest: Dict[str, Any]) -> None:
+    verify_files(directory, manifest, label=f"bundle {manifest.get('snapshot')}")
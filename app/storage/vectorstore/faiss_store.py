@@ -4,10 +4,24 @@ import json
 from pathlib import Path
 from typing import Dict, List, Sequence
 
-import faiss
 import numpy as np
 
 
+def _faiss():
+    # Imported on first use: the module is the biggest single import of the app, and
+    # deferring it lets startup overlap it with other loading work
+    import faiss
+    return faiss
+
+
+def read_index(path: str):
+    return _faiss().read_index(str(path))
+
+
+def read_metadata(path: str) -> List[Dict]:
+    return json.loads(Path(path).read_text(encoding="utf-8"))
+
+
 class FaissStore:
     def __init__(self, index_path: str, metadata_path: str, embedding_dim: int = 0) -> None:
         self.index_path = Path(index_path)
@@ -48,13 +62,13 @@ class FaissStore:
         return arr / norm
 
     def _build_index(self, dim: int) -> None:
-        self.index = faiss.IndexFlatIP(dim)
+        self.index = _faiss().IndexFlatIP(dim)
 
     def save(self) -> None:
         if self.index is None:
             raise ValueError("Cannot save FAISS index before building/loading it")
         self._ensure_parent_dirs()
-        faiss.write_index(self.index, str(self.index_path))
+        _faiss().write_index(self.index, str(self.index_path))
         self.metadata_path.write_text(
             json.dumps(self.metadata, ensure_ascii=False, indent=2),
             encoding="utf-8",
@@ -63,15 +77,30 @@ class FaissStore:
     def load(self) -> bool:
         if not self.index_path.exists() or not self.metadata_path.exists():
             return False
-        self.index = faiss.read_index(str(self.index_path))
-        self.metadata = json.loads(self.metadata_path.read_text(encoding="utf-8"))
-        self.embedding_dim = int(self.index.d)
+        self.set_loaded(read_index(str(self.index_path)), read_metadata(str(self.metadata_path)))
         return True
 
+    def set_loaded(self, index, metadata: List[Dict]) -> None:
+        """
+        Installs an index + metadata read elsewhere (e.g. concurrently, see ingestion_service).
+        """
+        if int(index.ntotal) != len(metadata):
+            raise ValueError(f"Index/metadata mismatch: ntotal={index.ntotal} metadata={len(metadata)}")
+        self.index = index
+        self.metadata = metadata
+        self.embedding_dim = int(index.d)
+
     def build_from_embeddings(self, items: List[Dict], embeddings: Sequence[Sequence[float]]) -> None:
+        self.index = None
+        self.metadata = []
+        self.add_embeddings(items, embeddings)
+
+    def add_embeddings(self, items: List[Dict], embeddings: Sequence[Sequence[float]]) -> None:
+        """
+        Appends one batch (the index is created on the first), so a corpus can be indexed
+        while it is embedded, without holding all vectors outside the index.
+        """
         if not items:
-            self.index = None
-            self.metadata = []
             return
 
         if len(items) != len(embeddings):
@@ -80,17 +109,18 @@ class FaissStore:
         matrix = self._to_float32_2d(embeddings)
         inferred_dim = int(matrix.shape[1])
 
-        if self.embedding_dim and self.embedding_dim != inferred_dim:
-            raise ValueError(f"EMBEDDING_DIM mismatch: config={self.embedding_dim}, inferred={inferred_dim}")
-
-        self.embedding_dim = inferred_dim
-        self._build_index(self.embedding_dim)
+        if self.index is None:
+            if self.embedding_dim and self.embedding_dim != inferred_dim:
+                raise ValueError(f"EMBEDDING_DIM mismatch: config={self.embedding_dim}, inferred={inferred_dim}")
+            self.embedding_dim = inferred_dim
+            self._build_index(self.embedding_dim)
+        elif inferred_dim != self.embedding_dim:
+            raise ValueError(f"Embedding dim changed mid-build: {self.embedding_dim} -> {inferred_dim}")
 
         matrix = self._l2_normalize_rows(matrix)
         self.index.add(matrix)
 
         keep_keys = ("chunk_id","doc_id","record_index","question","answer")
-        self.metadata = []
         for it in items:
             meta = {k: it.get(k) for k in keep_keys if k in it}
             meta.setdefault("chunk_id", it.get("chunk_id"))
@@ -0,0 +1,246 @@
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+from app.storage.vectorstore.faiss_store import FaissStore
+from app.utils.hashing import sha256_file
+
+INDEX_FILE = "faiss.index"
+METADATA_FILE = "faiss_chunks.json"
+STATE_FILE = "index_state.json"
+# Precomputed query-time features (lexical index tokens), so loading skips tokenisation
+FEATURES_FILE = "features.json"
+MANIFEST_FILE = "manifest.json"
+POINTER_FILE = "CURRENT"
+_TMP_PREFIX = ".tmp-"
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def _fsync(path: Path) -> None:
+    try:
+        fd = os.open(str(path), os.O_RDONLY)
+    except OSError:  # directories cannot be opened on some platforms
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def file_entries(directory: Path, names: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Manifest "files" section: size and sha256 per file.
+    """
+    return {
+        name: {"sha256": sha256_file(str(directory / name)), "bytes": (directory / name).stat().st_size}
+        for name in names
+    }
+
+
+def verify_files(directory: Path, manifest: Dict[str, Any], label: str = "") -> None:
+    """
+    Checks sizes and checksums of the manifest's files; raises SnapshotError.
+    """
+    label = label or str(directory)
+    for name, expected in (manifest.get("files") or {}).items():
+        p = directory / name
+        if not p.exists():
+            raise SnapshotError(f"{label}: missing {name}")
+        if p.stat().st_size != expected.get("bytes"):
+            raise SnapshotError(f"{label}: size mismatch for {name}")
+        if sha256_file(str(p)) != expected.get("sha256"):
+            raise SnapshotError(f"{label}: checksum mismatch for {name}")
+
+
+def _write_json_atomic(path: Path, data: Dict[str, Any]) -> None:
+    tmp = path.with_name(f"{path.name}.tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    _fsync(path.parent)
+
+
+class SnapshotStore:
+    """
+    Versioned index snapshots: <root>/<version>/ holds the FAISS index, its metadata, the
+    index_state and a manifest with sha256 checksums of the other three.
+    - a snapshot is written to a temp dir and renamed into place, so a version dir is
+      always complete; it is never modified afterwards
+    - <root>/CURRENT names the served version and is switched with os.replace()
+      (readers see the old or the new pointer, never a mix of two builds)
+    - the newest `keep` snapshots are kept (the current one always is)
+    """
+    def __init__(self, root: str, keep: int = 5) -> None:
+        self.root = Path(root)
+        self.keep = max(2, int(keep))
+
+    def path(self, version: str) -> Path:
+        if not version or "/" in version or "\\" in version or version.startswith("."):
+            raise SnapshotError(f"invalid snapshot version: {version!r}")
+        return self.root / version
+
+    # -- pointer --
+
+    def pointer(self) -> Dict[str, Any]:
+        """
+        {"version", "pinned", "switched_at"} of the served snapshot; {} when there is none.
+        """
+        p = self.root / POINTER_FILE
+        if not p.exists():
+            return {}
+        try:
+            data = json.loads(p.read_text(encoding="utf-8"))
+        except Exception:
+            return {}
+        return data if isinstance(data, dict) and data.get("version") else {}
+
+    def current(self) -> Optional[str]:
+        return self.pointer().get("version")
+
+    def activate(self, version: str, pinned: bool = False) -> None:
+        """
+        Points CURRENT at an existing snapshot.
+        pinned=True (rollback): serve it even though the source file has changed since.
+        """
+        if not (self.path(version) / MANIFEST_FILE).exists():
+            raise SnapshotError(f"snapshot not found: {version}")
+        _write_json_atomic(
+            self.root / POINTER_FILE,
+            {"version": version, "pinned": bool(pinned), "switched_at": time.time()},
+        )
+
+    # -- write --
+
+    def publish(
+        self,
+        store: FaissStore,
+        state: Dict[str, Any],
+        version: str,
+        features: Optional[Dict[str, Any]] = None,
+    ) -> str:
+        """
+        Writes store + state (+ features) as a new snapshot, switches CURRENT to it and
+        prunes old ones. Returns the version actually used (suffixed if the name was taken).
+        """
+        self.root.mkdir(parents=True, exist_ok=True)
+        base, n = version, 1
+        while (self.root / version).exists():
+            n += 1
+            version = f"{base}-{n}"
+
+        tmp = self.root / f"{_TMP_PREFIX}{version}"
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir()
+        try:
+            writer = FaissStore(index_path=str(tmp / INDEX_FILE), metadata_path=str(tmp / METADATA_FILE))
+            writer.index, writer.metadata = store.index, store.metadata
+            writer.save()
+            (tmp / STATE_FILE).write_text(json.dumps(state, ensure_ascii=False, indent=2), encoding="utf-8")
+            names = [INDEX_FILE, METADATA_FILE, STATE_FILE]
+            if features is not None:
+                (tmp / FEATURES_FILE).write_text(json.dumps(features, ensure_ascii=False), encoding="utf-8")
+                names.append(FEATURES_FILE)
+
+            for name in names:
+                _fsync(tmp / name)
+            files = file_entries(tmp, names)
+            _write_json_atomic(tmp / MANIFEST_FILE, {
+                "version": version,
+                "created_at": time.time(),
+                "items": len(store.metadata),
+                "dim": int(store.index.d) if store.index is not None else 0,
+                "index_state": state,
+                "files": files,
+            })
+            os.rename(tmp, self.root / version)
+            _fsync(self.root)
+        except BaseException:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+
+        store.index_path = self.root / version / INDEX_FILE
+        store.metadata_path = self.root / version / METADATA_FILE
+        self.activate(version)
+        self.prune()
+        return version
+
+    def prune(self) -> List[str]:
+        """
+        Deletes snapshots beyond the newest `keep` (never the current one) and leftover temp dirs.
+        """
+        current = self.current()
+        removed: List[str] = []
+        for p in self.root.glob(f"{_TMP_PREFIX}*"):
+            # A temp dir older than a minute belongs to a crashed build, not a running one
+            if time.time() - p.stat().st_mtime > 60:
+                shutil.rmtree(p, ignore_errors=True)
+        for version in self.versions()[self.keep:]:
+            if version != current:
+                shutil.rmtree(self.root / version, ignore_errors=True)
+                removed.append(version)
+        return removed
+
+    # -- read --
+
+    def versions(self) -> List[str]:
+        """
+        Complete snapshots, newest first (names start with the build timestamp; directory
+        mtimes are not used, they change when files inside are touched).
+        """
+        if not self.root.exists():
+            return []
+        found = [
+            p.name for p in self.root.iterdir()
+            if p.is_dir() and not p.name.startswith(".") and (p / MANIFEST_FILE).exists()
+        ]
+        return sorted(found, reverse=True)
+
+    def manifest(self, version: str) -> Dict[str, Any]:
+        p = self.path(version) / MANIFEST_FILE
+        try:
+            return json.loads(p.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            raise SnapshotError(f"snapshot not found: {version}") from None
+        except Exception as exc:
+            raise SnapshotError(f"unreadable manifest for {version}: {exc}") from exc
+
+    def verify(self, version: str) -> Dict[str, Any]:
+        """
+        Checks sizes and checksums against the manifest; returns the manifest.
+        """
+        manifest = self.manifest(version)
+        verify_files(self.path(version), manifest, label=version)
+        return manifest
+
+    def list(self) -> List[Dict[str, Any]]:
+        current = self.pointer()
+        out = []
+        for version in self.versions():
+            try:
+                m = self.manifest(version)
+            except SnapshotError as exc:
+                out.append({"version": version, "error": str(exc)})
+                continue
+            out.append({
+                "version": version,
+                "current": version == current.get("version"),
+                "pinned": version == current.get("version") and bool(current.get("pinned")),
+                "created_at": m.get("created_at"),
+                "items": m.get("items"),
+                "dim": m.get("dim"),
+                "bytes": sum(int(f.get("bytes") or 0) for f in (m.get("files") or {}).values()),
+                "index_state": m.get("index_state"),
+            })
+        return out
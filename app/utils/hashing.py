@@ -1,6 +1,13 @@
 from __future__ import annotations
 import hashlib
+import json
+import os
+import threading
 from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+_memo: Dict[str, Tuple[Tuple[int, int, int], str]] = {}
+_memo_lock = threading.Lock()
 
 
 def sha256_file(path: str) -> str:
@@ -12,3 +19,64 @@ def sha256_file(path: str) -> str:
         for chunk in iter(lambda: f.read(1024 * 1024), b""):
             h.update(chunk)
     return h.hexdigest()
+
+
+def file_fingerprint(path: str) -> Optional[Tuple[int, int, int]]:
+    """
+    (size, mtime_ns, inode): changes whenever the file is rewritten or replaced.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_size, st.st_mtime_ns, st.st_ino)
+
+
+def sha256_file_cached(path: str, cache_path: str = "") -> str:
+    """
+    sha256_file() that only reads the file again when its fingerprint changed.
+    - remembered in-process and in cache_path (JSON) across restarts
+    - same size + mtime + inode after a content change is not detected (in-place edits
+      within the filesystem's mtime resolution); cache_path="" always hashes
+    """
+    if not cache_path:
+        return sha256_file(path)
+    fp = file_fingerprint(path)
+    if fp is None:
+        return ""
+    key = os.path.abspath(path)
+    with _memo_lock:
+        hit = _memo.get(key)
+    if hit is not None and hit[0] == fp:
+        return hit[1]
+
+    try:
+        cached = json.loads(Path(cache_path).read_text(encoding="utf-8")).get(key) or {}
+    except Exception:
+        cached = {}
+    if tuple(cached.get("fingerprint") or ()) == fp and cached.get("sha256"):
+        with _memo_lock:
+            _memo[key] = (fp, cached["sha256"])
+        return cached["sha256"]
+
+    digest = sha256_file(path)
+    with _memo_lock:
+        _memo[key] = (fp, digest)
+    _save_hash_cache(cache_path, key, fp, digest)
+    return digest
+
+
+def _save_hash_cache(cache_path: str, key: str, fp: Tuple[int, int, int], digest: str) -> None:
+    p = Path(cache_path)
+    try:
+        data = json.loads(p.read_text(encoding="utf-8")) if p.exists() else {}
+    except Exception:
+        data = {}
+    data[key] = {"fingerprint": list(fp), "sha256": digest}
+    try:
+        p.parent.mkdir(parents=True, exist_ok=True)
+        tmp = p.with_name(f"{p.name}.tmp")
+        tmp.write_text(json.dumps(data, indent=2), encoding="utf-8")
+        os.replace(tmp, p)
+    except OSError:
+        pass  # the cache is an optimisation; hashing again next time is fine
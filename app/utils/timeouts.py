@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import math
+import time
+from typing import Dict, List, Mapping, Optional
+
+from app.core.exceptions import DeadlineExceeded
+
+
+class Deadline:
+    """
+    Per-request time budget on the monotonic clock.
+    - budget_for(stage, cap_sec): timeout for the next stage = min(cap, remaining),
+      or None when the remaining budget is below that stage's minimum
+    - require(stage, cap_sec): same, but raises DeadlineExceeded instead of None
+    - remembers the first stage that ran out of time and every degraded stage
+    """
+    def __init__(self, timeout_ms: int, stage_min_ms: Optional[Mapping[str, int]] = None) -> None:
+        self.timeout_ms = max(1, int(timeout_ms))
+        self.started = time.monotonic()
+        self.expires_at = self.started + self.timeout_ms / 1000.0
+        self.stage_min_ms: Dict[str, int] = dict(stage_min_ms or {})
+        self.exhausted_stage: Optional[str] = None
+        self.degraded_stages: List[str] = []
+
+    def remaining_sec(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def remaining_ms(self) -> int:
+        return int(self.remaining_sec() * 1000)
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def mark_exhausted(self, stage: str) -> None:
+        if self.exhausted_stage is None:
+            self.exhausted_stage = stage
+        if stage not in self.degraded_stages:
+            self.degraded_stages.append(stage)
+
+    def budget_for(self, stage: str, cap_sec: float) -> Optional[float]:
+        remaining = self.remaining_sec()
+        min_sec = self.stage_min_ms.get(stage, 0) / 1000.0
+        if remaining <= 0.0 or remaining < min_sec:
+            self.mark_exhausted(stage)
+            return None
+        return min(float(cap_sec), remaining)
+
+    def require(self, stage: str, cap_sec: float) -> float:
+        budget = self.budget_for(stage, cap_sec)
+        if budget is None:
+            raise DeadlineExceeded(stage, self.remaining_ms())
+        return budget
+
+
+def budget_or_default(deadline: Optional[Deadline], stage: str, cap_sec: float) -> Optional[float]:
+    """
+    Stage timeout helper for code paths where the deadline is optional.
+    Returns cap_sec when there is no deadline.
+    """
+    if deadline is None:
+        return float(cap_sec)
+    return deadline.budget_for(stage, cap_sec)
+
+
+def deadline_from_headers(headers: Mapping[str, str], settings) -> Deadline:
+    """
+    Build the request deadline from the client header (milliseconds),
+    falling back to the configured default and clamped to the configured max.
+    """
+    timeout_ms = int(settings.request_deadline_default_ms)
+    raw = headers.get(settings.request_timeout_header)
+    if raw:
+        try:
+            value = float(raw.strip())
+        except ValueError:
+            value = math.nan
+        # inf / nan (or garbage) keep the default instead of failing the request
+        if math.isfinite(value):
+            timeout_ms = int(value)
+    timeout_ms = max(1, min(timeout_ms, int(settings.request_deadline_max_ms)))
+
+    return Deadline(
+        timeout_ms=timeout_ms,
+        stage_min_ms={
+            "embed": settings.deadline_min_embed_ms,
+            "rerank": settings.deadline_min_rerank_ms,
+            "local_generate": settings.deadline_min_local_ms,
+            "api_fallback": settings.deadline_min_api_ms,
+        },
+    )
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import contextvars
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+
+class Span:
+    __slots__ = ("name", "ms")
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.ms = 0.0
+
+
+class RequestTrace:
+    """
+    Flat list of (stage, ms) spans for one request, plus free-form attributes.
+    Created by the observability middleware; worker threads see the same object
+    through the context variable (the threadpool copies the context).
+    """
+    def __init__(self, request_id: Optional[str] = None) -> None:
+        self.request_id = request_id
+        self.started = time.perf_counter()
+        self.spans: List[Tuple[str, float]] = []
+        self.attrs: Dict[str, Any] = {}
+
+    def add(self, name: str, ms: float) -> None:
+        self.spans.append((name, ms))
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+    def breakdown(self) -> Dict[str, float]:
+        """
+        {stage: ms}, repeated stages summed.
+        """
+        out: Dict[str, float] = {}
+        for name, ms in self.spans:
+            out[name] = round(out.get(name, 0.0) + ms, 2)
+        return out
+
+    def server_timing(self, total_ms: Optional[float] = None) -> str:
+        parts = [f"{name};dur={ms:.1f}" for name, ms in self.breakdown().items()]
+        if total_ms is not None:
+            parts.append(f"total;dur={total_ms:.1f}")
+        return ", ".join(parts)
+
+
+_current: contextvars.ContextVar[Optional[RequestTrace]] = contextvars.ContextVar("request_trace", default=None)
+
+
+def start_trace(request_id: Optional[str] = None) -> Tuple[RequestTrace, contextvars.Token]:
+    trace = RequestTrace(request_id)
+    return trace, _current.set(trace)
+
+
+def end_trace(token: contextvars.Token) -> None:
+    _current.reset(token)
+
+
+def current_trace() -> Optional[RequestTrace]:
+    return _current.get()
+
+
+@contextmanager
+def span(name: str) -> Iterator[Span]:
+    """
+    with span("embed") as s: ...   -> s.ms afterwards; recorded on the current trace if any.
+    Cheap enough to leave in hot paths when no trace is active.
+    """
+    s = Span(name)
+    t0 = time.perf_counter()
+    try:
+        yield s
+    finally:
+        s.ms = (time.perf_counter() - t0) * 1000
+        trace = _current.get()
+        if trace is not None:
+            trace.add(name, s.ms)
+
+
+def annotate(**attrs: Any) -> None:
+    """
+    Attach attributes (query, mode, provider, ...) to the current trace, if any.
+    """
+    trace = _current.get()
+    if trace is not None:
+        trace.attrs.update(attrs)
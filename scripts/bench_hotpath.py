@@ -0,0 +1,200 @@
+"""
+Hot-path microbenchmarks with stored baselines and a regression gate.
+
+Benchmarks run on the FAQ corpus (real Persian text): normalisation, rerank, answer
+polishing, FAISS search, JSONL loading and chunking. Each one is timed like timeit
+(loops calibrated to ~0.2 s, best of --repeat) and reported per call.
+
+Timings are divided by a fixed pure-Python reference loop measured right before each
+benchmark, so a baseline recorded on one machine stays roughly comparable on another; the
+gate compares these normalised numbers. Benchmarks over the tolerance are re-measured
+(--retries) and only fail if every attempt is over, which filters out noisy neighbours.
+
+    python -m scripts.bench_hotpath                      # run and print
+    python -m scripts.bench_hotpath --save-baseline      # record scripts/baselines/hotpath.json
+    python -m scripts.bench_hotpath --check              # exit 1 if any benchmark is > tolerance slower
+    python -m scripts.bench_hotpath --check --tolerance 0.15 --filter rerank
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+import numpy as np
+
+from app.services.qa_answering import polish_answer_for_user
+from app.services.reranker import rerank_candidates
+from app.services.text_normalizer import normalize_chars_fa, normalize_for_match
+from app.storage.documents.chunker import chunk_text
+from app.storage.documents.loader import load_source_documents
+from app.storage.vectorstore.faiss_store import FaissStore
+
+SOURCE = "./data/input/Karafarin_QA_enriched.jsonl"
+BASELINE = Path(__file__).parent / "baselines" / "hotpath.json"
+TARGET_SEC = 0.2
+
+
+def _reference() -> None:
+    # Fixed mix of the operations the text hot path is made of (dict/str/list work)
+    d: Dict[int, str] = {}
+    for i in range(2000):
+        d[i] = str(i) * 3
+    "".join(d.values()).replace("1", "2").split("3")
+
+
+def _time(fn: Callable[[], Any], repeat: int) -> float:
+    """
+    Best seconds per call over `repeat` rounds of a calibrated loop.
+    """
+    loops = 1
+    while True:
+        t0 = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        elapsed = time.perf_counter() - t0
+        if elapsed >= TARGET_SEC / 4 or loops >= 1 << 20:
+            break
+        loops *= 2
+    loops = max(1, int(loops * (TARGET_SEC / 4) / max(elapsed, 1e-9)))
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        best = min(best, (time.perf_counter() - t0) / loops)
+    return best
+
+
+def build_benchmarks(source: str) -> List[Tuple[str, Callable[[], Any]]]:
+    docs, _ = load_source_documents(source)
+    rng = random.Random(1)
+    questions = [d["question"] for d in docs if d.get("question")]
+    answers = [d["answer"] for d in docs if d.get("answer")]
+    query = questions[len(questions) // 2]
+    long_answer = max(answers, key=len)
+    candidates = [
+        {"chunk_id": f"c{i}", "question": q, "answer": a, "score": rng.uniform(0.2, 0.9)}
+        for i, (q, a) in enumerate(zip(rng.sample(questions, 100), rng.sample(answers, 100)))
+    ]
+    plain_text = "\n\n".join(answers[:300])
+
+    dim = 1024
+    vectors = np.random.default_rng(1).standard_normal((len(questions), dim)).astype(np.float32)
+    store = FaissStore(index_path="unused", metadata_path="unused")
+    store.build_from_embeddings([{"chunk_id": str(i)} for i in range(len(questions))], vectors)
+    qvec = vectors[7].tolist()
+
+    return [
+        ("normalize_chars_fa/question", lambda: normalize_chars_fa(query)),
+        ("normalize_chars_fa/long_answer", lambda: normalize_chars_fa(long_answer)),
+        ("normalize_for_match/question", lambda: normalize_for_match(query)),
+        ("normalize_for_match/100_questions", lambda: [normalize_for_match(q) for q in questions[:100]]),
+        ("rerank_candidates/k100", lambda: rerank_candidates(query, candidates)),
+        ("rerank_candidates/k100_no_char_sim",
+         lambda: rerank_candidates(query, candidates, char_similarity_enabled=False)),
+        ("rerank_candidates/k20", lambda: rerank_candidates(query, candidates[:20])),
+        ("polish_answer_for_user/long_answer", lambda: polish_answer_for_user(long_answer)),
+        ("faiss_store_search/flat_k100", lambda: store.search(qvec, top_k=100)),
+        ("load_source_documents/corpus", lambda: load_source_documents(source)),
+        ("chunk_text/300_answers", lambda: chunk_text(plain_text)),
+    ]
+
+
+def run(benchmarks: List[Tuple[str, Callable[[], Any]]], repeat: int, quiet: bool = False) -> Dict[str, Any]:
+    results: Dict[str, Dict[str, float]] = {}
+    refs: List[float] = []
+    for name, fn in benchmarks:
+        ref = _time(_reference, repeat)
+        sec = _time(fn, repeat)
+        refs.append(ref)
+        results[name] = {"us": round(sec * 1e6, 2), "relative": round(sec / ref, 4)}
+        if not quiet:
+            print(f"  {name:42s} {sec * 1e6:12.1f} us   ({sec / ref:9.3f} x ref)")
+    return {
+        "reference_us": round(min(refs) * 1e6, 2) if refs else None,
+        "python": sys.version.split()[0],
+        "machine": platform.machine(),
+        "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "benchmarks": results,
+    }
+
+
+def check(
+    current: Dict[str, Any],
+    baseline: Dict[str, Any],
+    benchmarks: List[Tuple[str, Callable[[], Any]]],
+    tolerance: float,
+    repeat: int,
+    retries: int,
+) -> int:
+    def change(name: str) -> float:
+        return current["benchmarks"][name]["relative"] / baseline["benchmarks"][name]["relative"] - 1
+
+    known = [name for name in current["benchmarks"] if name in baseline["benchmarks"]]
+    for _ in range(retries):
+        suspects = [(n, fn) for n, fn in benchmarks if n in known and change(n) > tolerance]
+        if not suspects:
+            break
+        again = run(suspects, repeat, quiet=True)["benchmarks"]
+        for name, res in again.items():
+            if res["relative"] < current["benchmarks"][name]["relative"]:
+                current["benchmarks"][name] = res
+
+    failed = 0
+    print(f"\nvs baseline recorded {baseline.get('recorded_at')} (tolerance +{tolerance:.0%}, normalised):")
+    for name in current["benchmarks"]:
+        if name not in baseline["benchmarks"]:
+            print(f"  {name:42s} new (no baseline)")
+            continue
+        verdict = "REGRESSION" if change(name) > tolerance else "ok"
+        failed += change(name) > tolerance
+        print(f"  {name:42s} {change(name):+8.1%}  {verdict}")
+    return 1 if failed else 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", default=SOURCE)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--filter", default="", help="only benchmarks whose name contains this")
+    parser.add_argument("--baseline", default=str(BASELINE))
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--baseline-rounds", type=int, default=3, help="rounds whose median is saved")
+    parser.add_argument("--check", action="store_true", help="compare with the baseline; exit 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown (0.25 = 25%%)")
+    parser.add_argument("--retries", type=int, default=2, help="re-measure suspected regressions this often")
+    args = parser.parse_args()
+
+    benchmarks = [(n, fn) for n, fn in build_benchmarks(args.source) if not args.filter or args.filter in n]
+    current = run(benchmarks, args.repeat)
+    baseline_path = Path(args.baseline)
+    if args.save_baseline:
+        # Baseline = median of several rounds, so one lucky (or noisy) round does not set the bar
+        rounds = [current] + [run(benchmarks, args.repeat, quiet=True) for _ in range(args.baseline_rounds - 1)]
+        for name in current["benchmarks"]:
+            current["benchmarks"][name] = sorted(
+                (r["benchmarks"][name] for r in rounds), key=lambda x: x["relative"]
+            )[len(rounds) // 2]
+        if args.filter and baseline_path.exists():
+            merged = json.loads(baseline_path.read_text(encoding="utf-8"))
+            merged["benchmarks"].update(current["benchmarks"])
+            current = {**current, "benchmarks": merged["benchmarks"]}
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        baseline_path.write_text(json.dumps(current, indent=2) + "\n", encoding="utf-8")
+        print(f"saved {baseline_path}")
+    if args.check:
+        if not baseline_path.exists():
+            print(f"no baseline at {baseline_path}; run with --save-baseline first")
+            raise SystemExit(2)
+        baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+        raise SystemExit(check(current, baseline, benchmarks, args.tolerance, args.repeat, args.retries))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Peak memory of ingestion: whole-corpus lists vs the streaming loader.
+
+Writes a synthetic JSONL corpus (the configured source replicated to --records records, with
+a numbered suffix so no two records are identical), then indexes it in a fresh interpreter
+per mode, embedding in-process with the fake server's n-gram hashing (no backend needed):
+
+- list:   load_source_documents -> build_index_items -> embed all -> build_from_embeddings
+- stream: iter_source_documents -> iter_index_items -> 32-item batches -> add_embeddings
+
+Reports peak RSS growth over the interpreter baseline (ru_maxrss), the tracemalloc peak of
+Python allocations (--tracemalloc; slows parsing down noticeably) and the wall time.
+
+    python -m scripts.bench_ingest_memory --records 200000
+    python -m scripts.bench_ingest_memory --records 50000 --tracemalloc --out results/ingest_mem.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import Any, Dict
+
+ROOT = Path(__file__).resolve().parent.parent
+
+_RUN_SNIPPET = """
+import json, resource, sys, time, tracemalloc
+from collections import deque
+from itertools import islice
+
+from app.services.ingestion_service import EMBED_BATCH_SIZE, build_index_items, iter_index_items
+from app.storage.documents.loader import iter_source_documents, load_source_documents
+from app.storage.vectorstore.faiss_store import FaissStore
+from scripts.fake_llm_server import embed
+
+mode, path, index_mode, dim, trace = sys.argv[1], sys.argv[2], sys.argv[3], int(sys.argv[4]), sys.argv[5] == "1"
+embed_many = lambda texts: [embed(t, dim) for t in texts]
+store = FaissStore(index_path="", metadata_path="", embedding_dim=dim)
+base_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+if trace:
+    tracemalloc.start()
+t0 = time.perf_counter()
+
+if mode == "list":
+    docs, report = load_source_documents(path)
+    items, embed_inputs = build_index_items(docs, index_mode)
+    store.build_from_embeddings(items=items, embeddings=embed_many(embed_inputs))
+else:
+    report = {}
+    pairs = iter_index_items(iter_source_documents(path, report), index_mode)
+    while True:
+        batch = list(islice(pairs, EMBED_BATCH_SIZE))
+        if not batch:
+            break
+        store.add_embeddings([item for item, _ in batch], embed_many([text for _, text in batch]))
+
+elapsed = time.perf_counter() - t0
+peak_py = tracemalloc.get_traced_memory()[1] if trace else None
+print("RESULT " + json.dumps({
+    "mode": mode,
+    "items": store.index.ntotal,
+    "wall_s": round(elapsed, 2),
+    "rss_growth_mb": round((resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - base_kb) / 1024, 1),
+    "tracemalloc_peak_mb": round(peak_py / 1e6, 1) if peak_py is not None else None,
+    "counters": {k: v for k, v in report.items() if k.startswith("jsonl_")},
+}))
+"""
+
+
+def write_corpus(source: Path, out: Path, records: int) -> int:
+    """
+    Replicates the source records up to `records` lines; returns the file size in bytes.
+    """
+    base = []
+    with source.open("rb") as f:
+        for raw in f:
+            try:
+                obj = json.loads(raw)
+            except ValueError:
+                continue
+            if isinstance(obj, dict):
+                base.append(obj)
+    if not base:
+        raise SystemExit(f"no JSON records in {source}")
+    with out.open("w", encoding="utf-8") as f:
+        for i in range(records):
+            rec = dict(base[i % len(base)])
+            for key in ("question", "q", "query", "prompt", "title", "input"):
+                if isinstance(rec.get(key), str):
+                    rec[key] = f"{rec[key]} #{i}"
+                    break
+            f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+    return out.stat().st_size
+
+
+def run(mode: str, path: Path, index_mode: str, dim: int, trace: bool) -> Dict[str, Any]:
+    proc = subprocess.run(
+        [sys.executable, "-c", _RUN_SNIPPET, mode, str(path), index_mode, str(dim), "1" if trace else "0"],
+        cwd=ROOT, capture_output=True, text=True, env=os.environ.copy(),
+    )
+    line = next((l for l in proc.stdout.splitlines() if l.startswith("RESULT ")), None)
+    if proc.returncode != 0 or line is None:
+        raise SystemExit(f"{mode} run failed:\n{proc.stderr[-2000:]}")
+    return json.loads(line[len("RESULT "):])
+
+
+def main() -> None:
+    from app.core.config import get_settings
+
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", default=settings.static_source_path, help="JSONL records to replicate")
+    parser.add_argument("--records", type=int, default=100_000)
+    parser.add_argument("--index-mode", default=settings.index_mode)
+    parser.add_argument("--dim", type=int, default=64, help="hash embedding dimension")
+    parser.add_argument("--tracemalloc", action="store_true", help="also report the Python allocation peak")
+    parser.add_argument("--out", default="", help="write the results as JSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="ingest-mem-") as tmp:
+        corpus = Path(tmp) / "corpus.jsonl"
+        size = write_corpus(Path(args.source), corpus, args.records)
+        print(f"corpus: {args.records} records, {size / 1e6:.1f} MB, index_mode={args.index_mode}, dim={args.dim}")
+        results = [run(mode, corpus, args.index_mode, args.dim, args.tracemalloc) for mode in ("list", "stream")]
+
+    if results[0]["counters"] != results[1]["counters"] or results[0]["items"] != results[1]["items"]:
+        raise SystemExit(f"modes disagree: {results}")
+    for r in results:
+        traced = f", tracemalloc peak {r['tracemalloc_peak_mb']:8.1f} MB" if r["tracemalloc_peak_mb"] is not None else ""
+        print(f"  {r['mode']:6s} {r['items']} items  peak RSS +{r['rss_growth_mb']:8.1f} MB{traced}  {r['wall_s']:.2f}s")
+    print(f"  counters: {results[1]['counters']}")
+
+    if args.out:
+        Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.out).write_text(json.dumps({"records": args.records, "bytes": size, "runs": results}, indent=2) + "\n",
+                                  encoding="utf-8")
+        print(f"wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Microbenchmark: old BaseHTTPMiddleware stack vs the pure ASGI ObservabilityMiddleware.
+
+Drives a bare Starlette app in-process (no sockets, no server), so the numbers are
+middleware overhead only:
+- plain: small JSON response, mean / p50 / p99 per request
+- streaming: time to first body chunk of a StreamingResponse
+
+    python -m scripts.bench_middleware --requests 20000
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+
+from starlette.applications import Starlette
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+from app.middleware.observability import ObservabilityMiddleware
+from app.services.metrics_service import Metrics
+
+
+# ---- The previous stack, reproduced for comparison ----
+
+class LegacyRequestID(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        incoming = request.headers.get("X-Request-ID")
+        rid = incoming.strip() if incoming else str(uuid.uuid4())
+        request.state.request_id = rid
+        response = await call_next(request)
+        response.headers["X-Request-ID"] = rid
+        return response
+
+
+class LegacyTiming(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        start = time.perf_counter()
+        response = await call_next(request)
+        elapsed_ms = int((time.perf_counter() - start) * 1000)
+        response.headers["X-Process-Time-Ms"] = str(elapsed_ms)
+        request.state.process_time_ms = elapsed_ms
+        return response
+
+
+def _make_legacy_metrics(metrics: Metrics):
+    async def metrics_middleware(request, call_next):
+        metrics.inc("requests_total", 1)
+        response = await call_next(request)
+        metrics.inc("requests_ok" if 200 <= response.status_code < 400 else "requests_error", 1)
+        return response
+    return metrics_middleware
+
+
+# ---- Apps ----
+
+async def _ping(request):
+    return JSONResponse({"ok": True, "rid": request.state.request_id})
+
+
+async def _stream(request):
+    async def body():
+        yield b"first\n"
+        await asyncio.sleep(0.05)
+        yield b"second\n"
+    return StreamingResponse(body(), media_type="text/plain")
+
+
+def _routes():
+    return [Route("/ping", _ping), Route("/stream", _stream)]
+
+
+def build_legacy_app() -> Starlette:
+    app = Starlette(routes=_routes())
+    app.add_middleware(BaseHTTPMiddleware, dispatch=_make_legacy_metrics(Metrics()))
+    app.add_middleware(LegacyRequestID)
+    app.add_middleware(LegacyTiming)
+    return app
+
+
+def build_asgi_app() -> Starlette:
+    app = Starlette(routes=_routes())
+    app.add_middleware(ObservabilityMiddleware, metrics=Metrics())
+    return app
+
+
+# ---- Driver ----
+
+def _scope(path: str) -> dict:
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"host", b"bench")],
+        "client": ("127.0.0.1", 1234),
+        "server": ("bench", 80),
+    }
+
+
+async def _call(app, path: str) -> float:
+    """
+    Runs one request; returns seconds until the first non-empty body chunk.
+    """
+    started = time.perf_counter()
+    first_chunk = None
+    request_sent = False
+    done = asyncio.Event()
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await done.wait()  # like a server: block until the response is finished
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal first_chunk
+        if message["type"] == "http.response.body" and message.get("body") and first_chunk is None:
+            first_chunk = time.perf_counter() - started
+        if message["type"] == "http.response.body" and not message.get("more_body", False):
+            done.set()
+
+    await app(_scope(path), receive, send)
+    return first_chunk if first_chunk is not None else time.perf_counter() - started
+
+
+async def _bench_plain(app, n: int) -> list:
+    for _ in range(min(500, n)):
+        await _call(app, "/ping")  # warm-up
+    samples = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        await _call(app, "/ping")
+        samples.append((time.perf_counter() - t0) * 1e6)
+    return samples
+
+
+def _summary(samples: list) -> str:
+    s = sorted(samples)
+    p99 = s[min(len(s) - 1, int(len(s) * 0.99))]
+    return f"mean={statistics.fmean(s):8.1f}us  p50={s[len(s) // 2]:8.1f}us  p99={p99:8.1f}us"
+
+
+async def main_async(n: int, streams: int) -> None:
+    apps = {"legacy (3x BaseHTTPMiddleware)": build_legacy_app(), "pure ASGI observability": build_asgi_app()}
+    print(f"plain JSON response, {n} requests")
+    for name, app in apps.items():
+        print(f"  {name:32s} {_summary(await _bench_plain(app, n))}")
+
+    print(f"streaming response, time to first chunk ({streams} requests)")
+    for name, app in apps.items():
+        ttfb = [await _call(app, "/stream") * 1000 for _ in range(streams)]
+        print(f"  {name:32s} mean={statistics.fmean(ttfb):8.2f}ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--streams", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main_async(args.requests, args.streams))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+"""
+Offline retrieval quality + latency benchmark over a grid of index configurations.
+
+Embeds the corpus once per index_mode (cached as .npy under --cache-dir, keyed by model and
+inputs), then for every configuration builds a FAISS index from the cached matrix and runs a
+labelled query set through search -> rerank_candidates -> choose_best_answer, one query at a
+time like the service does.
+
+Labels: corpus questions are their own queries (optionally perturbed, see --perturb); a hit is
+any record with the same normalised question. --queries FILE.jsonl adds hand-labelled queries
+as {"query": ..., "question": "<expected FAQ question>"}.
+
+Per configuration: recall@1/5/10 after rerank, candidate recall (expected record anywhere in
+the candidate_k pulled from FAISS), MRR, answer accuracy (answered with the expected answer),
+answered rate, p50/p99 search and rerank ms, index build time and index memory.
+
+    python -m scripts.bench_retrieval --embedder hash --num-queries 300
+    python -m scripts.bench_retrieval --index-modes qa_full,qa_question_only \\
+        --indexes "Flat;HNSW32;IVF32,Flat" --nprobe 4,16 --candidate-k 20,50,100 \\
+        --weights 0.70:0.20:0.10,1:0:0 --perturb 0.5 --out results/bench_retrieval.json
+
+--embedder ollama uses the configured embedding backends (real Ollama, or the fake server in
+scripts/fake_llm_server.py); --embedder hash uses the fake server's n-gram hashing in-process.
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import random
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+import faiss
+import numpy as np
+
+from app.core.config import get_settings
+from app.services.ingestion_service import build_embedder, build_index_items
+from app.services.qa_answering import choose_best_answer
+from app.services.reranker import rerank_candidates
+from app.services.text_normalizer import normalize_chars_fa, normalize_for_match
+from app.storage.documents.loader import load_source_documents
+from scripts.fake_llm_server import embed as hash_embed
+from scripts.load_test import perturb
+
+RECALL_KS = (1, 5, 10)
+
+
+# ---- Embeddings (cached) ----
+
+def make_embed_fn(kind: str, hash_dim: int) -> Tuple[str, Callable[[List[str]], List[List[float]]]]:
+    if kind == "hash":
+        return f"hash{hash_dim}", lambda texts: [hash_embed(t, hash_dim) for t in texts]
+    settings = get_settings()
+    embedder = build_embedder(settings)
+    return settings.ollama_embed_model, lambda texts: embedder.embed_many(texts)
+
+
+def cached_matrix(cache_dir: Path, tag: str, model: str, texts: List[str], embed_fn) -> Tuple[np.ndarray, bool]:
+    key = hashlib.sha256(("\n".join(texts) + "\0" + model).encode("utf-8")).hexdigest()[:16]
+    path = cache_dir / f"{tag}-{model.replace(':', '_').replace('/', '_')}-{key}.npy"
+    if path.exists():
+        return np.load(path), True
+    matrix = np.asarray(embed_fn(texts), dtype=np.float32)
+    matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    np.save(path, matrix)
+    return matrix, False
+
+
+# ---- Queries ----
+
+def build_queries(items: List[Dict[str, Any]], args: argparse.Namespace) -> List[Dict[str, Any]]:
+    rng = random.Random(args.seed)
+    picks = list(range(len(items)))
+    rng.shuffle(picks)
+    queries = []
+    for i in picks[:args.num_queries]:
+        q = items[i]["question"]
+        if args.perturb and rng.random() < args.perturb:
+            q = perturb(q, rng)
+        queries.append({"query": q, "question": items[i]["question"]})
+    if args.queries:
+        for line in Path(args.queries).read_text(encoding="utf-8").splitlines():
+            if line.strip():
+                rec = json.loads(line)
+                queries.append({"query": rec["query"], "question": rec["question"]})
+    return queries
+
+
+def label(queries: List[Dict[str, Any]], items: List[Dict[str, Any]]) -> None:
+    """
+    Expected record positions and answers per query (duplicate questions all count).
+    """
+    by_question: Dict[str, List[int]] = {}
+    for pos, it in enumerate(items):
+        by_question.setdefault(normalize_for_match(it["question"]), []).append(pos)
+    for q in queries:
+        q["relevant"] = set(by_question.get(normalize_for_match(q["question"]), []))
+        q["answers"] = {(items[p].get("answer") or "").strip() for p in q["relevant"]}
+
+
+# ---- Index grid ----
+
+def build_index(spec: str, matrix: np.ndarray) -> faiss.Index:
+    index = faiss.index_factory(matrix.shape[1], spec, faiss.METRIC_INNER_PRODUCT)
+    if not index.is_trained:
+        index.train(matrix)
+    index.add(matrix)
+    return index
+
+
+def search_params(spec: str, nprobes: List[int]) -> List[Tuple[str, int]]:
+    if spec.startswith("IVF"):
+        return [("nprobe", n) for n in nprobes]
+    if spec.startswith("HNSW"):
+        return [("efSearch", n * 8) for n in nprobes]
+    return [("", 0)]
+
+
+def _pct(values: List[float], q: float) -> float:
+    s = sorted(values)
+    return round(s[min(len(s) - 1, int(q * len(s)))], 3) if s else 0.0
+
+
+def run_config(
+    index: faiss.Index,
+    items: List[Dict[str, Any]],
+    queries: List[Dict[str, Any]],
+    qmatrix: np.ndarray,
+    candidate_ks: List[int],
+    weights: List[Tuple[float, float, float]],
+    min_score: float,
+    min_combined: float,
+) -> List[Dict[str, Any]]:
+    k_max = min(max(candidate_ks), len(items))
+    search_ms: List[float] = []
+    hits: List[List[Tuple[int, float]]] = []
+    for row in qmatrix:
+        t0 = time.perf_counter()
+        scores, ids = index.search(row.reshape(1, -1), k_max)
+        search_ms.append((time.perf_counter() - t0) * 1000)
+        hits.append([(int(i), float(s)) for i, s in zip(ids[0], scores[0]) if i >= 0])
+
+    rows = []
+    for ck in candidate_ks:
+        for alpha, beta, gamma in weights:
+            rerank_ms: List[float] = []
+            recall = {k: 0 for k in RECALL_KS}
+            cand_recall = rr_sum = correct = answered = 0
+            for q, hit in zip(queries, hits):
+                cands = [{**items[i], "_pos": i, "score": s} for i, s in hit[:ck]]
+                t0 = time.perf_counter()
+                ranked = rerank_candidates(q["query"], cands, alpha=alpha, beta=beta, gamma=gamma)
+                rerank_ms.append((time.perf_counter() - t0) * 1000)
+                positions = [r["_pos"] for r in ranked]
+                rank = next((n for n, p in enumerate(positions, 1) if p in q["relevant"]), None)
+                cand_recall += rank is not None
+                rr_sum += 1.0 / rank if rank else 0.0
+                for k in RECALL_KS:
+                    recall[k] += bool(rank and rank <= k)
+                picked = choose_best_answer(
+                    q["query"], ranked, min_vector_score=min_score, min_combined=min_combined, rerank_enabled=False,
+                )
+                if picked.get("ok"):
+                    answered += 1
+                    correct += (picked["best"].get("answer") or "").strip() in q["answers"]
+            n = len(queries) or 1
+            rows.append({
+                "candidate_k": ck,
+                "weights": [alpha, beta, gamma],
+                **{f"recall@{k}": round(recall[k] / n, 4) for k in RECALL_KS},
+                "candidate_recall": round(cand_recall / n, 4),
+                "mrr": round(rr_sum / n, 4),
+                "answer_accuracy": round(correct / n, 4),
+                "answered_rate": round(answered / n, 4),
+                "search_p50_ms": _pct(search_ms, 0.5),
+                "search_p99_ms": _pct(search_ms, 0.99),
+                "rerank_p50_ms": _pct(rerank_ms, 0.5),
+                "rerank_p99_ms": _pct(rerank_ms, 0.99),
+            })
+    return rows
+
+
+def _parse_weights(spec: str) -> List[Tuple[float, float, float]]:
+    out = []
+    for part in spec.split(","):
+        a, b, g = (float(x) for x in part.split(":"))
+        out.append((a, b, g))
+    return out
+
+
+def to_markdown(rows: List[Dict[str, Any]]) -> str:
+    cols = ["index_mode", "index", "param", "candidate_k", "weights", "recall@1", "recall@5", "recall@10",
+            "candidate_recall", "mrr", "answer_accuracy", "answered_rate", "search_p50_ms", "search_p99_ms",
+            "rerank_p50_ms", "rerank_p99_ms", "index_mb", "build_ms"]
+    lines = ["| " + " | ".join(cols) + " |", "|" + "---|" * len(cols)]
+    for r in rows:
+        lines.append("| " + " | ".join(str(r.get(c, "")) for c in cols) + " |")
+    return "\n".join(lines)
+
+
+def main() -> None:
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", default=settings.static_source_path)
+    parser.add_argument("--embedder", choices=["ollama", "hash"], default="ollama")
+    parser.add_argument("--hash-dim", type=int, default=1024)
+    parser.add_argument("--cache-dir", default="./data/bench")
+    parser.add_argument("--index-modes", default=settings.index_mode)
+    parser.add_argument("--indexes", default="Flat;HNSW32;IVF32,Flat", help="';'-separated FAISS factory strings")
+    parser.add_argument("--nprobe", default="4,16", help="IVF nprobe values (HNSW uses efSearch = 8 x value)")
+    parser.add_argument("--candidate-k", default=f"20,50,{settings.qa_candidate_k}")
+    parser.add_argument(
+        "--weights",
+        default=f"{settings.rerank_alpha}:{settings.rerank_beta}:{settings.rerank_gamma},1:0:0",
+        help="alpha:beta:gamma,...",
+    )
+    parser.add_argument("--min-score", type=float, default=settings.qa_min_score)
+    parser.add_argument("--min-combined", type=float, default=settings.qa_min_combined)
+    parser.add_argument("--num-queries", type=int, default=500)
+    parser.add_argument("--perturb", type=float, default=0.0, help="fraction of self-labelled queries to perturb")
+    parser.add_argument("--queries", default="", help="extra labelled queries (JSONL: query, question)")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--out", default="", help="write JSON here (and a .md table next to it)")
+    args = parser.parse_args()
+
+    docs, load_report = load_source_documents(args.source)
+    model, embed_fn = make_embed_fn(args.embedder, args.hash_dim)
+    cache_dir = Path(args.cache_dir)
+    candidate_ks = [int(x) for x in args.candidate_k.split(",")]
+    weights = _parse_weights(args.weights)
+    nprobes = [int(x) for x in args.nprobe.split(",")]
+
+    rows: List[Dict[str, Any]] = []
+    for mode in args.index_modes.split(","):
+        items, inputs = build_index_items(docs, mode)
+        queries = build_queries(items, args)
+        label(queries, items)
+        matrix, hit = cached_matrix(cache_dir, f"corpus-{mode}", model, inputs, embed_fn)
+        qtexts = [normalize_chars_fa(q["query"]) for q in queries]
+        qmatrix, _ = cached_matrix(cache_dir, "queries", model, qtexts, embed_fn)
+        print(f"[{mode}] {len(items)} records, {len(queries)} queries, dim={matrix.shape[1]}"
+              f" (corpus embeddings {'cached' if hit else 'computed'})")
+
+        for spec in [s.strip() for s in args.indexes.split(";") if s.strip()]:
+            t0 = time.perf_counter()
+            index = build_index(spec, matrix)
+            build_ms = round((time.perf_counter() - t0) * 1000, 1)
+            index_mb = round(len(faiss.serialize_index(index)) / 1e6, 2)
+            for pname, pval in search_params(spec, nprobes):
+                if pname:
+                    faiss.ParameterSpace().set_index_parameter(index, pname, pval)
+                for row in run_config(index, items, queries, qmatrix, candidate_ks, weights,
+                                      args.min_score, args.min_combined):
+                    row = {"index_mode": mode, "index": spec, "param": f"{pname}={pval}" if pname else "",
+                           "index_mb": index_mb, "build_ms": build_ms, **row}
+                    rows.append(row)
+                    print(f"  {spec:14s} {row['param']:12s} k={row['candidate_k']:<4d} w={row['weights']} "
+                          f"R@1={row['recall@1']:.3f} R@5={row['recall@5']:.3f} MRR={row['mrr']:.3f} "
+                          f"acc={row['answer_accuracy']:.3f} search p50={row['search_p50_ms']}ms "
+                          f"rerank p50={row['rerank_p50_ms']}ms")
+
+    if args.out:
+        out = Path(args.out)
+        out.parent.mkdir(parents=True, exist_ok=True)
+        report = {
+            "config": {**{k: v for k, v in vars(args).items()}, "embedding_model": model,
+                       "records": load_report.get("jsonl_parsed_records")},
+            "results": rows,
+        }
+        out.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+        out.with_suffix(".md").write_text(to_markdown(rows) + "\n", encoding="utf-8")
+        print(f"saved {out} and {out.with_suffix('.md')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Build a portable index bundle for serve-only replicas (INDEX_BUNDLE_PATH).
+
+A bundle holds the FAISS index, metadata, index state, precomputed lexical features and a
+manifest (embedding model, schema version, index mode, source hash, sha256 per file).
+Build it once (e.g. in CI) and ship it; replicas load it without the source file, without
+hashing it and without running ingestion.
+
+    # embed the source now (needs the embedding backend, like POST /admin/reindex)
+    python -m scripts.build_index_bundle --out dist/index.tar.gz
+
+    # pack an index that was already built (CURRENT snapshot, or a given version)
+    python -m scripts.build_index_bundle --snapshot current --out dist/index.tar.gz
+    python -m scripts.build_index_bundle --snapshot 20260301-120000-0b894f3d --out dist/index/
+
+    # check a bundle (manifest + checksums) without serving it
+    python -m scripts.build_index_bundle --verify dist/index.tar.gz
+
+The output is a .tar.gz / .tgz archive, or a directory for any other --out.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from app.core.config import get_settings
+from app.rag.lexical_index import LexicalIndex
+from app.services.ingestion_service import rebuild_index_and_pipeline, snapshot_store
+from app.storage.vectorstore.bundle import open_bundle, verify_bundle, write_bundle
+from app.storage.vectorstore.faiss_store import read_metadata
+from app.storage.vectorstore.snapshots import FEATURES_FILE, METADATA_FILE, SnapshotError
+
+
+def _progress(stage: str, done: int, total: int) -> None:
+    if total:
+        print(f"\r  {stage:10s} {done}/{total}", end="", file=sys.stderr, flush=True)
+    else:
+        print(f"\r  {stage:10s}", end="", file=sys.stderr, flush=True)
+
+
+def _pack(snapshot_dir: Path, out: str) -> dict:
+    features = None
+    if not (snapshot_dir / FEATURES_FILE).exists():
+        # Older snapshots have no features file: compute them here, not on every replica
+        lexical = LexicalIndex(read_metadata(str(snapshot_dir / METADATA_FILE)))
+        features = {"lexical_tokens": lexical.token_lists()}
+    return write_bundle(str(snapshot_dir), out, features=features)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", help="bundle path (.tar.gz / .tgz = archive, else directory)")
+    parser.add_argument("--snapshot", default="", help="pack an existing snapshot: 'current' or a version")
+    parser.add_argument("--verify", default="", metavar="BUNDLE", help="verify a bundle and print its manifest")
+    args = parser.parse_args()
+    settings = get_settings()
+
+    if args.verify:
+        with tempfile.TemporaryDirectory(prefix="bundle-verify-") as tmp:
+            try:
+                directory, manifest = open_bundle(args.verify, tmp)
+                verify_bundle(directory, manifest)
+            except SnapshotError as exc:
+                raise SystemExit(f"invalid bundle: {exc}")
+        print(json.dumps({k: v for k, v in manifest.items() if k != "index_state"}, ensure_ascii=False, indent=2))
+        print("ok", file=sys.stderr)
+        return
+    if not args.out:
+        parser.error("--out is required")
+
+    started = time.perf_counter()
+    if args.snapshot:
+        snapshots = snapshot_store(settings)
+        version = snapshots.current() if args.snapshot == "current" else args.snapshot
+        if not version or version not in snapshots.versions():
+            raise SystemExit(f"snapshot not found: {args.snapshot} (available: {', '.join(snapshots.versions()) or 'none'})")
+        manifest = _pack(snapshots.path(version), args.out)
+    else:
+        # Build into a throwaway snapshot dir: the served index and CURRENT stay untouched
+        with tempfile.TemporaryDirectory(prefix="bundle-build-") as tmp:
+            build_settings = settings.model_copy(update={"index_snapshots_dir": tmp})
+            _, report = rebuild_index_and_pipeline(build_settings, progress=_progress)
+            print(file=sys.stderr)
+            manifest = _pack(Path(tmp) / report["snapshot"], args.out)
+
+    size = sum(int(f["bytes"]) for f in manifest["files"].values())
+    print(
+        f"wrote {args.out}: {manifest['items']} items, dim {manifest['dim']}, model {manifest['embedding_model']}, "
+        f"{size / 1e6:.1f} MB uncompressed, {time.perf_counter() - started:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+"""
+Stand-in for Ollama and an OpenAI-compatible API, for load / chaos tests without GPUs.
+
+Endpoints (request/response shapes as used by this service):
+- POST /api/embed            {"input": str | [str]}  -> {"embeddings": [[...]], ...}
+- POST /api/embeddings       {"prompt": str}         -> {"embedding": [...]}
+- POST /api/chat             {"messages": [...]}     -> {"message": {...}, prompt_eval_count, *_duration}
+- POST /api/generate         load / keep-alive ping  -> {"done": true}
+- POST /v1/chat/completions  OpenAI shape            -> {"choices": [...], "usage": {...}}
+- GET  /api/tags, /api/version
+- GET/POST /fake/config      read / change latency and fault settings at runtime
+- GET  /fake/stats           request, error and timeout counters per endpoint
+
+Embeddings are deterministic: hashed character 3-grams (signed feature hashing) of the
+normalised text, L2-normalised, so similar strings get similar vectors and the same string
+always gets the same vector. Chat answers echo the first answer ("A: ...") of the context.
+
+Latency specs: "const:MS", "uniform:LO:HI", "normal:MEAN:STD", "lognormal:MEDIAN:SIGMA".
+Chat latency = chat spec + prompt tokens x prefill_ms + output tokens x decode_ms.
+Faults per request: error_rate (HTTP 500), busy_rate (HTTP 503), timeout_rate (the request
+hangs for hang_sec). Each model type has its own concurrency limit, like OLLAMA_NUM_PARALLEL;
+requests beyond it queue.
+
+    python -m scripts.fake_llm_server --port 11434 --embed-latency lognormal:25:0.5 --chat-latency const:300
+    OLLAMA_BASE_URL=http://localhost:11434 API_BASE_URL=http://localhost:11434 uvicorn app.main:app
+
+    curl -X POST localhost:11434/fake/config -d '{"error_rate": 0.2}'
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import math
+import random
+import re
+import time
+import unicodedata
+import zlib
+from collections import Counter
+from dataclasses import asdict, dataclass, fields
+from typing import Any, Dict, List, Optional
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+
+@dataclass
+class FakeConfig:
+    embed_dim: int = 1024
+    embed_latency: str = "lognormal:20:0.4"
+    embed_per_item_ms: float = 2.0
+    chat_latency: str = "lognormal:150:0.4"
+    prefill_ms_per_token: float = 0.3
+    decode_ms_per_token: float = 15.0
+    max_output_tokens: int = 64
+    embed_parallel: int = 4
+    chat_parallel: int = 2
+    error_rate: float = 0.0
+    busy_rate: float = 0.0
+    timeout_rate: float = 0.0
+    hang_sec: float = 600.0
+    seed: Optional[int] = None
+
+
+def sample_ms(spec: str, rng: random.Random) -> float:
+    kind, _, rest = spec.partition(":")
+    args = [float(x) for x in rest.split(":") if x]
+    if kind == "const":
+        return args[0]
+    if kind == "uniform":
+        return rng.uniform(args[0], args[1])
+    if kind == "normal":
+        return max(0.0, rng.gauss(args[0], args[1]))
+    if kind == "lognormal":
+        return args[0] * math.exp(rng.gauss(0.0, args[1]))
+    raise ValueError(f"unknown latency spec: {spec}")
+
+
+# ---- Deterministic embeddings ----
+
+_SPACE = re.compile(r"\s+")
+_FOLD = str.maketrans({"ي": "ی", "ك": "ک", "\u200c": " "})
+
+
+def embed(text: str, dim: int) -> List[float]:
+    text = unicodedata.normalize("NFKC", text or "").translate(_FOLD).lower()
+    text = f" {_SPACE.sub(' ', text).strip()} "
+    vec = [0.0] * dim
+    for i in range(len(text) - 2):
+        h = zlib.crc32(text[i:i + 3].encode("utf-8"))
+        vec[h % dim] += 1.0 if (h >> 31) & 1 else -1.0
+    norm = math.sqrt(sum(v * v for v in vec)) or 1.0
+    return [v / norm for v in vec]
+
+
+def _tokens(text: str) -> int:
+    # rough: ~3.5 chars per token for mixed Persian/English
+    return max(1, int(len(text) / 3.5))
+
+
+def _answer(messages: List[Dict[str, Any]]) -> str:
+    user = next((m.get("content") or "" for m in reversed(messages) if m.get("role") == "user"), "")
+    m = re.search(r"A:\s*(.+)", user)
+    if m:
+        return m.group(1).strip()[:400]
+    return "پاسخ آزمایشی سرور جعلی."
+
+
+# ---- App ----
+
+class FakeLLM:
+    def __init__(self, config: FakeConfig) -> None:
+        self.config = config
+        self.rng = random.Random(config.seed)
+        self.stats: Counter = Counter()
+        self._embed_sem = asyncio.Semaphore(config.embed_parallel)
+        self._chat_sem = asyncio.Semaphore(config.chat_parallel)
+
+    def update(self, changes: Dict[str, Any]) -> None:
+        names = {f.name for f in fields(FakeConfig)}
+        for key, value in changes.items():
+            if key not in names:
+                raise ValueError(f"unknown setting: {key}")
+            setattr(self.config, key, value)
+        self._embed_sem = asyncio.Semaphore(self.config.embed_parallel)
+        self._chat_sem = asyncio.Semaphore(self.config.chat_parallel)
+
+    async def _fault(self, endpoint: str) -> Optional[JSONResponse]:
+        self.stats[f"{endpoint}_requests"] += 1
+        r = self.rng.random()
+        c = self.config
+        if r < c.timeout_rate:
+            self.stats[f"{endpoint}_timeouts"] += 1
+            await asyncio.sleep(c.hang_sec)
+            return JSONResponse({"error": "fake timeout"}, status_code=504)
+        if r < c.timeout_rate + c.error_rate:
+            self.stats[f"{endpoint}_errors"] += 1
+            return JSONResponse({"error": "fake internal error"}, status_code=500)
+        if r < c.timeout_rate + c.error_rate + c.busy_rate:
+            self.stats[f"{endpoint}_busy"] += 1
+            return JSONResponse({"error": "fake server busy"}, status_code=503)
+        return None
+
+    async def _work(self, sem: asyncio.Semaphore, ms: float) -> float:
+        """
+        Waits for a model slot, then "computes" for ms; returns total ms including queueing.
+        """
+        started = time.perf_counter()
+        async with sem:
+            await asyncio.sleep(ms / 1000.0)
+        return (time.perf_counter() - started) * 1000
+
+    # -- Ollama --
+
+    async def api_embed(self, request: Request) -> JSONResponse:
+        body = await request.json()
+        fault = await self._fault("embed")
+        if fault is not None:
+            return fault
+        inputs = body.get("input")
+        items = [inputs] if isinstance(inputs, str) else list(inputs or [])
+        if not items:  # load-only call (warm-up / keep-alive)
+            return JSONResponse({"model": body.get("model"), "embeddings": [], "load_duration": 0})
+        ms = sample_ms(self.config.embed_latency, self.rng) + self.config.embed_per_item_ms * len(items)
+        total = await self._work(self._embed_sem, ms)
+        return JSONResponse({
+            "model": body.get("model"),
+            "embeddings": [embed(t, self.config.embed_dim) for t in items],
+            "total_duration": int(total * 1e6),
+            "load_duration": 0,
+            "prompt_eval_count": sum(_tokens(t) for t in items),
+        })
+
+    async def api_embeddings(self, request: Request) -> JSONResponse:
+        body = await request.json()
+        fault = await self._fault("embed")
+        if fault is not None:
+            return fault
+        await self._work(self._embed_sem, sample_ms(self.config.embed_latency, self.rng))
+        return JSONResponse({"embedding": embed(body.get("prompt") or "", self.config.embed_dim)})
+
+    async def api_chat(self, request: Request) -> JSONResponse:
+        body = await request.json()
+        fault = await self._fault("chat")
+        if fault is not None:
+            return fault
+        messages = body.get("messages") or []
+        options = body.get("options") or {}
+        prompt_tokens = sum(_tokens(m.get("content") or "") for m in messages)
+        answer = _answer(messages)
+        out_tokens = min(_tokens(answer), int(options.get("num_predict") or self.config.max_output_tokens))
+        prefill = prompt_tokens * self.config.prefill_ms_per_token
+        decode = out_tokens * self.config.decode_ms_per_token
+        total = await self._work(self._chat_sem, sample_ms(self.config.chat_latency, self.rng) + prefill + decode)
+        return JSONResponse({
+            "model": body.get("model"),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "message": {"role": "assistant", "content": answer},
+            "done": True,
+            "total_duration": int(total * 1e6),
+            "load_duration": 0,
+            "prompt_eval_count": prompt_tokens,
+            "prompt_eval_duration": int(prefill * 1e6),
+            "eval_count": out_tokens,
+            "eval_duration": int(decode * 1e6),
+        })
+
+    async def api_generate(self, request: Request) -> JSONResponse:
+        body = await request.json()
+        fault = await self._fault("generate")
+        if fault is not None:
+            return fault
+        return JSONResponse({"model": body.get("model"), "response": "", "done": True, "load_duration": 0})
+
+    async def api_tags(self, request: Request) -> JSONResponse:
+        return JSONResponse({"models": [{"name": "fake-embed"}, {"name": "fake-chat"}]})
+
+    async def api_version(self, request: Request) -> JSONResponse:
+        return JSONResponse({"version": "0.0.0-fake"})
+
+    # -- OpenAI-compatible --
+
+    async def chat_completions(self, request: Request) -> JSONResponse:
+        body = await request.json()
+        fault = await self._fault("openai_chat")
+        if fault is not None:
+            return fault
+        messages = body.get("messages") or []
+        prompt_tokens = sum(_tokens(m.get("content") or "") for m in messages)
+        answer = _answer(messages)
+        out_tokens = min(_tokens(answer), int(body.get("max_tokens") or self.config.max_output_tokens))
+        await self._work(
+            self._chat_sem,
+            sample_ms(self.config.chat_latency, self.rng) + out_tokens * self.config.decode_ms_per_token,
+        )
+        return JSONResponse({
+            "id": f"chatcmpl-fake-{self.stats['openai_chat_requests']}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": answer}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": out_tokens,
+                      "total_tokens": prompt_tokens + out_tokens},
+        })
+
+    # -- Control --
+
+    async def fake_config(self, request: Request) -> JSONResponse:
+        if request.method == "POST":
+            try:
+                self.update(await request.json())
+            except (ValueError, TypeError) as exc:
+                return JSONResponse({"error": str(exc)}, status_code=422)
+        return JSONResponse(asdict(self.config))
+
+    async def fake_stats(self, request: Request) -> JSONResponse:
+        return JSONResponse(dict(self.stats))
+
+
+def build_app(config: Optional[FakeConfig] = None) -> Starlette:
+    fake = FakeLLM(config or FakeConfig())
+    app = Starlette(routes=[
+        Route("/api/embed", fake.api_embed, methods=["POST"]),
+        Route("/api/embeddings", fake.api_embeddings, methods=["POST"]),
+        Route("/api/chat", fake.api_chat, methods=["POST"]),
+        Route("/api/generate", fake.api_generate, methods=["POST"]),
+        Route("/api/tags", fake.api_tags),
+        Route("/api/version", fake.api_version),
+        Route("/v1/chat/completions", fake.chat_completions, methods=["POST"]),
+        Route("/fake/config", fake.fake_config, methods=["GET", "POST"]),
+        Route("/fake/stats", fake.fake_stats),
+    ])
+    app.state.fake = fake
+    return app
+
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    for f in fields(FakeConfig):
+        default = getattr(FakeConfig, f.name)
+        kind = {int: int, float: float}.get(type(default), str) if default is not None else int
+        parser.add_argument(f"--{f.name.replace('_', '-')}", type=kind, default=default)
+    args = parser.parse_args()
+    config = FakeConfig(**{f.name: getattr(args, f.name) for f in fields(FakeConfig)})
+    uvicorn.run(build_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
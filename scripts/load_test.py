@@ -0,0 +1,380 @@
+"""
+Open-loop load generator for POST /query.
+
+Requests are sent on an arrival schedule (Poisson or constant spacing) that does not wait
+for earlier responses, so a saturated server shows up as growing latency and errors instead
+of a politely slowed-down client (closed-loop tools hide queueing collapse this way).
+Latency is measured from the *scheduled* send time, which also counts client-side delay.
+
+Queries are sampled from the FAQ corpus and optionally perturbed (Persian character variants,
+ZWNJ/punctuation changes, dropped/duplicated words, typos, polite prefixes).
+
+    python -m scripts.load_test --rps 5 --duration 60
+    python -m scripts.load_test --stages 2x30,5x30,10x60,20x60 --perturb 0.5 --out results/run.json
+    python -m scripts.load_test --compare results/before.json results/after.json
+
+Report (stdout + JSON): latency percentiles, status codes, error / fallback / unanswered rates,
+per-provider and per-stage breakdowns, Server-Timing stage means, and a per-second timeline.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import statistics
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+# ---- Query sampling / perturbation ----
+
+_CHAR_VARIANTS = {"ی": "ي", "ک": "ك"}
+_ZWNJ = "\u200c"
+# fallback_reason codes of the "no confident answer" response
+_UNANSWERED = {
+    "no_results", "low_vector_score", "low_combined", "low_lexical_match",
+    "ambiguous_top_match", "empty_answer", "unknown",
+}
+_PREFIXES = ["سلام، ", "ببخشید ", "لطفا بگید ", "سوال داشتم ", "سلام وقت بخیر "]
+_SUFFIXES = ["؟", "?", "", " ممنون", "!!"]
+
+
+def load_queries(path: str) -> List[str]:
+    queries: List[str] = []
+    with open(path, "r", encoding="utf-8") as fh:
+        for line in fh:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                q = (json.loads(line).get("question") or "").strip()
+            except json.JSONDecodeError:
+                continue
+            if q:
+                queries.append(q)
+    return queries
+
+
+def perturb(query: str, rng: random.Random) -> str:
+    """
+    One or two random edits that keep the question recognisable.
+    """
+    for _ in range(rng.randint(1, 2)):
+        op = rng.randrange(6)
+        words = query.split()
+        if op == 0:
+            query = "".join(_CHAR_VARIANTS.get(ch, ch) if rng.random() < 0.5 else ch for ch in query)
+        elif op == 1:
+            query = query.replace(_ZWNJ, " ") if _ZWNJ in query else query.replace("می ", "می" + _ZWNJ)
+        elif op == 2:
+            query = re.sub(r"[؟?!.،,]+\s*$", "", query) + rng.choice(_SUFFIXES)
+        elif op == 3 and len(words) > 3:
+            words.pop(rng.randrange(len(words)))
+            query = " ".join(words)
+        elif op == 4 and words:
+            i = rng.randrange(len(words))
+            words.insert(i, words[i])
+            query = " ".join(words)
+        elif op == 5 and len(query) > 4:
+            i = rng.randrange(len(query) - 1)
+            query = query[:i] + query[i + 1] + query[i] + query[i + 2:]
+        if rng.random() < 0.2:
+            query = rng.choice(_PREFIXES) + query
+    return query
+
+
+# ---- Arrival schedule ----
+
+def parse_stages(spec: Optional[str], rps: float, duration: float) -> List[Tuple[float, float]]:
+    """
+    "2x30,5x30,10x60" -> [(2 rps, 30 s), (5, 30), (10, 60)]; default one stage of rps x duration.
+    """
+    if not spec:
+        return [(rps, duration)]
+    stages = []
+    for part in spec.split(","):
+        r, _, d = part.strip().partition("x")
+        stages.append((float(r), float(d)))
+    return stages
+
+
+def arrival_times(stages: List[Tuple[float, float]], poisson: bool, rng: random.Random) -> List[Tuple[float, int]]:
+    """
+    (offset seconds from start, stage index) for every request of the run.
+    """
+    out: List[Tuple[float, int]] = []
+    t0 = 0.0
+    for idx, (rate, dur) in enumerate(stages):
+        if rate <= 0:
+            t0 += dur
+            continue
+        t = t0
+        while True:
+            t += rng.expovariate(rate) if poisson else 1.0 / rate
+            if t >= t0 + dur:
+                break
+            out.append((t, idx))
+        t0 += dur
+    return out
+
+
+# ---- Measurement ----
+
+def _pct(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    s = sorted(values)
+    return round(s[min(len(s) - 1, int(q * len(s)))], 1)
+
+
+def latency_summary(values: List[float]) -> Dict[str, Any]:
+    return {
+        "count": len(values),
+        "mean": round(statistics.fmean(values), 1) if values else None,
+        "p50": _pct(values, 0.50),
+        "p90": _pct(values, 0.90),
+        "p95": _pct(values, 0.95),
+        "p99": _pct(values, 0.99),
+        "max": round(max(values), 1) if values else None,
+    }
+
+
+def parse_server_timing(header: str) -> Dict[str, float]:
+    out: Dict[str, float] = {}
+    for part in header.split(","):
+        name, _, rest = part.strip().partition(";")
+        m = re.search(r"dur=([0-9.]+)", rest)
+        if name and m:
+            out[name] = float(m.group(1))
+    return out
+
+
+async def _one(
+    client: httpx.AsyncClient,
+    url: str,
+    body: Dict[str, Any],
+    headers: Dict[str, str],
+    scheduled: float,
+    stage: int,
+) -> Dict[str, Any]:
+    sent = time.perf_counter()
+    rec: Dict[str, Any] = {"stage": stage, "t": scheduled, "send_lag_ms": (sent - scheduled) * 1000}
+    try:
+        resp = await client.post(url, json=body, headers=headers)
+        rec["status"] = resp.status_code
+        if resp.status_code == 200:
+            meta = resp.json().get("meta") or {}
+            rec["provider"] = meta.get("provider_used")
+            rec["fallback_reason"] = meta.get("fallback_reason")
+            rec["degradation_level"] = meta.get("degradation_level")
+            rec["retrieval_mode"] = meta.get("retrieval_mode")
+            rec["cache_hit"] = meta.get("cache_hit")
+        else:
+            try:
+                rec["error_code"] = resp.json().get("error_code")
+            except ValueError:
+                rec["error_code"] = None
+        if resp.headers.get("server-timing"):
+            rec["server_timing"] = parse_server_timing(resp.headers["server-timing"])
+    except httpx.TimeoutException:
+        rec["status"] = "timeout"
+    except httpx.HTTPError as exc:
+        rec["status"] = f"transport:{type(exc).__name__}"
+    rec["latency_ms"] = (time.perf_counter() - scheduled) * 1000
+    return rec
+
+
+def summarize(records: List[Dict[str, Any]], stages: List[Tuple[float, float]], wall_sec: float) -> Dict[str, Any]:
+    ok = [r for r in records if r.get("status") == 200]
+    n = len(records)
+    unanswered = [r for r in ok if r.get("fallback_reason") in _UNANSWERED]
+    fallbacks = [r for r in ok if r.get("fallback_reason") and r.get("fallback_reason") not in _UNANSWERED]
+
+    by_provider: Dict[str, List[float]] = defaultdict(list)
+    for r in ok:
+        by_provider[str(r.get("provider"))].append(r["latency_ms"])
+
+    stage_rows = []
+    for idx, (rate, dur) in enumerate(stages):
+        rs = [r for r in records if r["stage"] == idx]
+        if not rs:
+            continue
+        rs_ok = [r for r in rs if r.get("status") == 200]
+        stage_rows.append({
+            "target_rps": rate,
+            "duration_sec": dur,
+            "sent": len(rs),
+            "achieved_rps": round(len(rs_ok) / dur, 2) if dur else None,
+            "error_rate": round(1 - len(rs_ok) / len(rs), 4),
+            "latency_ms": latency_summary([r["latency_ms"] for r in rs_ok]),
+        })
+
+    timing: Dict[str, List[float]] = defaultdict(list)
+    for r in ok:
+        for name, ms in (r.get("server_timing") or {}).items():
+            timing[name].append(ms)
+
+    timeline: Dict[int, Dict[str, Any]] = {}
+    for r in records:
+        sec = int(r["t"])
+        row = timeline.setdefault(sec, {"sec": sec, "sent": 0, "ok": 0, "errors": 0, "_lat": []})
+        row["sent"] += 1
+        if r.get("status") == 200:
+            row["ok"] += 1
+            row["_lat"].append(r["latency_ms"])
+        else:
+            row["errors"] += 1
+    for row in timeline.values():
+        lat = row.pop("_lat")
+        row["p50_ms"] = _pct(lat, 0.5)
+        row["p99_ms"] = _pct(lat, 0.99)
+
+    return {
+        "requests": n,
+        "wall_sec": round(wall_sec, 2),
+        "throughput_ok_rps": round(len(ok) / wall_sec, 2) if wall_sec else None,
+        "status_codes": dict(Counter(str(r.get("status")) for r in records)),
+        "error_codes": dict(Counter(r["error_code"] for r in records if r.get("error_code"))),
+        "error_rate": round(1 - len(ok) / n, 4) if n else None,
+        "fallback_rate": round(len(fallbacks) / len(ok), 4) if ok else None,
+        "unanswered_rate": round(len(unanswered) / len(ok), 4) if ok else None,
+        "fallback_reasons": dict(Counter(str(r["fallback_reason"]).split(":")[0] for r in fallbacks)),
+        "latency_ms": latency_summary([r["latency_ms"] for r in ok]),
+        "send_lag_ms": latency_summary([r["send_lag_ms"] for r in records]),
+        "providers": {p: latency_summary(v) for p, v in sorted(by_provider.items())},
+        "degradation_levels": dict(Counter(str(r.get("degradation_level")) for r in ok)),
+        "retrieval_modes": dict(Counter(str(r.get("retrieval_mode")) for r in ok)),
+        "server_timing_mean_ms": {k: round(statistics.fmean(v), 1) for k, v in sorted(timing.items())},
+        "stages": stage_rows,
+        "timeline": [timeline[k] for k in sorted(timeline)],
+    }
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    rng = random.Random(args.seed)
+    queries = load_queries(args.source)
+    if not queries:
+        raise SystemExit(f"no questions found in {args.source}")
+    stages = parse_stages(args.stages, args.rps, args.duration)
+    schedule = arrival_times(stages, poisson=not args.constant, rng=rng)
+
+    url = args.url.rstrip("/") + args.api_prefix + "/query"
+    headers = {}
+    if args.api_key:
+        headers["X-API-Key"] = args.api_key
+    if args.deadline_ms:
+        headers["X-Request-Timeout-Ms"] = str(args.deadline_ms)
+
+    limits = httpx.Limits(max_connections=args.max_connections, max_keepalive_connections=args.max_connections)
+    timeout = httpx.Timeout(args.timeout, connect=min(10.0, args.timeout))
+    tasks: List[asyncio.Task] = []
+    skipped = 0
+    async with httpx.AsyncClient(limits=limits, timeout=timeout) as client:
+        start = time.perf_counter()
+        for offset, stage in schedule:
+            delay = start + offset - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if args.max_outstanding and sum(1 for t in tasks if not t.done()) >= args.max_outstanding:
+                skipped += 1  # client-side cap hit: the server is far behind the offered load
+                continue
+            q = rng.choice(queries)
+            if args.perturb and rng.random() < args.perturb:
+                q = perturb(q, rng)
+            body = {"query": q, "top_k": args.top_k}
+            tasks.append(asyncio.create_task(_one(client, url, body, headers, start + offset, stage)))
+        records = list(await asyncio.gather(*tasks))
+        wall = time.perf_counter() - start
+
+    for r in records:
+        r["t"] -= start
+    summary = summarize(records, stages, wall)
+    summary["client_skipped"] = skipped
+    return {
+        "config": {
+            "url": url,
+            "stages": [{"rps": r, "duration_sec": d} for r, d in stages],
+            "arrivals": "constant" if args.constant else "poisson",
+            "perturb": args.perturb,
+            "top_k": args.top_k,
+            "deadline_ms": args.deadline_ms,
+            "seed": args.seed,
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "summary": summary,
+    }
+
+
+# ---- Output ----
+
+def print_report(result: Dict[str, Any]) -> None:
+    s = result["summary"]
+    lat = s["latency_ms"]
+    print(f"requests={s['requests']} wall={s['wall_sec']}s ok_rps={s['throughput_ok_rps']} "
+          f"errors={s['error_rate']} fallbacks={s['fallback_rate']} unanswered={s['unanswered_rate']} "
+          f"client_skipped={s['client_skipped']}")
+    print(f"latency ms: p50={lat['p50']} p90={lat['p90']} p99={lat['p99']} max={lat['max']}")
+    print(f"status: {s['status_codes']}  error codes: {s['error_codes']}")
+    print(f"degradation levels: {s['degradation_levels']}  retrieval: {s['retrieval_modes']}")
+    for p, v in s["providers"].items():
+        print(f"  provider {p:28s} n={v['count']:<6d} p50={v['p50']} p99={v['p99']}")
+    for st in s["stages"]:
+        print(f"  stage {st['target_rps']:>6} rps x {st['duration_sec']:>4}s  achieved={st['achieved_rps']:<7} "
+              f"errors={st['error_rate']:<7} p50={st['latency_ms']['p50']} p99={st['latency_ms']['p99']}")
+    if s["server_timing_mean_ms"]:
+        print(f"server timing (mean ms): {s['server_timing_mean_ms']}")
+
+
+def compare(paths: List[str]) -> None:
+    rows = [("requests", "requests"), ("ok rps", "throughput_ok_rps"), ("error rate", "error_rate"),
+            ("fallback rate", "fallback_rate"), ("unanswered", "unanswered_rate")]
+    runs = [json.loads(Path(p).read_text(encoding="utf-8"))["summary"] for p in paths]
+    print(f"{'':16s}" + "".join(f"{Path(p).name[:22]:>24s}" for p in paths))
+    for label, key in rows:
+        print(f"{label:16s}" + "".join(f"{str(r.get(key)):>24s}" for r in runs))
+    for q in ("p50", "p90", "p99", "max"):
+        print(f"{'latency ' + q:16s}" + "".join(f"{str(r['latency_ms'].get(q)):>24s}" for r in runs))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--api-prefix", default="/api/v1")
+    parser.add_argument("--source", default="./data/input/Karafarin_QA_enriched.jsonl")
+    parser.add_argument("--rps", type=float, default=5.0, help="target arrival rate (single stage)")
+    parser.add_argument("--duration", type=float, default=60.0, help="seconds (single stage)")
+    parser.add_argument("--stages", default="", help='arrival curve "RPSxSECONDS,...", e.g. 2x30,5x30,10x60')
+    parser.add_argument("--constant", action="store_true", help="evenly spaced arrivals instead of Poisson")
+    parser.add_argument("--perturb", type=float, default=0.0, help="fraction of queries to perturb (0..1)")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--deadline-ms", type=int, default=0, help="send X-Request-Timeout-Ms")
+    parser.add_argument("--api-key", default="")
+    parser.add_argument("--timeout", type=float, default=120.0, help="client timeout (s)")
+    parser.add_argument("--max-connections", type=int, default=1000)
+    parser.add_argument("--max-outstanding", type=int, default=5000,
+                        help="safety cap on in-flight requests; arrivals beyond it are counted as client_skipped")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", default="", help="write the full result JSON here")
+    parser.add_argument("--compare", nargs="+", metavar="RESULT_JSON", help="compare saved runs and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(args.compare)
+        return
+
+    result = asyncio.run(run(args))
+    print_report(result)
+    if args.out:
+        out = Path(args.out)
+        out.parent.mkdir(parents=True, exist_ok=True)
+        out.write_text(json.dumps(result, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"saved {out}")
+
+
+if __name__ == "__main__":
+    main()
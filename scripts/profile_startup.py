@@ -0,0 +1,155 @@
+"""
+Cold-start profile: import time per module and startup phase timings.
+
+Each run is a fresh interpreter:
+- `python -X importtime -c "import app.main"` -> import cost, top modules (cumulative and self)
+- import app.main and run its startup -> app.state.startup_profile (phases, index load steps)
+
+Uses the same environment / .env as the service (source path, snapshot dir, Ollama URLs;
+warm-up calls to unreachable backends fail in the background and do not count).
+
+    python -m scripts.profile_startup                          # print the report
+    python -m scripts.profile_startup --runs 5 --out startup.json
+    python -m scripts.profile_startup --compare startup.json --tolerance 0.3   # exit 1 if slower
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+_IMPORT_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+_STARTUP_SNIPPET = """
+import json, logging, time
+t0 = time.perf_counter()
+logging.disable(logging.CRITICAL)
+from fastapi.testclient import TestClient
+import app.main as m
+with TestClient(m.app):
+    pass
+profile = dict(m.app.state.startup_profile)
+profile["wall_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+print("PROFILE " + json.dumps(profile))
+"""
+
+
+def _run(args: List[str]) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *args], cwd=ROOT, capture_output=True, text=True, env=os.environ.copy(), timeout=600
+    )
+
+
+def import_profile(top: int) -> Dict[str, Any]:
+    proc = _run(["-X", "importtime", "-c", "import app.main"])
+    if proc.returncode != 0:
+        raise SystemExit(f"import app.main failed:\n{proc.stderr[-2000:]}")
+    rows = []
+    for line in proc.stderr.splitlines():
+        m = _IMPORT_LINE.match(line)
+        if m:
+            rows.append({"module": m.group(4), "self_ms": int(m.group(1)) / 1000, "cumulative_ms": int(m.group(2)) / 1000,
+                         "depth": len(m.group(3)) // 2})
+    total = next((r["cumulative_ms"] for r in rows if r["module"] == "app.main"), None)
+    # Top-level packages (depth 0) are what app.main pulls in; app.* modules at any depth show our own cost
+    packages = [r for r in rows if r["depth"] <= 1 or r["module"].startswith("app.")]
+    return {
+        "total_ms": total,
+        "top_cumulative": sorted(packages, key=lambda r: -r["cumulative_ms"])[:top],
+        "top_self": sorted(rows, key=lambda r: -r["self_ms"])[:top],
+    }
+
+
+def startup_profile() -> Dict[str, Any]:
+    proc = _run(["-c", _STARTUP_SNIPPET])
+    line = next((l for l in proc.stdout.splitlines() if l.startswith("PROFILE ")), None)
+    if proc.returncode != 0 or line is None:
+        raise SystemExit(f"startup failed:\n{proc.stderr[-2000:]}")
+    return json.loads(line[len("PROFILE "):])
+
+
+def _median_profiles(profiles: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def med(values: List[Optional[float]]) -> Optional[float]:
+        values = [v for v in values if v is not None]
+        return round(statistics.median(values), 1) if values else None
+
+    phases = sorted({k for p in profiles for k in (p.get("phases_ms") or {})})
+    load_steps = sorted({k for p in profiles for k in (p.get("pipeline_load_ms") or {})})
+    return {
+        "import_ms": med([p.get("import_ms") for p in profiles]),
+        "startup_total_ms": med([p.get("total_ms") for p in profiles]),
+        "wall_ms": med([p.get("wall_ms") for p in profiles]),
+        "phases_ms": {k: med([(p.get("phases_ms") or {}).get(k) for p in profiles]) for k in phases},
+        "pipeline_load_ms": {k: med([(p.get("pipeline_load_ms") or {}).get(k) for p in profiles]) for k in load_steps},
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> int:
+    def flat(report: Dict[str, Any]) -> Dict[str, float]:
+        s = report["startup"]
+        out = {"import_ms": s.get("import_ms"), "startup_total_ms": s.get("startup_total_ms"), "wall_ms": s.get("wall_ms")}
+        out.update({f"phase.{k}": v for k, v in (s.get("phases_ms") or {}).items()})
+        out.update({f"load.{k}": v for k, v in (s.get("pipeline_load_ms") or {}).items()})
+        return {k: v for k, v in out.items() if v is not None}
+
+    cur, base = flat(current), flat(baseline)
+    failed = 0
+    print(f"\nvs baseline (tolerance +{tolerance:.0%}; only totals gate, steps < 20 ms are informational):")
+    for name, value in cur.items():
+        if name not in base:
+            print(f"  {name:32s} {value:9.1f} ms  new")
+            continue
+        change = value / base[name] - 1 if base[name] else 0.0
+        gated = name in ("import_ms", "startup_total_ms", "wall_ms") and base[name] >= 20
+        bad = gated and change > tolerance
+        failed += bad
+        print(f"  {name:32s} {value:9.1f} ms  {change:+8.1%}  {'REGRESSION' if bad else ''}")
+    return 1 if failed else 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="fresh interpreters per measurement (median)")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--out", default="", help="write the report as JSON")
+    parser.add_argument("--compare", default="", help="earlier --out report; exit 1 if totals regressed")
+    parser.add_argument("--tolerance", type=float, default=0.3)
+    args = parser.parse_args()
+
+    imports = import_profile(args.top)
+    startup = _median_profiles([startup_profile() for _ in range(max(1, args.runs))])
+    report = {"imports": imports, "startup": startup}
+
+    print(f"import app.main: {imports['total_ms']:.1f} ms (-X importtime, single run)")
+    print("  top cumulative:")
+    for r in imports["top_cumulative"]:
+        print(f"    {r['cumulative_ms']:9.1f} ms  {r['module']}")
+    print("  top self:")
+    for r in imports["top_self"]:
+        print(f"    {r['self_ms']:9.1f} ms  {r['module']}")
+    print(f"\nstartup (median of {args.runs}): import {startup['import_ms']} ms, "
+          f"startup {startup['startup_total_ms']} ms, process wall {startup['wall_ms']} ms")
+    for name, ms in startup["phases_ms"].items():
+        print(f"  {name:24s} {ms:9.1f} ms")
+    if startup["pipeline_load_ms"]:
+        print("  index load steps (concurrent, so they overlap):")
+        for name, ms in startup["pipeline_load_ms"].items():
+            print(f"    {name:22s} {ms:9.1f} ms")
+
+    if args.out:
+        Path(args.out).write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+        print(f"\nwrote {args.out}")
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        raise SystemExit(compare(report, baseline, args.tolerance))
+
+
+if __name__ == "__main__":
+    main()
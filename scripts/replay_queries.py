@@ -0,0 +1,131 @@
+"""
+Replay logged /query traffic against the current index with (optionally) different tuning.
+
+Reads the query log (live file + rotated files, oldest first), runs each query in-process
+through retrieve -> rerank -> choose_best_answer and compares with what was logged:
+- answered rate before / after
+- picks that changed (different chosen chunk, or answered <-> unanswered)
+- retrieval + rerank latency
+
+    python -m scripts.replay_queries --limit 500 --min-score 0.3 --alpha 0.7 --beta 0.2 --gamma 0.1
+    python -m scripts.replay_queries --log ./data/logs/queries.jsonl --show-changes 20
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from app.core.config import get_settings
+from app.services.ingestion_service import build_pipeline_from_existing_index
+from app.services.qa_answering import choose_best_answer, is_meta_query
+from app.services.reranker import rerank_candidates
+
+
+def log_files(path: Path) -> List[Path]:
+    rotated = sorted(path.parent.glob(f"{path.stem}.*{path.suffix}"), key=lambda p: p.stat().st_mtime)
+    return rotated + ([path] if path.exists() else [])
+
+
+def read_records(path: Path) -> Iterator[Dict[str, Any]]:
+    for f in log_files(path):
+        with open(f, "r", encoding="utf-8") as fh:
+            for line in fh:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # torn last line of a crashed writer
+
+
+def _pct(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def main() -> int:
+    settings = get_settings()
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--log", default=settings.query_log_path)
+    ap.add_argument("--limit", type=int, default=0, help="replay at most N queries (0 = all)")
+    ap.add_argument("--candidate-k", type=int, default=settings.qa_candidate_k)
+    ap.add_argument("--min-score", type=float, default=settings.qa_min_score)
+    ap.add_argument("--min-combined", type=float, default=settings.qa_min_combined)
+    ap.add_argument("--alpha", type=float, default=settings.rerank_alpha)
+    ap.add_argument("--beta", type=float, default=settings.rerank_beta)
+    ap.add_argument("--gamma", type=float, default=settings.rerank_gamma)
+    ap.add_argument("--show-changes", type=int, default=10, help="print the first N changed picks")
+    args = ap.parse_args()
+
+    pipeline, report = build_pipeline_from_existing_index(settings)
+    if pipeline is None:
+        print(f"index not loadable: {report}", file=sys.stderr)
+        return 1
+
+    total = answered_before = answered_after = 0
+    changed: List[Dict[str, Any]] = []
+    other_index = 0
+    latencies: List[float] = []
+    for rec in read_records(Path(args.log)):
+        query = rec.get("query")
+        if not query or is_meta_query(query):
+            continue
+        if args.limit and total >= args.limit:
+            break
+        total += 1
+        if rec.get("index_version") and rec["index_version"] != pipeline.index_version:
+            other_index += 1
+
+        t0 = time.perf_counter()
+        top_k = int(rec.get("top_k") or 5)
+        retrieved = pipeline.retrieve(query=query, top_k=max(args.candidate_k, top_k))
+        results = rerank_candidates(query, retrieved["raw_results"], alpha=args.alpha, beta=args.beta, gamma=args.gamma)
+        picked = choose_best_answer(
+            query=query,
+            results=results,
+            min_vector_score=args.min_score,
+            min_combined=args.min_combined,
+            rerank_enabled=False,
+        )
+        latencies.append((time.perf_counter() - t0) * 1000)
+
+        was_answered = bool(rec.get("answered"))
+        before: Optional[str] = (rec.get("chosen") or {}).get("chunk_id")
+        after: Optional[str] = picked["best"].get("chunk_id") if picked.get("ok") else None
+        answered_before += was_answered
+        answered_after += bool(picked.get("ok"))
+        if was_answered != bool(picked.get("ok")) or (before and after and before != after):
+            changed.append({
+                "request_id": rec.get("request_id"),
+                "query": query,
+                "before": before if was_answered else f"unanswered:{rec.get('reason')}",
+                "after": after if picked.get("ok") else f"unanswered:{picked.get('reason')}",
+            })
+
+    if not total:
+        print("no queries to replay")
+        return 0
+
+    print(f"replayed {total} queries against index {pipeline.index_version}"
+          + (f" ({other_index} were logged against another index)" if other_index else ""))
+    print(f"settings: candidate_k={args.candidate_k} min_score={args.min_score} min_combined={args.min_combined} "
+          f"alpha={args.alpha} beta={args.beta} gamma={args.gamma}")
+    print(f"answered: {answered_before / total:.1%} logged -> {answered_after / total:.1%} replayed")
+    print(f"changed picks: {len(changed)} ({len(changed) / total:.1%})")
+    print(f"latency ms: mean={statistics.fmean(latencies):.1f} p50={_pct(latencies, 0.5):.1f} "
+          f"p90={_pct(latencies, 0.9):.1f} p99={_pct(latencies, 0.99):.1f}")
+    for c in changed[:args.show_changes]:
+        print(json.dumps(c, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,91 @@
+import importlib
+import os
+import shutil
+import socket
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+import uvicorn
+
+from scripts.fake_llm_server import FakeConfig, build_app
+
+FIXTURES = Path(__file__).resolve().parent.parent / "fixtures"
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture(scope="session")
+def fake_llm():
+    """
+    scripts/fake_llm_server.py in a background thread: (base_url, FakeLLM).
+    """
+    config = FakeConfig(embed_dim=64, embed_latency="const:1", embed_per_item_ms=0.0,
+                        chat_latency="const:5", decode_ms_per_token=0.0, seed=0)
+    app = build_app(config)
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 10
+    while not server.started:
+        if time.monotonic() > deadline:
+            raise RuntimeError("fake LLM server did not start")
+        time.sleep(0.02)
+    base_url = f"http://127.0.0.1:{port}"
+    yield base_url, app.state.fake
+    server.should_exit = True
+    thread.join(5)
+
+
+@pytest.fixture(scope="session")
+def service(fake_llm, tmp_path_factory):
+    """
+    The app (app.main) started against the fake server, with every file under a temp dir;
+    startup builds the index from tests/fixtures/sample_qa.jsonl. Yields (TestClient, data dir).
+    """
+    from fastapi.testclient import TestClient
+
+    base_url, _ = fake_llm
+    data = tmp_path_factory.mktemp("service")
+    shutil.copy(FIXTURES / "sample_qa.jsonl", data / "source.jsonl")
+    env = {
+        "OLLAMA_BASE_URL": base_url,
+        "API_BASE_URL": base_url,
+        "API_KEY": "test-key",
+        "STATIC_SOURCE_PATH": str(data / "source.jsonl"),
+        "FAISS_INDEX_PATH": str(data / "faiss.index"),
+        "FAISS_METADATA_PATH": str(data / "faiss_chunks.json"),
+        "INDEX_STATE_PATH": str(data / "index_state.json"),
+        "INDEX_SNAPSHOTS_DIR": str(data / "snapshots"),
+        "SOURCE_HASH_CACHE_PATH": str(data / "source_hash.json"),
+        "QUERY_LOG_PATH": str(data / "queries.jsonl"),
+        "WARMUP_ENABLED": "false",
+        "KEEPALIVE_ENABLED": "false",
+        "LOG_LEVEL": "WARNING",
+    }
+    saved = {k: os.environ.get(k) for k in env}
+    os.environ.update(env)
+
+    from app.core.config import get_settings
+
+    get_settings.cache_clear()
+    # app.main reads its settings at import time
+    main = importlib.reload(sys.modules["app.main"]) if "app.main" in sys.modules else importlib.import_module("app.main")
+    try:
+        with TestClient(main.app) as client:
+            yield client, data
+    finally:
+        for k, v in saved.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+        get_settings.cache_clear()
+
@@ -0,0 +1,35 @@
+import uuid
+
+API = "/api/v1"
+
+
+def test_request_id_is_echoed_or_generated(service):
+    client, _ = service
+    res = client.get(f"{API}/health", headers={"X-Request-ID": "abc-123"})
+    assert res.headers["x-request-id"] == "abc-123"
+    generated = client.get(f"{API}/health").headers["x-request-id"]
+    assert uuid.UUID(generated)
+    assert int(res.headers["x-process-time-ms"]) >= 0
+
+
+def test_responses_are_counted_by_outcome(service):
+    client, _ = service
+    before = client.get("/metrics").json()
+    client.get(f"{API}/no-such-route")
+    after = client.get("/metrics").json()
+    assert after["requests_error"] == before["requests_error"] + 1
+    assert after["requests_total"] >= before["requests_total"] + 2
+
+
+def test_query_stages_show_up_in_server_timing(service):
+    client, _ = service
+    res = client.post(f"{API}/query", json={"query": "چرا دوربین جهت احراز هویت فعال نمی‌شود؟"})
+    stages = {part.split(";")[0].strip() for part in res.headers["server-timing"].split(",")}
+    assert {"embed", "search", "total"} <= stages
+
+
+def test_profiler_requires_an_admin_key(service):
+    client, _ = service
+    res = client.post(f"{API}/admin/profile", params={"seconds": 0.1})
+    assert res.status_code == 403
+    assert res.json()["error_code"] == "admin_required"
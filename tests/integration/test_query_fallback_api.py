@@ -0,0 +1,59 @@
+import pytest
+
+from app.core.config import get_settings
+
+API = "/api/v1"
+QUESTION = "چرا دوربین جهت احراز هویت فعال نمی‌شود؟"
+
+
+@pytest.fixture()
+def failing_local(service, monkeypatch):
+    """
+    Generation mode with the local chat provider failing every call.
+    """
+    client, _ = service
+    monkeypatch.setattr(get_settings(), "qa_mode", False)
+    router = client.app.state.generator_router
+    router.cache.clear()
+
+    def fail(**kwargs):
+        raise RuntimeError("local down")
+
+    monkeypatch.setattr(router.local, "generate_with_stats", fail)
+    monkeypatch.setattr(router.circuit, "record_failure", lambda: None)  # keep the circuit closed
+    return client, router
+
+
+def test_api_answers_when_local_fails(failing_local):
+    client, _ = failing_local
+    body = client.post(f"{API}/query", json={"query": QUESTION}).json()
+    assert body["meta"]["provider_used"] == "api"
+    assert body["meta"]["fallback_reason"] == "local_failed: RuntimeError"
+    assert body["answer"]
+
+
+def test_failed_api_degrades_to_the_extractive_answer(failing_local, monkeypatch):
+    client, router = failing_local
+    monkeypatch.setattr(router.api, "api_key", "")
+    res = client.post(f"{API}/query", json={"query": QUESTION})
+    assert res.status_code == 200
+    meta = res.json()["meta"]
+    assert meta["provider_used"] == "qa_extract_question_only"
+    assert meta["fallback_reason"].startswith("api_failed: api_key_missing")
+
+
+def test_unreachable_api_degrades(failing_local, monkeypatch):
+    client, router = failing_local
+    monkeypatch.setattr(router.api, "base_url", "http://127.0.0.1:9")  # nothing listens there
+    monkeypatch.setattr(router.api, "max_retries", 0)
+    res = client.post(f"{API}/query", json={"query": QUESTION})
+    assert res.status_code == 200
+    assert res.json()["meta"]["fallback_reason"].startswith("api_failed: api_error")
+
+
+def test_status_text_without_api_fallback_is_not_an_answer(failing_local, monkeypatch):
+    client, router = failing_local
+    monkeypatch.setattr(router, "api_fallback_enabled", False)
+    meta = client.post(f"{API}/query", json={"query": QUESTION}).json()["meta"]
+    assert meta["provider_used"] == "qa_extract_question_only"
+    assert meta["fallback_reason"] == "local_failed_no_api"
@@ -0,0 +1,88 @@
+import pytest
+
+from app.core.config import get_settings
+
+API = "/api/v1"
+QUESTION = "چقدر زمان می‌برد تا احراز هویت تایید شود؟"
+
+
+@pytest.fixture()
+def generation_mode(service, monkeypatch):
+    client, _ = service
+    monkeypatch.setattr(get_settings(), "qa_mode", False)
+    router = client.app.state.generator_router
+    if router.cache is not None:
+        router.cache.clear()
+    return client
+
+
+def test_extractive_answer(service):
+    client, _ = service
+    res = client.post(f"{API}/query", json={"query": QUESTION})
+    assert res.status_code == 200
+    body = res.json()
+    assert body["meta"]["provider_used"] == "qa_extract_question_only"
+    assert "کارشناس" in body["answer"]
+    assert body["sources"]
+
+
+@pytest.mark.parametrize("value", ["inf", "nan", "garbage"])
+def test_unusable_timeout_header_keeps_the_default(service, value):
+    client, _ = service
+    res = client.post(f"{API}/query", json={"query": QUESTION}, headers={"X-Request-Timeout-Ms": value})
+    assert res.status_code == 200
+    assert res.json()["meta"]["deadline_ms"] == get_settings().request_deadline_default_ms
+
+
+def test_generated_answer_then_cache_hit(generation_mode):
+    client = generation_mode
+    first = client.post(f"{API}/query", json={"query": QUESTION}).json()
+    assert first["meta"]["provider_used"] == "local"
+    assert first["answer"]
+    assert first["meta"]["cache_hit"] is False
+
+    second = client.post(f"{API}/query", json={"query": QUESTION}).json()
+    assert second["meta"]["cache_hit"] is True
+    assert second["answer"] == first["answer"]
+
+
+def test_metrics_label_num_ctx(generation_mode):
+    client = generation_mode
+    client.post(f"{API}/query", json={"query": "حساب نیک آفرین چیست؟"})
+    text = client.get("/metrics/prometheus").text
+    assert "ollama_num_ctx_total{num_ctx=" in text
+    assert 'rag_http_requests_total{status="200"}' in text
+
+
+def test_query_embeds_feed_the_degradation_signal(service):
+    client, _ = service
+    latency = client.app.state.query_embed_latency
+    before = latency._samples
+    client.post(f"{API}/query", json={"query": "یک سوال تازه برای سنجش زمان بردار"})
+    assert latency._samples == before + 1
+    assert "embed_ewma_ms" in client.get("/metrics").json()["degradation"]["signals"]
+
+
+@pytest.fixture()
+def lexical_only(service, monkeypatch):
+    client, _ = service
+    monkeypatch.setattr(client.app.state.degradation, "current", lambda: 4)
+    return client
+
+
+def test_lexical_only_answers_on_word_overlap(lexical_only):
+    meta = lexical_only.post(f"{API}/query", json={"query": QUESTION}).json()["meta"]
+    assert meta["retrieval_mode"] == "lexical"
+    assert meta["provider_used"] == "qa_extract_lexical"
+
+
+def test_lexical_only_refusal_keeps_the_mode_and_generation_reason(lexical_only, monkeypatch):
+    monkeypatch.setattr(get_settings(), "qa_lexical_min_score", 1.01)
+    meta = lexical_only.post(f"{API}/query", json={"query": QUESTION}).json()["meta"]
+    assert meta["provider_used"] == "qa_extract_lexical"
+    assert meta["fallback_reason"] == "low_lexical_match"
+
+    monkeypatch.setattr(get_settings(), "qa_mode", False)
+    lexical_only.app.state.generator_router.cache.clear()
+    meta = lexical_only.post(f"{API}/query", json={"query": QUESTION}).json()["meta"]
+    assert meta["fallback_reason"] == "degraded_cache_only"
@@ -0,0 +1,108 @@
+import json
+
+API = "/api/v1"
+
+
+def test_startup_builds_a_snapshot_from_the_source(service):
+    client, data = service
+    status = client.get(f"{API}/status").json()
+    assert status["rag_ready"] is True
+    assert status["index_error"] is None
+    report = status["ingestion_report"]
+    assert report["items_indexed"] == 12
+    assert report["jsonl_parsed_records"] == 12
+    assert report["jsonl_bad_json"] == 0
+    snapshots = client.get(f"{API}/admin/index/snapshots").json()
+    assert snapshots["current"]["version"] == report["snapshot"]
+    pointer = json.loads((data / "snapshots" / "CURRENT").read_text(encoding="utf-8"))
+    assert pointer["version"] == report["snapshot"]
+
+
+def test_reload_index_publishes_through_the_shared_hook(service, monkeypatch):
+    client, _ = service
+    state = client.app.state
+    published = []
+    publish = state.publish_pipeline
+    monkeypatch.setattr(state, "publish_pipeline", lambda p, r: (published.append(r["reason"]), publish(p, r)))
+    state.corpus_summary_cache = {"stale": True}
+    res = client.post(f"{API}/admin/reload-index")
+    assert res.status_code == 200
+    assert published == ["loaded_from_disk"]
+    assert state.corpus_summary_cache is None
+
+
+def test_publish_sets_the_embed_pool(service, monkeypatch):
+    client, _ = service
+    state = client.app.state
+    monkeypatch.setattr(state, "embed_pool", None)
+    assert client.post(f"{API}/admin/reload-index").status_code == 200
+    assert state.embed_pool is state.rag_pipeline.retriever.embedder.pool
+    assert "embed" in client.get("/metrics").json()["backends"]
+
+
+def _fresh_startup_state(main, monkeypatch):
+    state = main.app.state
+    for name in ("generator_router", "chat_pool", "embed_pool", "ingestion_report", "rag_pipeline"):
+        monkeypatch.setattr(state, name, getattr(state, name))
+    monkeypatch.setattr(state, "startup_profile", {"import_ms": 0, "phases_ms": {}})
+    monkeypatch.setattr(state, "warmup_started", False)
+    started = []
+    monkeypatch.setattr(main, "_start_warmup", lambda embedder, chat: started.append(embedder))
+    return started
+
+
+def test_failed_startup_build_still_starts_warmup(service, monkeypatch):
+    import app.main as main
+
+    started = _fresh_startup_state(main, monkeypatch)
+    monkeypatch.setattr(main, "build_pipeline_from_existing_index", lambda s: (None, {"reason": "missing_index_state"}))
+
+    def fail(settings):
+        raise RuntimeError("embed backend down")
+
+    monkeypatch.setattr(main, "rebuild_index_and_pipeline", fail)
+    main.on_startup()
+    assert main.app.state.ingestion_report["error"] == "embed backend down"
+    assert len(started) == 1
+    # a later publish does not start a second warm-up
+    main._publish_pipeline(main.app.state.rag_pipeline, {"reason": "rebuilt"})
+    assert len(started) == 1
+
+
+def test_first_publish_starts_warmup_when_startup_did_not(service, monkeypatch):
+    import app.main as main
+
+    started = _fresh_startup_state(main, monkeypatch)
+    pipeline = main.app.state.rag_pipeline
+    main._publish_pipeline(pipeline, {"reason": "rebuilt"})
+    assert started == [pipeline.retriever.embedder]
+
+
+def test_reindex_wait_publishes_a_new_pipeline(service):
+    client, _ = service
+    before = client.app.state.rag_pipeline
+    res = client.post(f"{API}/admin/reindex", params={"wait": "true"}).json()
+    assert res["ok"] is True
+    assert res["job"]["state"] == "succeeded"
+    assert client.app.state.rag_pipeline is not before
+    job_id = res["job"]["job_id"]
+    assert client.get(f"{API}/admin/reindex/{job_id}").json()["state"] == "succeeded"
+    cancel = client.post(f"{API}/admin/reindex/{job_id}/cancel")
+    assert cancel.status_code == 409
+    assert cancel.json()["error_code"] == "reindex_job_finished"
+
+
+def test_reindex_publishes_a_new_snapshot_and_rollback_pins_the_old_one(service):
+    client, _ = service
+    before = client.get(f"{API}/status").json()["ingestion_report"]["snapshot"]
+    assert client.post(f"{API}/admin/reindex", params={"wait": "true"}).json()["ok"] is True
+    after = client.get(f"{API}/status").json()["ingestion_report"]["snapshot"]
+    assert after != before
+
+    rolled = client.post(f"{API}/admin/index/rollback", params={"version": before}).json()
+    assert (rolled["previous"], rolled["current"]) == (after, before)
+    assert client.get(f"{API}/status").json()["ingestion_report"]["snapshot"] == before
+    listed = client.get(f"{API}/admin/index/snapshots").json()
+    assert listed["current"]["pinned"] is True
+    missing = client.post(f"{API}/admin/index/rollback", params={"version": "no-such-version"})
+    assert missing.status_code == 404
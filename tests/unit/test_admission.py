@@ -0,0 +1,103 @@
+import asyncio
+
+import pytest
+
+from app.services.admission import AdmissionController, AdmissionRejected
+
+
+def test_admits_up_to_max_in_flight_then_queues():
+    async def scenario():
+        lane = AdmissionController("query", max_in_flight=1, max_queue=1, queue_timeout_sec=1.0)
+        assert await lane.acquire() == 0.0
+        waiter = asyncio.create_task(lane.acquire())
+        await asyncio.sleep(0.01)
+        assert lane.queue_depth == 1
+        lane.release(service_sec=0.05)
+        waited_ms = await waiter
+        assert waited_ms > 0
+        assert lane.in_flight == 1
+        lane.release()
+        assert lane.in_flight == 0
+
+    asyncio.run(scenario())
+
+
+def test_rejects_when_queue_is_full():
+    async def scenario():
+        lane = AdmissionController("query", max_in_flight=1, max_queue=1, queue_timeout_sec=1.0)
+        await lane.acquire()
+        waiter = asyncio.create_task(lane.acquire())
+        await asyncio.sleep(0.01)
+        with pytest.raises(AdmissionRejected) as exc:
+            await lane.acquire()
+        assert exc.value.reason == "queue_full"
+        assert exc.value.retry_after_sec >= 1
+        lane.release()
+        await waiter
+        lane.release()
+
+    asyncio.run(scenario())
+
+
+def test_queue_timeout_gives_up_without_leaking_a_slot():
+    async def scenario():
+        lane = AdmissionController("query", max_in_flight=1, max_queue=2, queue_timeout_sec=0.05)
+        await lane.acquire()
+        with pytest.raises(AdmissionRejected) as exc:
+            await lane.acquire()
+        assert exc.value.reason == "queue_timeout"
+        lane.release()
+        assert lane.in_flight == 0
+        assert await lane.acquire() == 0.0  # the timed-out waiter does not hold the slot
+
+    asyncio.run(scenario())
+
+
+def _call(mw, path):
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        sent.append(message)
+
+    return mw({"type": "http", "path": path}, receive, send), sent
+
+
+def test_middleware_lanes_are_independent():
+    from app.middleware.admission import AdmissionMiddleware
+
+    async def scenario():
+        release = asyncio.Event()
+
+        async def app(scope, receive, send):
+            if scope["path"] == "/query":
+                await release.wait()
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": b"ok"})
+
+        lanes = {
+            "query": AdmissionController("query", max_in_flight=1, max_queue=0, queue_timeout_sec=1.0),
+            "admin": AdmissionController("admin", max_in_flight=1, max_queue=0, queue_timeout_sec=1.0),
+        }
+        mw = AdmissionMiddleware(app, lanes=lanes, classify=lambda p: {"/query": "query", "/admin": "admin"}.get(p))
+        call, _ = _call(mw, "/query")
+        busy = asyncio.create_task(call)
+        await asyncio.sleep(0.01)
+
+        call, rejected = _call(mw, "/query")
+        await call
+        assert rejected[0]["status"] == 503
+        assert b"retry-after" in dict(rejected[0]["headers"])
+
+        for path in ("/admin", "/health"):  # other lane / no lane: not blocked by the full query lane
+            call, sent = _call(mw, path)
+            await asyncio.wait_for(call, 1.0)
+            assert sent[0]["status"] == 200
+
+        release.set()
+        await busy
+        assert lanes["query"].in_flight == 0
+
+    asyncio.run(scenario())
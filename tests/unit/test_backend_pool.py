@@ -0,0 +1,64 @@
+import pytest
+
+from app.services.backend_pool import BackendPool
+
+
+def fail(pool):
+    with pytest.raises(ConnectionError):
+        with pool.acquire():
+            raise ConnectionError("refused")
+
+
+def test_requires_urls_and_a_known_strategy():
+    with pytest.raises(ValueError):
+        BackendPool(["", " "])
+    with pytest.raises(ValueError):
+        BackendPool(["http://a"], strategy="random")
+
+
+def test_urls_are_normalized_and_deduplicated():
+    assert BackendPool(["http://a/", "http://a", "http://b"]).urls == ["http://a", "http://b"]
+
+
+def test_least_outstanding_spreads_concurrent_calls():
+    pool = BackendPool(["http://a", "http://b"])
+    with pool.acquire() as first, pool.acquire() as second:
+        assert {first.url, second.url} == {"http://a", "http://b"}
+        assert pool.outstanding() == 2
+    assert pool.outstanding() == 0
+
+
+def test_consecutive_failures_eject_the_backend():
+    pool = BackendPool(["http://a", "http://b"], eject_after=2, eject_sec=60)
+    a = pool.backends[0]
+    pool.backends[1].outstanding = 1  # keep picks on a until it is ejected
+    fail(pool)
+    fail(pool)
+    assert a.ejections == 1
+    with pool.acquire() as b:
+        assert b.url == "http://b"
+    snap = {s["url"]: s for s in pool.snapshot()}
+    assert snap["http://a"]["healthy"] is False
+    assert snap["http://a"]["last_error"] == "ConnectionError: refused"
+
+
+def test_all_ejected_uses_the_one_back_soonest():
+    pool = BackendPool(["http://a", "http://b"], eject_after=1, eject_sec=60)
+    pool.backends[0].ejected_until = 10**9
+    pool.backends[1].ejected_until = 10**9 - 1
+    with pool.acquire() as b:
+        assert b.url == "http://b"
+
+
+def test_fast_failures_raise_the_ewma():
+    pool = BackendPool(["http://a"], eject_after=10)
+    fail(pool)
+    assert pool.ewma_ms() >= 1000.0  # failure penalty, though the call took ~0 ms
+
+
+def test_ewma_strategy_prefers_the_faster_backend():
+    pool = BackendPool(["http://a", "http://b"], strategy="ewma")
+    pool.backends[0].ewma_ms = 900.0
+    pool.backends[1].ewma_ms = 100.0
+    with pool.acquire() as b:
+        assert b.url == "http://b"
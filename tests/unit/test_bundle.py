@@ -0,0 +1,68 @@
+import io
+import tarfile
+
+import pytest
+
+from app.storage.vectorstore.bundle import BUNDLE_KIND, open_bundle, verify_bundle, write_bundle
+from app.storage.vectorstore.faiss_store import FaissStore
+from app.storage.vectorstore.snapshots import FEATURES_FILE, MANIFEST_FILE, SnapshotError, SnapshotStore
+
+
+@pytest.fixture()
+def snapshot_dir(tmp_path):
+    store = FaissStore(index_path="", metadata_path="", embedding_dim=2)
+    store.build_from_embeddings(items=[{"chunk_id": "0", "question": "q", "answer": "a"}], embeddings=[[1.0, 0.0]])
+    snaps = SnapshotStore(str(tmp_path / "snapshots"))
+    state = {"embedding_model": "m", "index_schema_version": 3, "index_mode": "qa_full", "source_hash": "abc"}
+    version = snaps.publish(store, state, "20260101-000000-a")
+    return snaps.path(version)
+
+
+@pytest.mark.parametrize("name", ["index.tar.gz", "index_dir"])
+def test_bundle_round_trip(tmp_path, snapshot_dir, name):
+    out = tmp_path / "out" / name
+    manifest = write_bundle(str(snapshot_dir), str(out), features={"lexical_tokens": [["q"]]})
+    assert manifest["kind"] == BUNDLE_KIND
+    assert manifest["embedding_model"] == "m"
+    assert FEATURES_FILE in manifest["files"]
+
+    directory, opened = open_bundle(str(out), str(tmp_path / "extract"))
+    verify_bundle(directory, opened)
+    assert opened["source_hash"] == "abc"
+    # A second open reuses the extraction
+    again, _ = open_bundle(str(out), str(tmp_path / "extract"))
+    assert again == directory
+
+
+def _archive(tmp_path, members):
+    path = tmp_path / "evil.tar.gz"
+    with tarfile.open(path, "w:gz") as tf:
+        for info, data in members:
+            tf.addfile(info, io.BytesIO(data) if data is not None else None)
+    return path
+
+
+@pytest.mark.parametrize("member", ["../escape", "sub/file", ".hidden", "link"])
+def test_extraction_rejects_unsafe_members(tmp_path, member):
+    info = tarfile.TarInfo(member)
+    data = b"x"
+    if member == "link":
+        info.type = tarfile.SYMTYPE
+        info.linkname = "/etc/passwd"
+        data = None
+    else:
+        info.size = 1
+    archive = _archive(tmp_path, [(info, data)])
+    with pytest.raises(SnapshotError):
+        open_bundle(str(archive), str(tmp_path / "extract"))
+    assert not (tmp_path / "escape").exists()
+    assert not any(p.name.startswith(".tmp-") for p in (tmp_path / "extract").iterdir())
+
+
+def test_open_rejects_missing_and_foreign_bundles(tmp_path, snapshot_dir):
+    with pytest.raises(SnapshotError):
+        open_bundle(str(tmp_path / "missing.tar.gz"), str(tmp_path / "extract"))
+    # A snapshot directory has a manifest, but not a bundle manifest
+    with pytest.raises(SnapshotError):
+        open_bundle(str(snapshot_dir), str(tmp_path / "extract"))
+    assert (snapshot_dir / MANIFEST_FILE).exists()
@@ -0,0 +1,55 @@
+from app.rag.context_formatter import assemble_context
+from app.rag.token_estimator import TokenEstimator
+
+
+def _rec(cid, question, answer, score):
+    return {"chunk_id": cid, "question": question, "answer": answer, "combined_score": score}
+
+
+ESTIMATOR = TokenEstimator("gemma3:27b")
+
+RESULTS = [
+    _rec("low", "How do I open an account online?", "Use the mobile app and verify your identity.", 0.4),
+    _rec("best", "Why does verification take so long?", "An agent reviews it after three failed attempts.", 0.9),
+    _rec("dup", "Why does verification take so long ?", "An agent reviews it after three failed attempts.", 0.8),
+    _rec("other", "What is the Nikafarin account?", "A savings account for teenagers.", 0.6),
+]
+
+
+def test_ranks_by_rerank_score_and_drops_near_duplicates():
+    ctx = assemble_context(RESULTS, estimator=ESTIMATOR, max_tokens=10_000)
+    assert [r["chunk_id"] for r in ctx.used] == ["best", "other", "low"]
+    assert ctx.dropped_duplicates == 1
+    assert ctx.text.startswith("[1] Q: Why does verification take so long?")
+    assert ctx.tokens == ESTIMATOR.count(ctx.text)
+
+
+def test_budget_skips_blocks_that_do_not_fit():
+    one = assemble_context(RESULTS[1:2], estimator=ESTIMATOR, max_tokens=10_000).tokens
+    ctx = assemble_context(RESULTS, estimator=ESTIMATOR, max_tokens=one)
+    assert [r["chunk_id"] for r in ctx.used] == ["best"]
+    assert ctx.dropped_over_budget == 2
+    assert ctx.tokens <= one
+
+
+def test_max_blocks_and_empty_records():
+    results = RESULTS + [{"chunk_id": "empty", "combined_score": 1.0}]
+    ctx = assemble_context(results, estimator=ESTIMATOR, max_tokens=10_000, max_blocks=1)
+    assert [r["chunk_id"] for r in ctx.used] == ["best"]
+
+
+def test_dedup_threshold_one_keeps_near_duplicates():
+    ctx = assemble_context(RESULTS, estimator=ESTIMATOR, max_tokens=10_000, dedup_threshold=1.01)
+    assert ctx.dropped_duplicates == 0
+    assert len(ctx.used) == 4
+
+
+def test_estimator_calibration_moves_towards_reported_counts():
+    est = TokenEstimator("gemma3:27b", smoothing=0.5)
+    text = "احراز هویت من تایید شده ولی خطا می‌گیرم"
+    before = est.count(text)
+    est.calibrate(before, before * 2)
+    assert est.correction > 1.0
+    assert est.count(text) > before
+    est.calibrate(0, 10)  # ignored
+    assert est.count("") == 0
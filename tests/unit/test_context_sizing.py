@@ -0,0 +1,32 @@
+from app.providers.policies import ContextSizingPolicy
+
+
+def test_fit_picks_smallest_bucket_that_holds_prompt_and_output():
+    policy = ContextSizingPolicy(buckets=(8192, 2048, 4096))
+    assert policy.buckets == [2048, 4096, 8192]
+    assert policy.fit(1000, 512) == 2048
+    assert policy.fit(2000, 512) == 4096
+    assert policy.fit(50000, 512) == 8192  # nothing holds it: largest
+
+
+def test_grows_immediately_and_shrinks_after_streak():
+    policy = ContextSizingPolicy(buckets=(2048, 4096), shrink_after=2)
+    assert policy.choose(3000, 512) == 4096
+    # Small prompts keep the larger window until the streak is exceeded
+    assert policy.choose(100, 512) == 4096
+    assert policy.choose(100, 512) == 4096
+    assert policy.choose(100, 512) == 2048
+    assert policy.choose(3000, 512) == 4096
+    assert policy.snapshot()["changes"] == 3
+
+
+def test_larger_request_resets_the_shrink_streak():
+    policy = ContextSizingPolicy(buckets=(2048, 4096), shrink_after=1)
+    policy.choose(3000, 512)
+    policy.choose(100, 512)
+    policy.choose(3000, 512)
+    assert policy.choose(100, 512) == 4096
+
+
+def test_invalid_buckets_fall_back():
+    assert ContextSizingPolicy(buckets=(0, -1)).buckets == [8192]
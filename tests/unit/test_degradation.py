@@ -0,0 +1,73 @@
+from app.services.degradation import LEVELS, DecayingEWMA, DegradationController
+
+
+def controller(signals, recover_sec=0.0):
+    return DegradationController(
+        signals=lambda: dict(signals),
+        load_thresholds=(1.0, 1.5, 2.0, 2.5),
+        embed_ms_thresholds=(1500, 3000, 6000, 12000),
+        recover_sec=recover_sec,
+    )
+
+
+def test_rises_straight_to_the_highest_signalled_level():
+    signals = {"load_ratio": 0.2, "embed_ewma_ms": 0.0}
+    c = controller(signals)
+    assert c.current() == 0
+    signals["embed_ewma_ms"] = 7000
+    assert c.current() == LEVELS.index("cache_only")
+    signals["load_ratio"] = 3.0
+    assert c.current() == LEVELS.index("lexical_only")
+
+
+def test_holds_the_level_until_recover_sec_has_passed():
+    signals = {"load_ratio": 2.6}
+    c = controller(signals, recover_sec=60)
+    assert c.current() == 4
+    signals["load_ratio"] = 0.0
+    assert c.current() == 4
+    assert c.current() == 4
+
+
+def test_steps_down_one_level_at_a_time():
+    signals = {"load_ratio": 2.6}
+    c = controller(signals, recover_sec=60)
+    c.current()
+    signals["load_ratio"] = 0.0
+    c.current()
+    c._below_since -= 61  # pretend recover_sec passed
+    assert c.current() == 3
+    c._below_since -= 61
+    assert c.current() == 2
+    assert c.snapshot()["level_changes"] == 3
+
+
+def test_disabled_controller_stays_normal():
+    c = DegradationController(signals=lambda: {"load_ratio": 10.0}, enabled=False)
+    assert c.current() == 0
+
+
+def test_ewma_follows_samples_and_penalizes_failures():
+    ewma = DecayingEWMA(alpha=0.5, half_life_sec=0)
+    ewma.record(1000)
+    ewma.record(2000)
+    assert ewma.value() == 1500
+    ewma.record(10, failed=True)  # a fast failure still counts as slow
+    assert ewma.value() == 2250
+
+
+def test_ewma_decays_while_nothing_feeds_it():
+    ewma = DecayingEWMA(half_life_sec=30)
+    ewma.record(8000)
+    ewma._at -= 60  # two half-lives without a query embed
+    assert 1990 < ewma.value() < 2010
+
+
+def test_degraded_level_recovers_without_new_embeds():
+    ewma = DecayingEWMA(half_life_sec=30)
+    ewma.record(13000)
+    c = DegradationController(signals=lambda: {"embed_ewma_ms": ewma.value()}, recover_sec=0)
+    assert c.current() == LEVELS.index("lexical_only")
+    ewma._at -= 600  # lexical_only makes no query embeds: only time passes
+    levels = [c.current() for _ in range(6)]
+    assert levels == [4, 3, 2, 1, 0, 0]  # first call below the level only starts the recovery clock
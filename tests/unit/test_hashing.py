@@ -0,0 +1,29 @@
+import hashlib
+import json
+import os
+
+from app.utils import hashing
+from app.utils.hashing import sha256_file_cached
+
+
+def test_cached_hash_survives_a_restart_and_follows_rewrites(tmp_path, monkeypatch):
+    src, cache = tmp_path / "source.jsonl", tmp_path / "hash.json"
+    src.write_bytes(b"one\n")
+    assert sha256_file_cached(str(src), str(cache)) == hashlib.sha256(b"one\n").hexdigest()
+    assert json.loads(cache.read_text())[os.path.abspath(src)]["sha256"]
+
+    hashing._memo.clear()  # a new process: only the cache file is left
+    monkeypatch.setattr(hashing, "sha256_file", lambda path: "re-read")
+    assert sha256_file_cached(str(src), str(cache)) == hashlib.sha256(b"one\n").hexdigest()
+
+    src.write_bytes(b"two, longer\n")
+    assert sha256_file_cached(str(src), str(cache)) == "re-read"
+
+
+def test_no_cache_path_always_hashes(tmp_path):
+    src = tmp_path / "source.jsonl"
+    src.write_bytes(b"a")
+    assert sha256_file_cached(str(src)) == hashlib.sha256(b"a").hexdigest()
+    src.write_bytes(b"b")
+    assert sha256_file_cached(str(src)) == hashlib.sha256(b"b").hexdigest()
+    assert sha256_file_cached(str(tmp_path / "missing"), str(tmp_path / "hash.json")) == ""
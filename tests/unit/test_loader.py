@@ -0,0 +1,73 @@
+import json
+
+from app.storage.documents.loader import count_lines, iter_source_documents, load_source_documents
+
+LINES = [
+    json.dumps({"question": "How do I reset my PIN?", "answer": "Use the app."}),
+    "",
+    "{not json",
+    json.dumps(["a", "list"]),
+    json.dumps({"answer": "answer without question"}),
+    json.dumps({"text": "plain text record"}),
+    "   ",
+    json.dumps({"q": "  short keys  ", "a": "ok"}, ensure_ascii=False),
+]
+
+
+def _write(tmp_path, lines, trailing_newline=True):
+    path = tmp_path / "source.jsonl"
+    path.write_text("\n".join(lines) + ("\n" if trailing_newline else ""), encoding="utf-8")
+    return path
+
+
+def test_streaming_counters_match_the_records(tmp_path):
+    path = _write(tmp_path, LINES)
+    report = {}
+    docs = list(iter_source_documents(str(path), report))
+    assert [d["question"] for d in docs] == ["How do I reset my PIN?", "plain text record", "short keys"]
+    assert [d["doc_id"] for d in docs] == ["jsonl-000000", "jsonl-000001", "jsonl-000002"]
+    assert docs[2]["meta"] == {"record_index": 2}
+    assert report["jsonl_total_lines"] == 8
+    assert report["jsonl_parsed_records"] == 3
+    assert report["jsonl_bad_json"] == 1
+    assert report["jsonl_skipped"] == 4
+
+
+def test_counters_are_final_even_when_not_exhausted(tmp_path):
+    path = _write(tmp_path, LINES)
+    report = {}
+    gen = iter_source_documents(str(path), report)
+    next(gen)
+    gen.close()
+    assert report["jsonl_parsed_records"] == 1
+    assert report["jsonl_total_lines"] == 1
+
+
+def test_list_loader_matches_stream(tmp_path):
+    path = _write(tmp_path, LINES)
+    docs, report = load_source_documents(str(path))
+    streamed = {}
+    assert docs == list(iter_source_documents(str(path), streamed))
+    assert report == streamed
+
+
+def test_invalid_utf8_line_is_still_parsed(tmp_path):
+    path = tmp_path / "source.jsonl"
+    path.write_bytes(b'{"question": "caf\xe9 hours", "answer": "9-5"}\n')
+    docs, report = load_source_documents(str(path))
+    assert docs[0]["question"] == "caf hours"
+    assert report["jsonl_bad_json"] == 0
+
+
+def test_missing_file_and_text_fallback(tmp_path):
+    docs, report = load_source_documents(str(tmp_path / "missing.jsonl"))
+    assert docs == [] and report["exists"] is False
+    txt = tmp_path / "notes.txt"
+    txt.write_text("  some notes  ", encoding="utf-8")
+    docs, report = load_source_documents(str(txt))
+    assert docs == [{"doc_id": "doc-000000", "text": "some notes", "meta": {}}]
+
+
+def test_count_lines(tmp_path):
+    assert count_lines(str(_write(tmp_path, ["a", "b"]))) == 2
+    assert count_lines(str(_write(tmp_path, ["a", "b"], trailing_newline=False))) == 2
@@ -0,0 +1,46 @@
+import json
+import logging
+import queue
+
+from app.core.logging import BoundedQueueHandler, JsonFormatter, RequestIdFilter
+from app.utils.tracing import end_trace, start_trace
+
+
+def _record(msg="hello %s", args=("world",), level=logging.INFO):
+    return logging.LogRecord("app.test", level, __file__, 1, msg, args, None)
+
+
+def test_json_lines_carry_the_request_id():
+    record = _record()
+    _, token = start_trace("rid-7")
+    try:
+        RequestIdFilter().filter(record)
+    finally:
+        end_trace(token)
+    out = json.loads(JsonFormatter().format(record))
+    assert out["message"] == "hello world"
+    assert out["request_id"] == "rid-7"
+    assert out["level"] == "INFO"
+
+
+def test_prepare_resolves_the_message_in_the_caller():
+    handler = BoundedQueueHandler(queue.Queue())
+    args = ["before"]
+    handler.handle(_record("value=%s", (args,)))
+    args.append("after")
+    assert handler.queue.get_nowait().msg == "value=['before']"
+
+
+def test_drop_policy_drops_and_reports_once_there_is_room():
+    handler = BoundedQueueHandler(queue.Queue(maxsize=2), overflow="drop", block_sec=0.01)
+    handler.handle(_record())
+    handler.handle(_record())
+    handler.handle(_record())  # INFO on a full queue: dropped at once
+    handler.handle(_record(level=logging.ERROR))  # waits block_sec, then dropped too
+    assert handler.stats()["dropped_total"] == 2
+
+    while not handler.queue.empty():
+        handler.queue.get_nowait()
+    handler.handle(_record("back", ()))
+    messages = [handler.queue.get_nowait().getMessage() for _ in range(2)]
+    assert messages == ["back", "log queue full: dropped 2 record(s)"]
@@ -0,0 +1,54 @@
+from app.services.metrics_service import Metrics
+
+
+def test_status_codes_are_a_label_not_part_of_the_name():
+    m = Metrics()
+    m.record_response(200)
+    m.record_response(200)
+    m.record_response(503)
+    assert m.labeled()["http_requests_total"] == {'status="200"': 2, 'status="503"': 1}
+    assert not any(k.startswith("http_status_") for k in m.snapshot())
+
+
+def test_prometheus_counters_end_in_total():
+    m = Metrics()
+    m.record_response(404)
+    m.inc("cache_hits")
+    text = m.render_prometheus()
+    assert "rag_requests_error_total 1" in text
+    assert "rag_cache_hits_total 1" in text
+    assert 'rag_http_requests_total{status="404"} 1' in text
+    assert "rag_requests_total_total" not in text
+
+
+def test_histogram_buckets_and_quantiles():
+    m = Metrics(buckets_ms=(10, 100, 1000))
+    for v in (5, 50, 50, 500):
+        m.observe("stage_duration_ms", v, {"stage": "embed"})
+    h = m.histograms()["stage_duration_ms"]['stage="embed"']
+    assert (h["count"], h["sum_ms"], h["mean_ms"]) == (4, 605, 151.25)
+    assert 10 < h["p50_ms"] <= 100
+    assert 100 < h["p99_ms"] <= 1000
+    text = m.render_prometheus()
+    assert 'rag_stage_duration_ms_bucket{stage="embed",le="100"} 3' in text
+    assert 'rag_stage_duration_ms_bucket{stage="embed",le="+Inf"} 4' in text
+    assert 'rag_stage_duration_ms_count{stage="embed"} 4' in text
+
+
+def test_counts_from_every_thread_are_merged():
+    import threading
+
+    m = Metrics()
+    threads = [threading.Thread(target=lambda: [m.inc("queries_total") for _ in range(100)]) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    m.inc_labeled("generations_total", {"provider": "local"})
+    assert m.snapshot()["queries_total"] == 400
+    assert m.labeled()["generations_total"] == {'provider="local"': 1}
+
+
+def test_extra_gauges_are_rendered():
+    text = Metrics().render_prometheus(extra_gauges={"admission_query_in_flight": 2})
+    assert "# TYPE rag_admission_query_in_flight gauge\nrag_admission_query_in_flight 2" in text
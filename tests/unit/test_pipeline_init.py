@@ -0,0 +1,60 @@
+import threading
+
+import pytest
+
+from app.services.pipeline_init import PipelineInitializer, PipelineUnavailable
+
+
+def test_concurrent_callers_share_one_build():
+    builds, published = [], []
+    release = threading.Event()
+
+    def build():
+        builds.append(1)
+        release.wait(2)
+        return "pipeline", {}
+
+    init = PipelineInitializer(build=build, publish=lambda p, r: published.append(p), wait_sec=2)
+    callers = [threading.Thread(target=init.ensure) for _ in range(5)]
+    for t in callers:
+        t.start()
+    release.set()
+    for t in callers:
+        t.join()
+    assert builds == [1]
+    assert published == ["pipeline"]
+
+
+def test_wait_is_bounded_and_the_build_keeps_going():
+    published = []
+    release = threading.Event()
+
+    def build():
+        release.wait(2)
+        return "pipeline", {}
+
+    init = PipelineInitializer(build=build, publish=lambda p, r: published.append(p), wait_sec=0.01)
+    with pytest.raises(PipelineUnavailable) as exc:
+        init.ensure()
+    assert exc.value.reason == "initializing"
+    release.set()
+    init.ensure(wait_sec=2)
+    assert published
+
+
+def test_failed_build_fails_fast_during_backoff():
+    calls = []
+
+    def build():
+        calls.append(1)
+        raise RuntimeError("index missing")
+
+    init = PipelineInitializer(build=build, publish=lambda p, r: None, wait_sec=2, backoff_sec=60)
+    with pytest.raises(PipelineUnavailable) as first:
+        init.ensure()
+    with pytest.raises(PipelineUnavailable) as second:
+        init.ensure()
+    assert first.value.reason == second.value.reason == "init_failed"
+    assert second.value.error == "RuntimeError: index missing"
+    assert 0 < second.value.retry_after_sec <= 60
+    assert calls == [1]
@@ -0,0 +1,36 @@
+import threading
+import time
+
+from app.services.profiler import SamplingProfiler
+
+
+def _spin(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_collapsed_stacks_name_the_busy_thread_and_function():
+    stop = threading.Event()
+    worker = threading.Thread(target=_spin, args=(stop,), name="busy worker")
+    worker.start()
+    profiler = SamplingProfiler(interval_sec=0.002)
+    profiler.start()
+    time.sleep(0.2)
+    profiler.stop()
+    stop.set()
+    worker.join()
+
+    busy = [line for line in profiler.collapsed().splitlines() if line.startswith("busy_worker;")]
+    assert busy and any("_spin (" in line for line in busy)
+    summary = profiler.summary(top=5)
+    assert summary["samples"] > 0
+    assert summary["threads"]["busy_worker"] > 0
+    assert len(summary["top_self"]) <= 5
+
+
+def test_only_one_profile_at_a_time():
+    assert SamplingProfiler.acquire()
+    try:
+        assert not SamplingProfiler.acquire()
+    finally:
+        SamplingProfiler.release()
@@ -0,0 +1,46 @@
+import json
+
+from app.services.query_log import QueryLogWriter
+
+
+def test_full_queue_drops_instead_of_blocking(tmp_path):
+    writer = QueryLogWriter(str(tmp_path / "queries.jsonl"), max_queue=2)
+    assert writer.log({"q": 1}) and writer.log({"q": 2})
+    assert writer.log({"q": 3}) is False
+    assert writer.snapshot()["dropped_total"] == 1
+
+
+def test_stop_flushes_queued_records(tmp_path):
+    path = tmp_path / "queries.jsonl"
+    writer = QueryLogWriter(str(path))
+    writer.start()
+    for i in range(5):
+        writer.log({"query": f"سوال {i}"})
+    writer.stop()
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert [json.loads(l)["query"] for l in lines] == [f"سوال {i}" for i in range(5)]
+    assert writer.snapshot()["written_total"] == 5
+
+
+def test_rotates_by_size_and_keeps_the_newest_backups(tmp_path):
+    path = tmp_path / "queries.jsonl"
+    writer = QueryLogWriter(str(path), max_bytes=1024, rotate_interval_sec=0, backups=2)
+    record = {"query": "x" * 1100}
+    for _ in range(5):
+        writer._write([record])  # every write after the first crosses max_bytes
+    writer._file.close()
+    rotated = sorted(p.name for p in tmp_path.glob("queries.*.jsonl"))
+    assert writer.rotations == 4
+    assert len(rotated) == 2
+    assert len(path.read_text(encoding="utf-8").splitlines()) == 1
+
+
+def test_rotates_by_age(tmp_path):
+    path = tmp_path / "queries.jsonl"
+    writer = QueryLogWriter(str(path), rotate_interval_sec=3600)
+    writer._write([{"q": 1}])
+    writer._opened_at -= 3601  # pretend the file is an hour old
+    writer._write([{"q": 2}])
+    writer._file.close()
+    assert writer.rotations == 1
+    assert [json.loads(l)["q"] for l in path.read_text().splitlines()] == [2]
@@ -0,0 +1,86 @@
+import asyncio
+
+from app.middleware.auth import _parse_networks, client_ip
+from app.services.rate_limiter import ClientPolicy, InMemoryBucketStore, RateLimiter, build_key_policies
+
+ANON = ClientPolicy("anonymous", rate_per_sec=1.0, burst=2, expensive_rate_per_sec=0.1, expensive_burst=1)
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+def test_bucket_allows_burst_then_limits():
+    async def scenario():
+        store = InMemoryBucketStore()
+        decisions = [await store.take("c", rate=1.0, burst=2) for _ in range(3)]
+        assert [d.allowed for d in decisions] == [True, True, False]
+        assert decisions[1].remaining == 0
+        assert decisions[2].retry_after_sec >= 1
+        assert decisions[0].limit == 2
+
+    _run(scenario())
+
+
+def test_zero_rate_never_refills():
+    async def scenario():
+        store = InMemoryBucketStore()
+        assert (await store.take("c", rate=0.0, burst=1)).allowed
+        denied = await store.take("c", rate=0.0, burst=1)
+        assert not denied.allowed
+        assert denied.retry_after_sec == 60
+
+    _run(scenario())
+
+
+def test_prune_uses_each_buckets_own_rate():
+    async def scenario():
+        store = InMemoryBucketStore(max_entries=100)
+        # Slow policy: drained bucket needs ~100 s to refill, must survive pruning
+        await store.take("slow", rate=0.01, burst=1)
+        for i in range(100):
+            store._buckets[f"fast{i}"] = (1.0, 0.0, 0.0)  # long idle and full
+        await store.take("new", rate=1000.0, burst=1)  # over max_entries: prunes
+        assert "slow" in store._buckets
+        assert not any(k.startswith("fast") for k in store._buckets)
+
+    _run(scenario())
+
+
+def test_limiter_keeps_separate_buckets_per_class_and_counts():
+    async def scenario():
+        limiter = RateLimiter(anonymous=ANON)
+        assert (await limiter.check("ip:1", ANON, "expensive")).allowed
+        assert not (await limiter.check("ip:1", ANON, "expensive")).allowed
+        assert (await limiter.check("ip:1", ANON, "default")).allowed
+        assert (await limiter.check("ip:2", ANON, "expensive")).allowed
+        snap = limiter.snapshot()
+        assert snap["checked_total"] == 4
+        assert snap["limited_by_client"] == {"anonymous": 1}
+
+    _run(scenario())
+
+
+def test_key_policies_inherit_defaults():
+    policies = build_key_policies({"secret": {"name": "crm", "burst": 50, "admin": True}}, ANON)
+    crm = policies["secret"]
+    assert (crm.name, crm.burst, crm.rate_per_sec, crm.admin) == ("crm", 50, 1.0, True)
+    assert crm.limits("expensive") == (0.1, 1)
+
+
+def _scope(peer, forwarded=None):
+    headers = [(b"x-forwarded-for", forwarded.encode())] if forwarded else []
+    return {"type": "http", "client": (peer, 1234), "headers": headers}
+
+
+def test_client_ip_ignores_forwarded_for_without_trusted_proxies():
+    assert client_ip(_scope("1.2.3.4", "9.9.9.9")) == "1.2.3.4"
+
+
+def test_client_ip_behind_trusted_proxy():
+    trusted = _parse_networks(["10.0.0.0/8"])
+    # Right-most untrusted hop wins; the left-most entry is client-supplied
+    assert client_ip(_scope("10.0.0.1", "6.6.6.6, 5.5.5.5, 10.1.1.1"), trusted) == "5.5.5.5"
+    assert client_ip(_scope("10.0.0.1"), trusted) == "10.0.0.1"
+    # Peer not trusted: its header is not believed
+    assert client_ip(_scope("8.8.8.8", "5.5.5.5"), trusted) == "8.8.8.8"
@@ -0,0 +1,77 @@
+import threading
+
+from app.services.reindex_jobs import ReindexManager
+
+
+def _manager(build, published):
+    return ReindexManager(build=build, on_ready=lambda p, r: published.append(p))
+
+
+def test_successful_job_publishes():
+    published = []
+    manager = _manager(lambda progress: ("pipeline", {"items": 1}), published)
+    job = manager.start()
+    assert job.wait(2)
+    assert job.state == "succeeded"
+    assert published == ["pipeline"]
+    assert not job.cancel()
+
+
+def test_cancel_during_embedding_leaves_nothing_published():
+    published = []
+    started, release = threading.Event(), threading.Event()
+
+    def build(progress):
+        progress("embedding", 0, 10)
+        started.set()
+        release.wait(2)
+        progress("embedding", 5, 10)
+        return "pipeline", {}
+
+    job = _manager(build, published).start()
+    started.wait(2)
+    assert job.cancel()
+    release.set()
+    job.wait(2)
+    assert job.state == "cancelled"
+    assert published == []
+
+
+def test_cancel_refused_once_files_are_written():
+    published = []
+    saving, release = threading.Event(), threading.Event()
+
+    def build(progress):
+        progress("saving", 10, 10)
+        saving.set()
+        release.wait(2)
+        return "pipeline", {}
+
+    job = _manager(build, published).start()
+    saving.wait(2)
+    assert not job.cancel()
+    assert job.snapshot()["cancellable"] is False
+    release.set()
+    job.wait(2)
+    assert job.state == "succeeded"
+    assert published == ["pipeline"]
+
+
+
+def test_one_job_at_a_time_and_skip_if():
+    published = []
+    release = threading.Event()
+
+    def build(progress):
+        release.wait(2)
+        return "pipeline", {}
+
+    manager = _manager(build, published)
+    job = manager.start()
+    assert manager.start() is None
+    assert manager.current() is job
+    release.set()
+    job.wait(2)
+    assert manager.start(skip_if=lambda: True) is None
+    assert manager.lock.acquire(blocking=False)  # skip_if released the slot
+    manager.lock.release()
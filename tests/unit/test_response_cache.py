@@ -0,0 +1,54 @@
+import time
+
+from app.services.response_cache import ResponseCache
+
+
+def test_lru_evicts_least_recently_used():
+    cache = ResponseCache(max_entries=2, ttl_sec=60)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # a is now the most recent
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_entries_expire_after_ttl():
+    cache = ResponseCache(max_entries=10, ttl_sec=1)
+    cache.put("a", 1)
+    cache._data["a"] = (time.monotonic() - 0.01, 1)  # pretend the TTL passed
+    assert cache.get("a") is None
+    assert cache.stats()["size"] == 0
+
+
+def test_index_version_change_clears():
+    cache = ResponseCache()
+    cache.ensure_index_version("v1")
+    cache.put("a", 1)
+    cache.ensure_index_version("v1")
+    assert cache.get("a") == 1
+    cache.ensure_index_version("v2")
+    assert cache.get("a") is None
+    cache.ensure_index_version(None)  # unknown version keeps the entries
+    cache.put("b", 2)
+    cache.ensure_index_version(None)
+    assert cache.get("b") == 2
+
+
+def test_make_key_is_order_independent_and_distinct():
+    k1 = ResponseCache.make_key(system="s", user="u", local={"model": "m", "t": 0.2})
+    k2 = ResponseCache.make_key(local={"t": 0.2, "model": "m"}, user="u", system="s")
+    k3 = ResponseCache.make_key(system="s", user="u", local={"model": "m", "t": 0.3})
+    assert k1 == k2
+    assert k1 != k3
+
+
+def test_hit_and_miss_counters():
+    cache = ResponseCache()
+    cache.get("missing")
+    cache.put("a", 1)
+    cache.get("a")
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 1)
@@ -0,0 +1,129 @@
+import threading
+import time
+
+from app.providers.base import ProviderError
+from app.providers.router import GeneratorRouter
+from app.services.busy_detector import BusyDetector, CircuitBreaker
+from app.services.response_cache import ResponseCache
+from app.utils.timeouts import Deadline
+
+
+class FakeLocal:
+    timeout_sec = 5
+
+    def __init__(self, answers=(), delay=0.0):
+        self.answers = list(answers)
+        self.delay = delay
+        self.calls = 0
+
+    def generate_with_stats(self, system, user, timeout_sec=None):
+        self.calls += 1
+        time.sleep(self.delay)
+        answer = self.answers.pop(0) if self.answers else "local answer"
+        if isinstance(answer, Exception):
+            raise answer
+        return answer, {}
+
+    def cache_signature(self):
+        return {"provider": "fake"}
+
+
+class FakeApi:
+    timeout_sec = 5
+    max_retries = 0
+
+    def __init__(self, error=None):
+        self.error = error
+        self.calls = 0
+
+    def generate(self, system, user, timeout_sec=None):
+        self.calls += 1
+        if self.error is not None:
+            raise self.error
+        return "api answer"
+
+    def cache_signature(self):
+        return {"provider": "fake-api"}
+
+
+def _router(local, api=None, cache=None, max_concurrent=1, fallback=True):
+    return GeneratorRouter(
+        local=local,
+        api=api,
+        busy=BusyDetector(max_concurrent=max_concurrent),
+        circuit=CircuitBreaker(fails_to_open=3, reset_sec=60),
+        api_fallback_enabled=fallback,
+        cache=cache,
+    )
+
+
+def test_local_answer():
+    res = _router(FakeLocal()).generate("s", "u")
+    assert (res.answer, res.provider_used, res.fallback_reason) == ("local answer", "local", None)
+
+
+def test_local_failure_falls_back_to_api():
+    api = FakeApi()
+    res = _router(FakeLocal([RuntimeError("down")]), api=api).generate("s", "u")
+    assert (res.answer, res.provider_used) == ("api answer", "api")
+    assert res.fallback_reason == "local_failed: RuntimeError"
+
+
+def test_api_failure_degrades_instead_of_raising():
+    api = FakeApi(error=ProviderError("api_key_missing"))
+    res = _router(FakeLocal([RuntimeError("down")]), api=api).generate("s", "u")
+    assert res.answer == ""
+    assert res.provider_used == "none"
+    assert res.fallback_reason.startswith("api_failed: api_key_missing")
+
+
+def test_busy_local_with_failing_api_degrades():
+    api = FakeApi(error=ProviderError("api_error: 500"))
+    router = _router(FakeLocal(), api=api, max_concurrent=1)
+    assert router.busy.acquire_nowait().acquired  # someone else holds the only slot
+    res = router.generate("s", "u")
+    router.busy.release()
+    assert (res.answer, res.provider_used) == ("", "none")
+    assert api.calls == 1
+
+
+def test_cache_hit_is_marked_cached():
+    local = FakeLocal()
+    router = _router(local, cache=ResponseCache())
+    first = router.generate("s", "u", index_version="v1")
+    second = router.generate("s", "u", index_version="v1")
+    assert (first.cached, second.cached, local.calls) == (False, True, 1)
+    assert router.generate("s", "other", cache_only=True).fallback_reason == "degraded_cache_only"
+
+
+def _concurrent(router, n, deadline_ms):
+    results = []
+
+    def call():
+        results.append(router.generate("s", "u", deadline=Deadline(deadline_ms)))
+
+    threads = [threading.Thread(target=call) for _ in range(n)]
+    for t in threads:
+        t.start()
+        time.sleep(0.02)
+    for t in threads:
+        t.join()
+    return results
+
+
+def test_coalesced_callers_share_a_real_answer():
+    local = FakeLocal(delay=0.2)
+    results = _concurrent(_router(local, cache=ResponseCache(), max_concurrent=2), 2, 5000)
+    assert local.calls == 1
+    assert sorted(r.cached for r in results) == [False, True]
+
+
+def test_leaders_non_answer_is_not_shared():
+    # Leader fails (no API): the waiter must run its own generation, not inherit the failure
+    local = FakeLocal([RuntimeError("down"), "second try"], delay=0.2)
+    results = _concurrent(_router(local, cache=ResponseCache(), max_concurrent=2, fallback=False), 2, 5000)
+    assert local.calls == 2
+    by_provider = {r.provider_used: r for r in results}
+    assert by_provider["local"].answer == "second try"
+    assert by_provider["local"].cached is False
+    assert by_provider["none"].cached is False
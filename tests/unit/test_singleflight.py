@@ -0,0 +1,78 @@
+import threading
+import time
+
+import pytest
+
+from app.utils.singleflight import SingleFlight, SingleFlightTimeout
+
+
+def _run_concurrently(n, target):
+    threads = [threading.Thread(target=target) for _ in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+
+def test_concurrent_calls_share_one_run():
+    flight = SingleFlight()
+    calls = []
+    results = []
+    gate = threading.Event()
+
+    def fn():
+        calls.append(1)
+        gate.wait(1)
+        return "value"
+
+    def caller():
+        results.append(flight.do("k", fn))
+
+    threads = [threading.Thread(target=caller) for _ in range(5)]
+    for t in threads:
+        t.start()
+    time.sleep(0.1)
+    gate.set()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert sorted(shared for _, shared in results) == [False, True, True, True, True]
+    assert all(value == "value" for value, _ in results)
+    assert flight.in_flight() == 0
+
+
+def test_nothing_is_remembered_after_the_call():
+    flight = SingleFlight()
+    assert flight.do("k", lambda: 1) == (1, False)
+    assert flight.do("k", lambda: 2) == (2, False)
+
+
+def test_leader_exception_reaches_waiters():
+    flight = SingleFlight()
+    errors = []
+
+    def fn():
+        time.sleep(0.1)
+        raise ValueError("boom")
+
+    def caller():
+        try:
+            flight.do("k", fn)
+        except ValueError as exc:
+            errors.append(str(exc))
+
+    _run_concurrently(3, caller)
+    assert errors == ["boom"] * 3
+
+
+def test_waiter_timeout():
+    flight = SingleFlight()
+    gate = threading.Event()
+    leader = threading.Thread(target=lambda: flight.do("k", lambda: gate.wait(2)))
+    leader.start()
+    time.sleep(0.05)
+    with pytest.raises(SingleFlightTimeout):
+        flight.do("k", lambda: None, timeout=0.05)
+    gate.set()
+    leader.join()
@@ -0,0 +1,81 @@
+import json
+
+import pytest
+
+from app.storage.vectorstore.faiss_store import FaissStore
+from app.storage.vectorstore.snapshots import (
+    FEATURES_FILE,
+    INDEX_FILE,
+    METADATA_FILE,
+    POINTER_FILE,
+    SnapshotError,
+    SnapshotStore,
+)
+
+
+def _store(n=3, dim=4):
+    store = FaissStore(index_path="", metadata_path="", embedding_dim=dim)
+    items = [{"chunk_id": str(i), "question": f"q{i}", "answer": f"a{i}"} for i in range(n)]
+    vectors = [[float(i == j) for j in range(dim)] for i in range(n)]
+    store.build_from_embeddings(items=items, embeddings=vectors)
+    return store
+
+
+def test_publish_switches_current_and_writes_manifest(tmp_path):
+    snaps = SnapshotStore(str(tmp_path), keep=3)
+    store = _store()
+    v1 = snaps.publish(store, {"index_mode": "qa_full"}, "20260101-000000-a", features={"lexical_tokens": []})
+    assert snaps.current() == v1
+    assert snaps.pointer()["pinned"] is False
+    manifest = snaps.verify(v1)
+    assert manifest["items"] == 3
+    assert set(manifest["files"]) >= {INDEX_FILE, METADATA_FILE, FEATURES_FILE}
+    assert str(store.index_path).startswith(str(tmp_path / v1))
+
+
+def test_taken_version_name_gets_a_suffix(tmp_path):
+    snaps = SnapshotStore(str(tmp_path))
+    v1 = snaps.publish(_store(), {}, "20260101-000000-a")
+    v2 = snaps.publish(_store(), {}, "20260101-000000-a")
+    assert v2 == f"{v1}-2"
+
+
+def test_rollback_pins_and_prune_keeps_current(tmp_path):
+    snaps = SnapshotStore(str(tmp_path), keep=2)
+    versions = [snaps.publish(_store(), {}, f"2026010{i}-000000-a") for i in range(1, 4)]
+    assert snaps.versions() == versions[::-1][:2]  # oldest pruned
+
+    snaps.activate(versions[1], pinned=True)
+    assert snaps.pointer() == {**snaps.pointer(), "version": versions[1], "pinned": True}
+    v4 = snaps.publish(_store(), {}, "20260104-000000-a")
+    assert snaps.current() == v4
+    assert snaps.pointer()["pinned"] is False
+    assert versions[1] not in snaps.versions()  # no longer current, beyond keep
+
+
+def test_verify_detects_tampering(tmp_path):
+    snaps = SnapshotStore(str(tmp_path))
+    v = snaps.publish(_store(), {}, "20260101-000000-a")
+    meta = tmp_path / v / METADATA_FILE
+    data = json.loads(meta.read_text(encoding="utf-8"))
+    data[0]["answer"] = "changed"
+    meta.write_text(json.dumps(data), encoding="utf-8")
+    with pytest.raises(SnapshotError):
+        snaps.verify(v)
+
+
+def test_unknown_or_unsafe_versions_are_rejected(tmp_path):
+    snaps = SnapshotStore(str(tmp_path))
+    for bad in ("../x", "a/b", ".hidden", ""):
+        with pytest.raises(SnapshotError):
+            snaps.path(bad)
+    with pytest.raises(SnapshotError):
+        snaps.activate("20990101-000000-a")
+    with pytest.raises(SnapshotError):
+        snaps.manifest("20990101-000000-a")
+
+
+def test_corrupt_pointer_reads_as_none(tmp_path):
+    snaps = SnapshotStore(str(tmp_path))
+    tmp_path.joinpath(POINTER_FILE).write_text("{not json", encoding="utf-8")
+    assert snaps.current() is None
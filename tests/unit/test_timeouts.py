@@ -0,0 +1,73 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.exceptions import DeadlineExceeded
+from app.utils.timeouts import Deadline, budget_or_default, deadline_from_headers
+
+HEADER = "X-Request-Timeout-Ms"
+
+
+def _settings(**overrides):
+    values = dict(
+        request_timeout_header=HEADER,
+        request_deadline_default_ms=5000,
+        request_deadline_max_ms=20000,
+        deadline_min_embed_ms=50,
+        deadline_min_rerank_ms=20,
+        deadline_min_local_ms=1000,
+        deadline_min_api_ms=500,
+    )
+    values.update(overrides)
+    return SimpleNamespace(**values)
+
+
+def test_budget_is_capped_by_remaining_time():
+    d = Deadline(1000)
+    assert d.budget_for("embed", 0.2) == pytest.approx(0.2)
+    assert d.budget_for("embed", 60) <= 1.0
+    assert d.exhausted_stage is None
+
+
+def test_stage_minimum_marks_exhausted():
+    d = Deadline(100, stage_min_ms={"local_generate": 1000})
+    assert d.budget_for("local_generate", 30) is None
+    assert d.exhausted_stage == "local_generate"
+    assert d.degraded_stages == ["local_generate"]
+    with pytest.raises(DeadlineExceeded):
+        d.require("local_generate", 30)
+
+
+def test_expired_deadline():
+    d = Deadline(1)
+    time.sleep(0.01)
+    assert d.expired()
+    assert d.remaining_ms() == 0
+    assert d.budget_for("rerank", 1) is None
+
+
+def test_budget_or_default_without_deadline():
+    assert budget_or_default(None, "api_fallback", 12) == 12.0
+
+
+@pytest.mark.parametrize("raw,expected", [
+    ("1500", 1500),
+    ("1500.7", 1500),
+    ("999999", 20000),   # clamped to the max
+    ("-5", 1),
+    ("abc", 5000),
+    ("inf", 5000),
+    ("-inf", 5000),
+    ("nan", 5000),
+    ("1e400", 5000),
+])
+def test_deadline_from_headers(raw, expected):
+    d = deadline_from_headers({HEADER: raw}, _settings())
+    assert d.timeout_ms == expected
+
+
+def test_deadline_from_headers_default_and_stage_minimums():
+    d = deadline_from_headers({}, _settings())
+    assert d.timeout_ms == 5000
+    assert d.stage_min_ms == {"embed": 50, "rerank": 20, "local_generate": 1000, "api_fallback": 500}
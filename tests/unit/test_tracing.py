@@ -0,0 +1,56 @@
+import asyncio
+import json
+import logging
+
+from app.middleware.observability import ObservabilityMiddleware
+from app.services.metrics_service import Metrics
+from app.utils.tracing import annotate, current_trace, end_trace, span, start_trace
+
+
+def test_spans_are_recorded_on_the_current_trace_only():
+    with span("outside"):
+        pass
+    trace, token = start_trace("rid-1")
+    try:
+        with span("embed"):
+            pass
+        with span("embed"):
+            pass
+        with span("search"):
+            pass
+        annotate(retrieval_mode="vector")
+        assert current_trace() is trace
+    finally:
+        end_trace(token)
+    assert current_trace() is None
+    assert [name for name, _ in trace.spans] == ["embed", "embed", "search"]
+    assert list(trace.breakdown()) == ["embed", "search"]
+    assert trace.attrs == {"retrieval_mode": "vector"}
+    header = trace.server_timing(total_ms=12.34)
+    assert header.startswith("embed;dur=") and header.endswith("total;dur=12.3")
+
+
+def test_slow_requests_are_logged_with_their_breakdown(caplog):
+    async def app(scope, receive, send):
+        with span("search"):
+            annotate(query="q")
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    mw = ObservabilityMiddleware(app, metrics=Metrics(), slow_ms=0.000001)
+    with caplog.at_level(logging.WARNING, logger="rag.slow_query"):
+        asyncio.run(mw({"type": "http", "method": "POST", "path": "/query", "headers": []}, receive, send))
+    headers = dict(sent[0]["headers"])
+    assert b"search;dur=" in headers[b"server-timing"]
+    record = json.loads(caplog.records[-1].getMessage())
+    assert record["status"] == 200
+    assert record["query"] == "q"
+    assert list(record["breakdown"]) == ["search"]
@@ -0,0 +1,46 @@
+from datetime import datetime
+
+from app.services.warmup import KeepAliveScheduler, warm_up_models
+
+
+class FakeEmbedder:
+    model = "embed"
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.pings = 0
+
+    def warm_up(self, text):
+        if self.fail:
+            raise RuntimeError("connection refused")
+        return [{"url": "http://a", "ok": True}]
+
+    def keep_alive_ping(self):
+        if self.fail:
+            raise RuntimeError("connection refused")
+        self.pings += 1
+
+
+def test_warm_up_records_failures_instead_of_raising():
+    report = warm_up_models(FakeEmbedder(fail=True))
+    assert report["ok"] is False
+    assert report["steps"]["embed"]["error"] == "connection refused"
+    assert "chat" not in report["steps"]
+
+
+def test_keepalive_window_uses_hours_and_days():
+    scheduler = KeepAliveScheduler(targets=[], business_hours="08:00-18:00", business_days=(0,))
+    assert scheduler.in_window(datetime(2026, 10, 19, 9, 30))  # Monday
+    assert not scheduler.in_window(datetime(2026, 10, 19, 18, 0))
+    assert not scheduler.in_window(datetime(2026, 10, 20, 9, 30))  # Tuesday
+
+
+def test_tick_pings_every_target_and_counts_failures():
+    ok, down = FakeEmbedder(), FakeEmbedder(fail=True)
+    scheduler = KeepAliveScheduler(targets=[ok, down, None], business_hours="00:00-24:00",
+                                   business_days=range(7))
+    scheduler.tick()
+    snap = scheduler.snapshot()
+    assert ok.pings == 1
+    assert snap["targets"] == ["FakeEmbedder", "FakeEmbedder"]
+    assert (snap["pings"], snap["failures"]) == (1, 1)